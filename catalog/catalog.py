@@ -7,8 +7,8 @@ class Catalog:
     _ignored_dirs = ["_gsdata_"]
 
     def __init__(self, host: str, port: int, index: str = "", dropbox: bool = False,
-                 verbose: bool = True, dryrun: bool = False):
-        self._folder = data.Folder()
+                 verbose: bool = True, dryrun: bool = False, workers: int = 0):
+        self._folder = data.Folder(workers)
         self._dropbox = dropbox
         self._verbose = verbose
         self._dryrun = dryrun
@@ -53,5 +53,17 @@ class Catalog:
         for item in sorted(list(dirs.keys())):
             print(f"{item} : {len(dirs[item])}")
 
+    def use_bulk(self, chunk_size: int, max_chunk_bytes: int, workers: int = 0):
+        self._store.use_bulk(chunk_size, max_chunk_bytes, workers)
+
+    def use_directories(self):
+        directories = elastic.Directories(self._connection)
+        self._store.use_directories(directories)
+        self._delete.use_directories(directories)
+
     def update(self, change, _id):
         self._store.update(change, _id)
+
+    def close(self):
+        """Shut down the worker processes reading the files, if any"""
+        self._folder.close()
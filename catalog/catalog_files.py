@@ -2,26 +2,27 @@ import os
 import shutil
 import pathlib
 from catalog.catalog import Catalog
+from tools.constants import Constants
+from tools.walker import Walker
 
 
 class CatalogFiles(Catalog):
     def __init__(self, host: str, port: int, index: str = "", dropbox: bool = False, verbose: bool = True,
-                 dryrun: bool = False):
-        super().__init__(host, port, index, dropbox, verbose, dryrun)
+                 dryrun: bool = False, workers: int = 0):
+        super().__init__(host, port, index, dropbox, verbose, dryrun, workers)
 
-    def catalog_dir(self, directory: str, recurse: bool = False) -> int:
+    def catalog_dir(self, directory: str, recurse: bool = False, threads: int = Constants.walk_threads) -> int:
+        """Load the files in directory, and below it with recurse. The directories are listed ahead by a
+        pool of threads while the files of the ones listed already are read."""
         count = 0
-        if any(ignore in directory for ignore in self._ignored_dirs):
-            return 0
-        with os.scandir(directory) as iterator:
-            for item in iterator:
-                if item.is_dir() and recurse:
-                    count += self.catalog_dir(item.path, recurse)
-
-        self.get_files(directory, check=True)
-        count += self.read_and_update_directory()
-        if self._verbose and not self._dryrun:
-            print(f"Loaded from {directory} : {count}   / Not stored: {self._store.not_stored}")
+        walker = Walker(threads, max_depth=None if recurse else 0)
+        for found, entries in walker.walk(directory):
+            if any(ignore in found.path for ignore in self._ignored_dirs):
+                continue
+            self.get_files(found.path, check=True, files=[item.path for item in entries if item.is_file()])
+            count += self.read_and_update_directory()
+            if self._verbose and not self._dryrun:
+                print(f"Loaded from {found.path} : {count}   / Not stored: {self._store.not_stored}")
         return count
 
     def import_old_dir(self, directory: str, dest_path: str, is_month: bool = False) -> int:
@@ -39,8 +40,8 @@ class CatalogFiles(Catalog):
             print(f"Imported from {directory} : {count}   / Not stored: {self._store.not_stored}")
         return count
 
-    def get_files(self, directory: str, check: bool = False):
-        self._folder.read(directory)
+    def get_files(self, directory: str, check: bool = False, files: list = None):
+        self._folder.read(directory, files)
         self._folder.drop_duplicates()
         self._folder.save_paths(check)
 
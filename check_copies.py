@@ -1,111 +1,265 @@
 import argparse
+import itertools
+import json
 import os
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
 
-from tools import root_arguments, read_config, Constants
+from dropbox.exceptions import ApiError
 
-nas_list = []
-dropbox_list = []
+import elastic
+from data import DBox, Entry, Factory
+from tools import root_arguments, read_config, walk_arguments, elastic_arguments, checksum_arguments, Constants
+from tools.walker import Walker
+
+reader: elastic.Retrieve
+dbox: DBox
+dropbox_remote: str = ""
+catalog_prefix: str = ""
 loading_bar = 0
 loading_increase = 10000
+listings: dict = dict()
+
+
+def normalized(name: str) -> str:
+    """Names on the NAS and in the Dropbox folder may be in different unicode normal forms, compare them composed"""
+    return unicodedata.normalize('NFC', name)
+
 
+def parts(path: str) -> tuple:
+    return tuple(normalized(path).split(os.path.sep))
 
-def get_files(path, start):
-    for item in os.listdir(path):
-        if item not in Constants.ignored_paths:
-            yield os.path.join(path, item)[start:]
 
+def walktree(directory_name: str, threads: int, stat: bool = False):
+    """Generator over ((directory, name), entry) of everything below the subdirectories of directory_name, where
+    directory is the tuple of the names leading there. Sorted by directory and then name, which are the same
+    on both sides, so that the two trees can be merged while they are walked."""
+    top = directory_name.rstrip(os.path.sep)
+    for directory, entries in Walker(threads, stat=stat, hidden=False).walk(top, order=parts):
+        if directory.depth == 0:
+            continue
+        relative = parts(directory.path[len(top) + 1:])
+        for item in sorted(entries, key=lambda e: normalized(e.name)):
+            yield (relative, normalized(item.name)), item
 
-def walktree(directory_name: str, use_list: list, start: int, counter: int = 0):
+
+def merge(nas, dropbox):
+    """Merge join the two sorted walks, generator over (key, nas entry, dropbox entry) with None for a missing side"""
     global loading_bar
-    with os.scandir(directory_name) as dir_iterator:
-        for it in dir_iterator:
-            if it.name.startswith('.'):
-                continue
-            if it.is_dir():
-                walktree(it.path, use_list, start, counter)
-                use_list.extend(get_files(it.path, start))  # strip the root name
+    count = 0
+    nas_item = next(nas, None)
+    dropbox_item = next(dropbox, None)
+    while nas_item is not None or dropbox_item is not None:
+        if dropbox_item is None or (nas_item is not None and nas_item[0] < dropbox_item[0]):
+            yield nas_item[0], nas_item[1], None
+            nas_item = next(nas, None)
+        elif nas_item is None or dropbox_item[0] < nas_item[0]:
+            yield dropbox_item[0], None, dropbox_item[1]
+            dropbox_item = next(dropbox, None)
+        else:
+            yield nas_item[0], nas_item[1], dropbox_item[1]
+            nas_item = next(nas, None)
+            dropbox_item = next(dropbox, None)
+        count += 1
+        if count > loading_bar:
+            print(loading_bar, end='..', flush=True)
+            loading_bar += loading_increase
+
+
+def relative_path(key: tuple) -> str:
+    directory, name = key
+    return os.path.join(*directory, name)
+
+
+def metadata(item) -> dict:
+    st = item.stat()
+    return dict(size=st.st_size, mtime=int(st.st_mtime))
+
+
+def mismatch(nas_item, dropbox_item) -> str:
+    """Why the two copies of a file differ by their metadata, None if they do not"""
+    nas, dropbox = metadata(nas_item), metadata(dropbox_item)
+    if nas['size'] != dropbox['size']:
+        return 'size'
+    if abs(nas['mtime'] - dropbox['mtime']) > Constants.copy_mtime_tolerance:
+        return 'mtime'
+    return None
+
+
+def verify(batch: list, executor: ThreadPoolExecutor):
+    """Generator over the records of a batch of (path, nas entry, dropbox entry, reason). The NAS copies are
+    hashed in parallel and compared with the checksum in the catalog and the content_hash of the Dropbox copy."""
+    catalog_paths = {path: os.path.join(catalog_prefix, path) for path, _, _, _ in batch}
+    hashes = {Entry.hash_from_name(unicodedata.normalize(form, path))
+              for path in catalog_paths.values() for form in ('NFC', 'NFD')}
+    checksums = {normalized(item.full_path): item.checksum for item in reader.get_by_hashes(hashes, validate="off")}
+    dropbox_checksums = content_hashes(os.path.join(dropbox_remote, path) for path in catalog_paths.values())
 
-    counter += len(use_list)
-    if counter > loading_bar:
-        print(loading_bar, end='..', flush=True)
-        loading_bar += loading_increase
+    def check(item: tuple) -> dict:
+        path, nas_item, dropbox_item, reason = item
+        return verified(path, Factory.checksum(nas_item.path),
+                        dropbox_checksums.get(dropbox_key(os.path.join(dropbox_remote, catalog_paths[path]))),
+                        checksums.get(normalized(catalog_paths[path])), reason,
+                        metadata(nas_item), metadata(dropbox_item))
 
+    yield from executor.map(check, batch)
 
-def to_file(name, my_list):
-    with open(name, 'w', encoding='utf-8') as file:
-        file.writelines(line + '\n' for line in my_list)
+
+def dropbox_key(path: str) -> str:
+    """Dropbox paths do not depend on case"""
+    return normalized(path).lower()
+
+
+def content_hashes(paths) -> dict:
+    """The content_hash of the Dropbox files by dropbox_key of their path, taken from one listing of each of their
+    directories instead of asking for the metadata of every file. The last directory listed is kept, the walk is
+    sorted so the next batch may start in it."""
+    by_directory = dict()
+    for path in paths:
+        by_directory.setdefault(os.path.dirname(path), []).append(path)
+    hashes = dict()
+    for directory in sorted(by_directory):
+        if directory not in listings:
+            listings.clear()
+            try:
+                listings[directory] = {dropbox_key(item.path_display): item.content_hash
+                                       for item in dbox.list_dir(directory, path_only=False)}
+            except ApiError:
+                listings[directory] = dict()
+        for path in by_directory[directory]:
+            if dropbox_key(path) in listings[directory]:
+                hashes[dropbox_key(path)] = listings[directory][dropbox_key(path)]
+    return hashes
+
+
+def verified(path: str, nas_checksum: str, dropbox_checksum: str, catalog_checksum: str, reason: str,
+             nas: dict, dropbox: dict) -> dict:
+    if catalog_checksum is None and dropbox_checksum is None:
+        status = 'not_in_catalog_nor_on_dropbox'
+    elif catalog_checksum is None:
+        status = 'not_in_catalog' if nas_checksum == dropbox_checksum else 'copies_differ'
+    elif dropbox_checksum is None:
+        status = 'not_on_dropbox'
+    elif nas_checksum != catalog_checksum and dropbox_checksum != catalog_checksum:
+        status = 'both_differ'
+    elif nas_checksum != catalog_checksum:
+        status = 'nas_differs'
+    elif dropbox_checksum != catalog_checksum:
+        status = 'dropbox_differs'
+    else:
+        status = 'ok' if reason in ('sampled', 'full') else 'metadata_differs'
+    return dict(path=path, status=status, reason=reason, catalog=catalog_checksum,
+                nas=dict(nas, checksum=nas_checksum), dropbox=dict(dropbox, checksum=dropbox_checksum))
+
+
+def deep(pairs, output, verify_mode: str, sample_rate: int, threads: int) -> dict:
+    """Compare size and modification time of the files on both sides and verify the content of those that
+    differ, and of a sample or all of the others with verify_mode. One JSON record per line is written to output
+    for every file that is on one side only or whose copies differ. Returns the number of files per status."""
+    counts = dict()
+    sampled = itertools.count()
+    batch = []
+
+    def write(record: dict):
+        counts[record['status']] = counts.get(record['status'], 0) + 1
+        if record['status'] != 'ok':
+            output.write(json.dumps(record) + '\n')
+
+    with ThreadPoolExecutor(max(threads, 1)) as executor:
+        for key, nas_item, dropbox_item in pairs:
+            if nas_item is None or dropbox_item is None:
+                item = nas_item or dropbox_item
+                write(dict(path=relative_path(key), status='nas_only' if dropbox_item is None else 'dropbox_only',
+                           **(metadata(item) if item.is_file() else dict(directory=True))))
+                continue
+            if not nas_item.is_file() or not dropbox_item.is_file():
+                continue
+            reason = mismatch(nas_item, dropbox_item)
+            if reason is None and verify_mode == 'full':
+                reason = 'full'
+            elif reason is None and verify_mode == 'sampled' and next(sampled) % sample_rate == 0:
+                reason = 'sampled'
+            if reason is None:
+                counts['ok'] = counts.get('ok', 0) + 1
+                continue
+            batch.append((relative_path(key), nas_item, dropbox_item, reason))
+            if len(batch) >= Constants.precheck_batch_size:
+                for record in verify(batch, executor):
+                    write(record)
+                batch = []
+        for record in verify(batch, executor):
+            write(record)
+    return counts
 
 
 if __name__ == '__main__':
-    parser = argparse.ArgumentParser(description="""Scan both locations using os.listdir, which is fast.
+    parser = argparse.ArgumentParser(description="""Scan both locations in parallel, which is fast.
     Make use of the fact that Dropbox creates the dir entries locally. Check if both copies exist,
     create output files with one line each for items that are on only nas, or only dropbox.
-    Running this only makes sense if the sync between the two does not return anything to sync.""")
+    Running this only makes sense if the sync between the two does not return anything to sync.
+    With --deep the size and modification time of the copies are compared too, and the content of those that
+    differ is verified against the catalog. The results are written to a JSON lines file.""")
     parser.add_argument('year', nargs='?', type=str, help='Which year dir to check.')
+    parser.add_argument('--deep', action='store_true', help='Compare size and modification time of the copies')
+    parser.add_argument('--verify', choices=['mismatched', 'sampled', 'full'], default='mismatched',
+                        help="""With --deep, hash the copies that differ, also one in --sample_rate of the others,
+                        or all of them. Default: mismatched""")
+    parser.add_argument('--sample_rate', type=int, default=Constants.verify_sample_rate,
+                        help='Verify one in this many copies that do not differ with --verify sampled. Default: 100')
+    parser.add_argument('--verify_threads', type=int, default=4,
+                        help='Verify this many files in parallel. Default: 4')
+    parser.add_argument('--output', type=str, default='check_copies.jsonl',
+                        help='JSON lines file with the results of --deep. Default: check_copies.jsonl')
     root_arguments(parser)
+    walk_arguments(parser)
+    elastic_arguments(parser)
+    checksum_arguments(parser)
     args = parser.parse_args()
+    elastic.Connection.use_transport(args.pool_size, args.timeout, args.retries, args.compress)
 
     config = read_config()
-    nas_root = config['nas_root']
+    nas_root = args.nas_root if args.nas_root else config['nas_root']
     dropbox_root = config['dropbox_local']
+    catalog_prefix = args.year if args.year else ""
     if args.year:
         nas_root = os.path.join(nas_root, args.year)
         dropbox_root = os.path.join(dropbox_root, args.year)
 
-    walktree(nas_root, nas_list, len(nas_root))
-    loading_bar = 0
-    print(' ')
-    walktree(dropbox_root, dropbox_list, len(dropbox_root))
-    print(' ')
-
-    nas_list = sorted(nas_list)
-    dropbox_list = sorted(dropbox_list)
-    nas_only = []
-    dropbox_only = []
-
-    iterate_over = nas_list
-    min_len = len(nas_list)
-    if len(nas_list) > len(dropbox_list):
-        min_len = len(dropbox_list)
-    diff_len = False
-    if len(nas_list) != len(dropbox_list):
-        diff_len = True
-
-    print(len(nas_list), len(dropbox_list), len(iterate_over))
-
-    nas_index = 0
-    dropbox_index = 0
-    change_detected = 0
-    for i in range(0, min_len):
-        if nas_list[nas_index] != dropbox_list[dropbox_index]:
-            change: bool = True
-            change_detected += 1
-            while change:
-                change = False
-                while nas_list[nas_index] > dropbox_list[dropbox_index]:
-                    dropbox_only.append(dropbox_list[dropbox_index])
-                    dropbox_index += 1
-                    change = True
-                while nas_list[nas_index] < dropbox_list[dropbox_index]:
-                    nas_only.append(nas_list[nas_index])
-                    nas_index += 1
-                    change = True
-
-        nas_index += 1
-        dropbox_index += 1
-        if nas_index >= len(nas_list) or dropbox_index >= len(dropbox_list):
-            break
-
-    print(nas_index, dropbox_index, change_detected)
-    if diff_len:
-        for i in range(nas_index, len(nas_list)):
-            nas_only.append(nas_list[i])
-        for i in range(dropbox_index, len(dropbox_list)):
-            dropbox_only.append(dropbox_list[i])
-
-    if len(nas_only) > 0:
-        print(f"There are {len(nas_only)} files only on NAS. See nas_only.txt.")
-        to_file('nas_only.txt', nas_only)
-    if len(dropbox_only) > 0:
-        print(f"There are {len(dropbox_only)} files only on Dropbox. See dropbox_only.txt.")
-        to_file('dropbox_only.txt', dropbox_only)
+    nas_walk = walktree(nas_root, args.walk_threads, stat=args.deep)
+    dropbox_walk = walktree(dropbox_root, args.walk_threads, stat=args.deep)
+
+    if args.deep:
+        connection = elastic.Connection(args.host, args.port)
+        if args.index is not None:
+            connection.index = args.index
+        reader = elastic.Retrieve(connection)
+        dbox = DBox(True)
+        dropbox_remote = args.dropbox_root if args.dropbox_root else config['dropbox_root']
+        Factory.use_parallel_checksum(args.hash_threads)
+        with open(args.output, 'w', encoding='utf-8') as file:
+            counts = deep(merge(nas_walk, dropbox_walk), file, args.verify, args.sample_rate, args.verify_threads)
+        print(' ')
+        for status, count in sorted(counts.items()):
+            print(f"{status}: {count}")
+        print(f"See {args.output}.")
+    else:
+        nas_only = 0
+        dropbox_only = 0
+        with open('nas_only.txt', 'w', encoding='utf-8') as nas_file, \
+                open('dropbox_only.txt', 'w', encoding='utf-8') as dropbox_file:
+            for key, nas_item, dropbox_item in merge(nas_walk, dropbox_walk):
+                if dropbox_item is None:
+                    nas_file.write(nas_item.path[len(nas_root.rstrip(os.path.sep)):] + '\n')
+                    nas_only += 1
+                elif nas_item is None:
+                    dropbox_file.write(dropbox_item.path[len(dropbox_root.rstrip(os.path.sep)):] + '\n')
+                    dropbox_only += 1
+        print(' ')
+        if nas_only > 0:
+            print(f"There are {nas_only} files only on NAS. See nas_only.txt.")
+        else:
+            os.remove('nas_only.txt')
+        if dropbox_only > 0:
+            print(f"There are {dropbox_only} files only on Dropbox. See dropbox_only.txt.")
+        else:
+            os.remove('dropbox_only.txt')
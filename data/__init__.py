@@ -4,3 +4,10 @@ from .video import Video, InvalidVideoError
 from .factory import Factory, FactoryError, DropboxHash, FactoryZeroFileSizeError
 from .dbox import DBox, DBoxError, DBoxNoFileError
 from .directory import Folder
+from .cache import MetadataCache
+from .journal import DirectoryJournal
+from .geocode import GeocodeCache
+from .geocoder import Geocoder
+from .gazetteer import Gazetteer, GazetteerError
+from .isobmff import IsoBmff, IsoBmffError
+from .exif import Exif, ExifReader, ExifError
@@ -0,0 +1,120 @@
+import os
+import sqlite3
+import time
+from typing import Optional
+
+
+class MetadataCache:
+    """Persistent cache of the metadata extracted from files on disk, stored in a sqlite file.
+
+    Entries are keyed by device and inode. The size and the modification time (in ns) are stored with the record,
+    if they do not match the current stat() of the file, the entry is stale and is dropped. So changing a file
+    invalidates its entry automatically. The cache is capped to max_entries, the least recently used entries
+    are evicted first."""
+    __connection: sqlite3.Connection
+    __max_entries: int
+    __count: int
+    __pending: int
+    __hits: int
+    __misses: int
+    __evicted: int
+
+    COMMIT_EVERY: int = 1000
+    EVICT_FRACTION: float = 0.1
+
+    def __init__(self, filename: str, max_entries: int = 1000000):
+        self.__connection = sqlite3.connect(filename, timeout=60)
+        self.__connection.execute("""CREATE TABLE IF NOT EXISTS files (
+            dev INTEGER, ino INTEGER, st_size INTEGER, mtime_ns INTEGER, kind INTEGER,
+            modified INTEGER, size INTEGER, checksum TEXT, captured INTEGER, location TEXT, dimensions TEXT,
+            duration INTEGER, used REAL, PRIMARY KEY (dev, ino))""")
+        self.__connection.execute("CREATE INDEX IF NOT EXISTS files_used ON files (used)")
+        self.__connection.commit()
+        self.__max_entries = max_entries
+        self.__count = self.__connection.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+        self.__pending = 0
+        self.__hits = 0
+        self.__misses = 0
+        self.__evicted = 0
+
+    @property
+    def hits(self) -> int:
+        return self.__hits
+
+    @property
+    def misses(self) -> int:
+        return self.__misses
+
+    @property
+    def evicted(self) -> int:
+        return self.__evicted
+
+    def __len__(self) -> int:
+        return self.__count
+
+    def get(self, st: os.stat_result) -> Optional[tuple]:
+        """Return the cached record for the file with the given stat result, or None if it is not cached
+        or if the cached data is stale."""
+        row = self.__connection.execute(
+            "SELECT st_size, mtime_ns, kind, modified, size, checksum, captured, location, dimensions, duration "
+            "FROM files WHERE dev = ? AND ino = ?", (st.st_dev, st.st_ino)).fetchone()
+        if row is None:
+            self.__misses += 1
+            return None
+        if row[0] != st.st_size or row[1] != st.st_mtime_ns:
+            self.invalidate(st)
+            self.__misses += 1
+            return None
+        self.__hits += 1
+        self.__connection.execute("UPDATE files SET used = ? WHERE dev = ? AND ino = ?",
+                                  (time.time(), st.st_dev, st.st_ino))
+        self.__written()
+        return row[2:]
+
+    def put(self, st: os.stat_result, record: tuple) -> None:
+        """Store the record, see :meth:`Factory.to_record`, for the file with the given stat result."""
+        known = self.__connection.execute("SELECT 1 FROM files WHERE dev = ? AND ino = ?",
+                                          (st.st_dev, st.st_ino)).fetchone()
+        self.__connection.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                  (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns) + tuple(record) +
+                                  (time.time(),))
+        if not known:
+            self.__count += 1
+            if self.__count > self.__max_entries:
+                self.evict()
+        self.__written()
+
+    def invalidate(self, st: os.stat_result) -> None:
+        """Drop the entry of the file with the given stat result"""
+        cursor = self.__connection.execute("DELETE FROM files WHERE dev = ? AND ino = ?", (st.st_dev, st.st_ino))
+        self.__count -= cursor.rowcount
+        self.__written()
+
+    def evict(self) -> None:
+        """Remove the least recently used entries, so that there is room again for a fraction of max_entries"""
+        target = int(self.__max_entries * (1 - MetadataCache.EVICT_FRACTION))
+        if self.__count <= target:
+            return
+        cursor = self.__connection.execute(
+            "DELETE FROM files WHERE rowid IN (SELECT rowid FROM files ORDER BY used LIMIT ?)",
+            (self.__count - target,))
+        self.__count -= cursor.rowcount
+        self.__evicted += cursor.rowcount
+
+    def clear(self) -> None:
+        self.__connection.execute("DELETE FROM files")
+        self.__connection.commit()
+        self.__count = 0
+
+    def __written(self) -> None:
+        self.__pending += 1
+        if self.__pending >= MetadataCache.COMMIT_EVERY:
+            self.__connection.commit()
+            self.__pending = 0
+
+    def close(self) -> None:
+        self.__connection.commit()
+        self.__connection.close()
+
+    def print_stats(self) -> None:
+        print(f"Metadata cache: {self.hits} hits, {self.misses} misses, {self.evicted} evicted, {len(self)} entries")
@@ -0,0 +1,170 @@
+import json
+import math
+import os
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+class ChecksumSetError(ValueError):
+    def __init__(self, message: str):
+        super().__init__(message)
+
+
+class ChecksumSet:
+    """The checksums of the catalog as a sorted array of 32 byte digests in a .npy file, memory mapped and
+    searched with numpy.searchsorted, so a lookup touches only log2(n) pages and memory stays bounded.
+
+    Next to the array, <filename>.json keeps the highest elastic _seq_no exported, so the set can be refreshed
+    with only the entries indexed since, and <filename>.bloom.npy holds an optional Bloom filter that answers
+    most negative lookups without touching the array. Refreshing only adds checksums: after entries are deleted
+    from the catalog the set may still contain them until it is exported again in full."""
+    __filename: str
+    __digests: np.ndarray
+    __bloom: Optional[np.ndarray]
+    __bloom_hashes: int
+    __bloom_bits: int
+    __seq_no: int
+
+    dtype: str = 'S32'
+    CHUNK: int = 100000
+
+    def __init__(self, filename: str):
+        self.__filename = filename
+        self.__load()
+
+    def __load(self):
+        self.__seq_no = -1
+        self.__bloom = None
+        self.__bloom_hashes = 0
+        self.__bloom_bits = 0
+        if not os.path.exists(self.__filename):
+            self.__digests = np.empty(0, dtype=ChecksumSet.dtype)
+            return
+        self.__digests = np.load(self.__filename, mmap_mode='r')
+        with open(ChecksumSet.__meta_name(self.__filename), 'r') as file:
+            meta = json.load(file)
+        self.__seq_no = meta['seq_no']
+        self.__bloom_hashes = meta['bloom_hashes']
+        self.__bloom_bits = meta['bloom_bits']
+        if self.__bloom_hashes > 0:
+            self.__bloom = np.load(ChecksumSet.__bloom_name(self.__filename), mmap_mode='r')
+
+    def __len__(self) -> int:
+        return len(self.__digests)
+
+    def __contains__(self, checksum: str) -> bool:
+        return bool(self.contains_many([checksum])[0])
+
+    @property
+    def seq_no(self) -> int:
+        """The highest elastic _seq_no in the set, -1 if it is empty"""
+        return self.__seq_no
+
+    @property
+    def filename(self) -> str:
+        return self.__filename
+
+    def contains_many(self, checksums: List[str]) -> np.ndarray:
+        """Return a boolean array telling for each hex checksum whether it is in the set"""
+        keys = ChecksumSet.to_digests(checksums)
+        result = np.zeros(len(keys), dtype=bool)
+        if len(self.__digests) == 0 or len(keys) == 0:
+            return result
+        candidates = np.arange(len(keys))
+        if self.__bloom is not None:
+            candidates = candidates[ChecksumSet.__bloom_test(self.__bloom, self.__bloom_hashes, keys)]
+        index = np.searchsorted(self.__digests, keys[candidates])
+        inside = index < len(self.__digests)
+        result[candidates[inside]] = self.__digests[index[inside]] == keys[candidates[inside]]
+        return result
+
+    def add(self, entries: Iterable[Tuple[str, int]], bloom_bits: int = None, replace: bool = False):
+        """Merge (checksum, _seq_no) pairs, as returned by Retrieve.checksums_since, into the set and write it.
+        They are converted in chunks, so millions of entries never exist as Python strings at the same time.
+        bloom_bits is the number of Bloom filter bits per checksum, 0 for no filter and None to keep the current
+        setting. With replace the entries replace the current set."""
+        chunks = [np.asarray(self.__digests)] if len(self.__digests) and not replace else []
+        seq_no = -1 if replace else self.__seq_no
+        batch = []
+        added = 0
+        for checksum, entry_seq_no in entries:
+            batch.append(checksum)
+            added += 1
+            seq_no = max(seq_no, entry_seq_no)
+            if len(batch) == ChecksumSet.CHUNK:
+                chunks.append(np.unique(ChecksumSet.to_digests(batch)))
+                batch = []
+        chunks.append(ChecksumSet.to_digests(batch))
+        if bloom_bits is None:
+            bloom_bits = self.__bloom_bits
+        if added == 0 and not replace and bloom_bits == self.__bloom_bits and os.path.exists(self.__filename):
+            return
+        ChecksumSet.write(self.__filename, np.unique(np.concatenate(chunks)), seq_no, bloom_bits)
+        self.__load()
+
+    @staticmethod
+    def write(filename: str, digests: np.ndarray, seq_no: int, bloom_bits: int = 0):
+        """Write the sorted, unique digests. Each file is replaced atomically, the metadata last."""
+        bloom_hashes = 0
+        if bloom_bits > 0 and len(digests) > 0:
+            bloom_hashes = max(1, round(bloom_bits * math.log(2)))
+            bloom = ChecksumSet.__bloom_create(digests, len(digests) * bloom_bits, bloom_hashes)
+            ChecksumSet.__save(ChecksumSet.__bloom_name(filename), bloom)
+        ChecksumSet.__save(filename, digests)
+        temporary = ChecksumSet.__meta_name(filename) + ".tmp"
+        with open(temporary, 'w') as file:
+            json.dump({'seq_no': seq_no, 'count': len(digests), 'bloom_bits': bloom_bits,
+                       'bloom_hashes': bloom_hashes}, file)
+        os.replace(temporary, ChecksumSet.__meta_name(filename))
+
+    @staticmethod
+    def to_digests(checksums: Iterable[str]) -> np.ndarray:
+        try:
+            digests = [bytes.fromhex(c) for c in checksums]
+        except (TypeError, ValueError) as e:
+            raise ChecksumSetError(f"Invalid checksum: {e}")
+        if any(len(d) != 32 for d in digests):
+            raise ChecksumSetError("Checksums must be 32 bytes")
+        return np.array(digests, dtype=ChecksumSet.dtype)
+
+    @staticmethod
+    def __save(filename: str, array: np.ndarray):
+        temporary = filename + ".tmp.npy"
+        np.save(temporary, array)
+        os.replace(temporary, filename)
+
+    @staticmethod
+    def __meta_name(filename: str) -> str:
+        return filename + ".json"
+
+    @staticmethod
+    def __bloom_name(filename: str) -> str:
+        return filename + ".bloom.npy"
+
+    @staticmethod
+    def __bloom_positions(digests: np.ndarray, bits: int, hashes: int) -> np.ndarray:
+        """The digests are uniformly distributed already: use two of their 64 bit words for double hashing"""
+        words = digests.view('<u8').reshape(-1, 4)
+        h1, h2 = words[:, 0], words[:, 1] | np.uint64(1)
+        i = np.arange(hashes, dtype=np.uint64)
+        return (h1[:, None] + i[None, :] * h2[:, None]) % np.uint64(bits)
+
+    @staticmethod
+    def __bloom_create(digests: np.ndarray, bits: int, hashes: int) -> np.ndarray:
+        bits = (bits + 7) // 8 * 8
+        bloom = np.zeros(bits // 8, dtype=np.uint8)
+        for start in range(0, len(digests), ChecksumSet.CHUNK):
+            positions = ChecksumSet.__bloom_positions(digests[start:start + ChecksumSet.CHUNK], bits, hashes).ravel()
+            np.bitwise_or.at(bloom, positions >> np.uint64(3), ChecksumSet.__bloom_mask(positions))
+        return bloom
+
+    @staticmethod
+    def __bloom_test(bloom: np.ndarray, hashes: int, keys: np.ndarray) -> np.ndarray:
+        positions = ChecksumSet.__bloom_positions(keys, len(bloom) * 8, hashes)
+        set_bits = bloom[positions >> np.uint64(3)] & ChecksumSet.__bloom_mask(positions)
+        return np.all(set_bits != 0, axis=1)
+
+    @staticmethod
+    def __bloom_mask(positions: np.ndarray) -> np.ndarray:
+        return np.left_shift(np.uint8(1), (positions & np.uint64(7)).astype(np.uint8))
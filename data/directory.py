@@ -1,13 +1,37 @@
 import os
 import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from typing import List, Generator
-import reverse_geocoder
-import geopy
-import geopy.exc
 
 from tools import Constants, get_month_by_number
 from data.factory import Factory, FactoryError, FactoryZeroFileSizeError
 from data.entry import Entry
+from data.geocode import GeocodeCache
+from data.geocoder import Geocoder
+from data.gazetteer import Gazetteer
+
+
+EXTRACTED = "ok"
+INVALID = "invalid"
+EMPTY = "empty"
+
+
+def init_worker(checksum_workers: int) -> None:
+    """Set up a worker process of Folder.read: the metadata cache stays with the parent process"""
+    Factory.use_cache(None)
+    Factory.use_parallel_checksum(checksum_workers)
+
+
+def extract_record(path: str) -> tuple:
+    """Run Factory.from_path in a worker process and return the outcome as a small tuple that is cheap to send back:
+    (EXTRACTED, record) on success, (INVALID, None) for a FactoryError and (EMPTY, None) for a zero size file."""
+    try:
+        return EXTRACTED, Factory.to_record(Factory.from_path(path))
+    except FactoryError:
+        return INVALID, None
+    except FactoryZeroFileSizeError:
+        return EMPTY, None
 
 
 class Folder:
@@ -15,37 +39,58 @@ class Folder:
     __file_list: List[Entry]
     __invalid_types_found: set
     __valid_types_found: set
-    geo: geopy.geocoders.osm.Nominatim = geopy.geocoders.Nominatim(user_agent="my_catalog")
+    __workers: int
+    __pool: ProcessPoolExecutor
+    geocoder: Geocoder = Geocoder()
+    gazetteer: Gazetteer = None
+    geocode_cache: GeocodeCache = None
     __name_date: re.Pattern
     __name_date2: re.Pattern
     __path_date: re.Pattern
 
-    def __init__(self):
+    IN_FLIGHT_PER_WORKER: int = 4
+
+    def __init__(self, workers: int = 0):
+        """:param int workers: if more than 1, read extracts the file metadata in this many processes"""
         self.__file_list = []
         self.__invalid_types_found = set()
         self.__valid_types_found = set()
+        self.__workers = workers
+        self.__pool = None
         if not hasattr(type(self), "__name_date"):
             type(self).__name_date = re.compile('.*(?P<year>2[0-2]\d\d)(?P<mon>[0-1]\d)(?P<day>[0-3]\d).*')
             type(self).__name_date2 = re.compile('.*(?P<year>2[0-2]\d\d)-(?P<mon>[0-1]\d)-(?P<day>[0-3]\d).*')
             type(self).__path_date = re.compile('.*(?P<year>2[0-2]\d\d)/(?P<mon>[0-1]\d)/(?P<day>[0-3]\d).*')
 
-    def read(self, directory_name: str) -> None:
+    def read(self, directory_name: str, files: List[str] = None) -> None:
         """Read from a given directory all image and video files.
         The result can be retrieved as a list of data.entry objects,
         as a list of dictionary objects or as the generator with all entries.
         Entries are images or videos, according to data.image and data.video
 
         :param str directory_name: Name of the full path of the directory to scan.
+        :param list files: The paths of the files in the directory, if it was listed already.
         """
-        if not os.path.isdir(directory_name):
+        if files is None and not os.path.isdir(directory_name):
             raise NotADirectoryError(directory_name + " is not a directory!")
         self.__file_list.clear()
 
-        # scan the directory: fetch all data for files
-        with os.scandir(directory_name) as iterator:
-            for item in iterator:
-                if not item.name.startswith('.') and item.is_file():
-                    self.__add_entry(item.path)
+        if files is not None:
+            paths = [path for path in files if not os.path.basename(path).startswith('.')]
+        else:
+            # scan the directory: fetch all data for files
+            with os.scandir(directory_name) as iterator:
+                paths = [
+                    item.path
+                    for item in iterator
+                    if not item.name.startswith('.') and item.is_file()
+                ]
+
+        if self.__workers > 1:
+            self.__add_entries_in_parallel(paths)
+        else:
+            for path in paths:
+                self.__add_entry(path)
 
     def __add_entry(self, path: str) -> None:
         """Adding an entry based on the path, internal method. Will add to valid or invalid sets the type at hand"""
@@ -58,6 +103,54 @@ class Folder:
         except FactoryZeroFileSizeError:
             pass    # ignore files of zero size
 
+    def __add_entries_in_parallel(self, paths: List[str]) -> None:
+        """Extract the metadata in the worker pool. Only a bounded number of files is in flight at any time and the
+        results are taken in the order of the paths, so the file list is the same as when reading sequentially."""
+        pool = self.__get_pool()
+        pending = deque()
+        for path in paths:
+            if len(pending) >= self.__workers * Folder.IN_FLIGHT_PER_WORKER:
+                self.__add_result(*pending.popleft())
+            st = os.stat(path)
+            item = Factory.from_cache(path, st)
+            pending.append((path, st, item if item is not None else pool.submit(extract_record, path)))
+        while pending:
+            self.__add_result(*pending.popleft())
+
+    def __add_result(self, path: str, st: os.stat_result, result) -> None:
+        if isinstance(result, Entry):
+            self.__file_list.append(result)
+            self.__valid_types_found.add(result.type)
+            return
+
+        outcome, record = result.result()
+        if outcome == EXTRACTED:
+            Factory.add_to_cache(st, record)
+            item = Factory.from_record(path, record)
+            self.__file_list.append(item)
+            self.__valid_types_found.add(item.type)
+        elif outcome == INVALID:
+            self.__invalid_types_found.add(os.path.splitext(path.lower())[1])
+
+    def __get_pool(self) -> ProcessPoolExecutor:
+        """The pool is created on first use and kept for all further reads"""
+        if self.__pool is None:
+            self.__pool = ProcessPoolExecutor(max_workers=self.__workers, initializer=init_worker,
+                                              initargs=(Factory._checksum_workers,))
+        return self.__pool
+
+    def close(self) -> None:
+        """Shut down the worker processes, if any"""
+        if self.__pool is not None:
+            self.__pool.shutdown()
+            self.__pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
     def dbox_stream(self, iterable) -> None:
         """Read from an iterator. We expect each element to be already being an entry that we can add to
         the file list"""
@@ -124,18 +217,35 @@ class Folder:
             entry.save_path()
             entry.check_if_in_catalog = check
 
+    @staticmethod
+    def use_geocode_cache(cache: GeocodeCache):
+        """Keep the places found by update_name_from_location in the given cache, they are not looked up again"""
+        Folder.geocode_cache = cache
+
+    @staticmethod
+    def use_geocoder(geocoder: Geocoder):
+        """Look up addresses with the given Geocoder, e.g. for another Nominatim server or rate"""
+        Folder.geocoder = geocoder
+
+    @staticmethod
+    def use_gazetteer(gazetteer: Gazetteer):
+        """Find the nearest city of locations in the given Gazetteer instead of loading reverse_geocoder"""
+        Folder.gazetteer = gazetteer
+
     def update_name_from_location(self):
-        """In the given list resolve the city and append the location city to the filename"""
+        """In the given list resolve the city and append the location city to the filename.
+        Locations are looked up once per cell of the geocode grid, see GeocodeCache."""
+        cells = dict()
+        for entry in self.file_list:
+            if entry.location:
+                lat, lon = entry.location.split(',')
+                cells.setdefault(GeocodeCache.cell(float(lat), float(lon)), (float(lat), float(lon)))
+        places = Folder.__places(cells)
+
         for entry in self.file_list:
             if entry.location:
                 lat, lon = entry.location.split(',')
-                default_city = Folder.clean_name(reverse_geocoder.search([(float(lat), float(lon))])[0]['name'])
-                alt_city = []
-                try:
-                    alt_city = Folder.geo.reverse(entry.location, timeout=60).address.split(', ')
-                except geopy.exc.GeocoderTimedOut as e:
-                    print(f"Timeout on GeoLookup for {entry.location} of {entry.name}. Found {default_city} already.")
-                    raise FactoryError("Exiting.")
+                default_city, alt_city = places[GeocodeCache.cell(float(lat), float(lon))]
 
                 name, ext = os.path.splitext(entry.name)
                 known_city = ""
@@ -151,6 +261,39 @@ class Folder:
 
                 entry.name = name + ' ' + default_city + ext
 
+    @staticmethod
+    def __places(cells: dict) -> dict:
+        """The (default city, Nominatim address parts) of the cells, given with the coordinates of a location in
+        each. The nearest cities of the cells not in the cache are found in the gazetteer, or else with one
+        reverse_geocoder query for all of them, in this process, and their addresses are requested from Nominatim
+        concurrently. A cell whose address could not be found has the nearest city only, and is not cached, so that
+        it is looked up again next time."""
+        places = dict()
+        for cell in cells:
+            place = Folder.geocode_cache.get(cell) if Folder.geocode_cache is not None else None
+            if place is not None:
+                places[cell] = place
+        missing = [cell for cell in cells if cell not in places]
+        if not missing:
+            return places
+
+        if Folder.gazetteer is not None:
+            found = Folder.gazetteer.search([cells[cell] for cell in missing])
+        else:
+            import reverse_geocoder     # takes a while to import, and then to load its cities on first use
+            found = reverse_geocoder.search([cells[cell] for cell in missing], mode=1)
+        addresses = Folder.geocoder.reverse_all({cell: "{},{}".format(*cells[cell]) for cell in missing})
+        for cell, result in zip(missing, found):
+            default_city = Folder.clean_name(result['name'])
+            if addresses[cell] is None:
+                print(f"No address for {cells[cell]}, using {default_city}.")
+                places[cell] = default_city, []
+                continue
+            places[cell] = default_city, addresses[cell]
+            if Folder.geocode_cache is not None:
+                Folder.geocode_cache.put(cell, *places[cell])
+        return places
+
     @staticmethod
     def clean_name(name: str) -> str:
         if '/' in name:
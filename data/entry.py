@@ -1,7 +1,7 @@
 import os
+import sys
 import datetime
 import hashlib
-import inspect
 from tools import Constants
 
 
@@ -15,7 +15,18 @@ class Entry:
     that are stored in elastic as well as helper methods to be used in all tools.
 
     The catalog entries in Elastic contain only a subset, see the :class:`Constants` for details which ones.
-    Also there you see the mappings defined for Elastic."""
+    Also there you see the mappings defined for Elastic.
+
+    Entries use slots to stay small in large lists. The hashes and date strings derived from the attributes
+    are computed on first use and forgotten when the attributes they depend on are set.
+    Attributes that were never set raise AttributeError, as without slots."""
+    __slots__ = ("_id", "_name", "_path", "_dropbox", "_nas", "_size", "_modified", "_type", "_checksum",
+                 "_captured", "_location", "_dimensions", "_duration", "_original_path", "_check_if_in_catalog",
+                 "_dropbox_path", "_hash", "_path_hash", "_captured_str", "_modified_time_str")
+
+    def __init__(self):
+        self._hash = self._path_hash = self._captured_str = self._modified_time_str = None
+
     def __repr__(self):
         return "Entry"
 
@@ -34,8 +45,10 @@ class Entry:
     _duration: int
     _original_path: str
     _check_if_in_catalog: bool
+    _dropbox_path: bool
 
     date_time_format: str = "%Y-%m-%d %H-%M-%S"
+    serialized: tuple = tuple(sorted(Constants.attributes))     # the keys of to_dict, in this order
 
     @property
     def name(self):
@@ -81,39 +94,43 @@ class Entry:
     def captured(self):
         return self._captured
 
+    @property
+    def captured_utc(self):
+        return datetime.datetime.utcfromtimestamp(self.captured / 1000.0)
+
     @property
     def captured_str(self):
-        return datetime.datetime.utcfromtimestamp(self.captured / 1000.0) \
-            .strftime(Entry.date_time_format)  # , tz=datetime.timezone(datetime.timedelta(hours=1))
+        if self._captured_str is None:
+            # , tz=datetime.timezone(datetime.timedelta(hours=1))
+            self._captured_str = self.captured_utc.strftime(Entry.date_time_format)
+        return self._captured_str
 
     @property
     def captured_year(self):
-        return datetime.datetime.utcfromtimestamp(self.captured / 1000.0) \
-            .strftime("%Y")
+        return self.captured_utc.strftime("%Y")
 
     @property
     def captured_month(self):
-        return datetime.datetime.utcfromtimestamp(self.captured / 1000.0) \
-            .strftime("%m_%B")
+        return self.captured_utc.strftime("%m_%B")
 
     @property
     def modified_str(self):
-        return datetime.datetime.utcfromtimestamp(self.modified / 1000.0).isoformat()
+        return self.modified_ts.isoformat()
 
     @property
     def modified_time_str(self):
-        return datetime.datetime.utcfromtimestamp(self.modified / 1000.0) \
-            .strftime(Entry.date_time_format)  # , tz=datetime.timezone(datetime.timedelta(hours=1))
+        if self._modified_time_str is None:
+            # , tz=datetime.timezone(datetime.timedelta(hours=1))
+            self._modified_time_str = self.modified_ts.strftime(Entry.date_time_format)
+        return self._modified_time_str
 
     @property
     def modified_year(self):
-        return datetime.datetime.utcfromtimestamp(self.modified / 1000.0) \
-            .strftime("%Y")
+        return self.modified_ts.strftime("%Y")
 
     @property
     def modified_month(self):
-        return datetime.datetime.utcfromtimestamp(self.modified / 1000.0) \
-            .strftime("%m_%B")
+        return self.modified_ts.strftime("%m_%B")
 
     @property
     def modified_ts(self):
@@ -121,12 +138,16 @@ class Entry:
 
     @property
     def path_hash(self):
-        value = self.path + self.checksum
-        return hashlib.md5(value.encode()).hexdigest()
+        if self._path_hash is None:
+            value = self.path + self.checksum
+            self._path_hash = hashlib.md5(value.encode()).hexdigest()
+        return self._path_hash
 
     @property
     def hash(self):
-        return type(self).hash_from_name(self.full_path)
+        if self._hash is None:
+            self._hash = type(self).hash_from_name(self.full_path)
+        return self._hash
 
     @staticmethod
     def hash_from_name(path):
@@ -165,7 +186,8 @@ class Entry:
             raise EntryException(f"File name given must just be a name, not a path: {name}")
         base, image_type = os.path.splitext(name)
         self._name = name
-        self._type = image_type.lower()[1:]
+        self._type = sys.intern(image_type.lower()[1:])   # few distinct types, shared by all entries
+        self._hash = None
 
     @property
     def original_path(self):
@@ -174,6 +196,7 @@ class Entry:
     @path.setter
     def path(self, path: str):
         self._path = path
+        self._hash = self._path_hash = None
 
     @dropbox.setter
     def dropbox(self, flag: bool):
@@ -193,21 +216,37 @@ class Entry:
 
     @size.setter
     def size(self, size: int):
+        self._size = Entry.capped_size(size)
+
+    @staticmethod
+    def capped_size(size: int) -> int:
+        """The size as stored in the catalog"""
         if size > 2 ** 31 - 1:  # max it out at elasitc int size. happens for a few videos.
             size = 2 ** 31 - 2
-        self._size = size
+        return size
 
     @modified.setter
     def modified(self, modified: int):
         self._modified = int(modified)
+        self._modified_time_str = None
 
     @captured.setter
     def captured(self, c):
         self._captured = int(c)
+        self._captured_str = None
 
     @checksum.setter
     def checksum(self, checksum: str):
         self._checksum = checksum
+        self._path_hash = None
+
+    @property
+    def dropbox_path(self):
+        return self._dropbox_path if hasattr(self, "_dropbox_path") else False
+
+    @dropbox_path.setter
+    def dropbox_path(self, flag: bool):
+        self._dropbox_path = flag
 
     @property
     def id(self):
@@ -217,15 +256,23 @@ class Entry:
     def id(self, i):
         self._id = i
 
+    def use_hashes(self, hash_value: str, path_hash: str):
+        """Take hash and path_hash as stored in the catalog instead of computing them on first use"""
+        self._hash, self._path_hash = hash_value, path_hash
+
     def save_path(self):
         self._original_path = self.full_path
 
     def to_dict(self):
+        """The attributes stored in elastic that are set and not empty"""
         output = dict()
-        for name, value in inspect.getmembers(self, lambda a: not (inspect.isroutine(a))):
-            if name in Constants.attributes:
-                if value:
-                    output.update({name: value})
+        for name in Entry.serialized:
+            try:
+                value = getattr(self, name)
+            except AttributeError:
+                continue
+            if value:
+                output[name] = value
         return output
 
     def update(self, data: dict):
@@ -0,0 +1,230 @@
+from __future__ import annotations
+import struct
+from typing import Optional, Tuple
+from tools import Constants
+from data.isobmff import IsoBmff, IsoBmffError
+
+
+class ExifError(ValueError):
+    def __init__(self, message: str):
+        super().__init__(message)
+
+
+class Exif:
+    """The EXIF values used in the catalog: original date/time, GPS position and image dimensions.
+    bytes_read is the number of bytes that were read from the file to find them."""
+    date_time_original: Optional[str] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    bytes_read: int = 0
+
+    @staticmethod
+    def coord_from_dms(dms, ref) -> float:
+        """Convert degrees, minutes, seconds as fractions to a float, negative for south and west"""
+        factor = 1
+        if ref in ['S', 'W']:
+            factor = -1
+
+        coord = dms[0].numerator / dms[0].denominator
+        coord += dms[1].numerator / dms[1].denominator / 60.0
+        coord += dms[2].numerator / dms[2].denominator / 3600.0
+
+        return factor * round(coord, 5)
+
+    @staticmethod
+    def from_tags(tags: dict) -> Exif:
+        """Create from the tags returned by exifread.process_file"""
+        exif = Exif()
+        if Constants.exif_date_time_original in tags.keys():
+            exif.date_time_original = str(tags[Constants.exif_date_time_original])
+        if Constants.GPS['lat'] in tags.keys() and Constants.GPS['lon'] in tags.keys():
+            exif.latitude = Exif.coord_from_dms(tags[Constants.GPS['lat']].values,
+                                                tags[Constants.GPS['latR']].values)
+            exif.longitude = Exif.coord_from_dms(tags[Constants.GPS['lon']].values,
+                                                 tags[Constants.GPS['lonR']].values)
+        if Constants.exif_width in tags.keys():
+            exif.width = tags[Constants.exif_width].printable
+            exif.height = tags[Constants.exif_height].printable
+        return exif
+
+
+class Rational:
+    """An unsigned or signed TIFF rational, with the same interface as fractions.Fraction but without reducing."""
+    __slots__ = ("numerator", "denominator")
+
+    def __init__(self, numerator: int, denominator: int):
+        self.numerator = numerator
+        self.denominator = denominator
+
+
+class ExifReader:
+    """Read the EXIF values of JPEG (and MPO) files, TIFF based RAW files (orf, nef, cr2) and HEIC with bounded I/O.
+
+    For JPEG only the marker headers are read until the APP1 Exif segment, which is then read as one buffer.
+    For RAW files the first TIFF_WINDOW bytes are read as one buffer, which normally contains all IFDs needed.
+    Values outside of it are read individually. For HEIC see :meth:`IsoBmff.exif_item`.
+    Only IFD0, the Exif IFD and the GPS IFD are visited, thumbnails and maker notes are never followed."""
+    TIFF_WINDOW: int = 64 * 1024
+
+    EXIF_IFD: int = 0x8769
+    GPS_IFD: int = 0x8825
+    DATE_TIME_ORIGINAL: int = 0x9003
+    PIXEL_X_DIMENSION: int = 0xA002
+    PIXEL_Y_DIMENSION: int = 0xA003
+    GPS_LATITUDE_REF: int = 1
+    GPS_LATITUDE: int = 2
+    GPS_LONGITUDE_REF: int = 3
+    GPS_LONGITUDE: int = 4
+
+    __type_sizes: dict = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 6: 1, 7: 1, 8: 2, 9: 4, 10: 8}
+    __tiff_magic: tuple = (42, 0x4F52, 0x5352)    # plain TIFF, Olympus ORF variants
+
+    def __init__(self, file=None, buffer: bytes = b"", base: int = 0):
+        """The TIFF structure starts at offset base in the file. buffer holds the file contents from base on,
+        if the file is None, everything must be inside the buffer."""
+        self.__file = file
+        self.__buffer = buffer
+        self.__base = base
+        self.__order = '<'
+        self.bytes_read = len(buffer)
+
+    @staticmethod
+    def supports(image_type: str) -> bool:
+        return image_type in Constants.exif_jpeg_types or image_type in Constants.exif_tiff_types \
+            or image_type in Constants.exif_heif_types
+
+    @staticmethod
+    def read(path: str, image_type: str) -> Exif:
+        """Read the EXIF values of the file, raise ExifError if the file type is not supported or malformed"""
+        with open(path, 'rb') as file:
+            if image_type in Constants.exif_jpeg_types:
+                return ExifReader.from_jpeg(file)
+            if image_type in Constants.exif_tiff_types:
+                reader = ExifReader(file, file.read(ExifReader.TIFF_WINDOW))
+                return reader.parse()
+            if image_type in Constants.exif_heif_types:
+                return ExifReader.from_heif(file)
+        raise ExifError(f"Unsupported type {image_type}")
+
+    @staticmethod
+    def from_heif(file) -> Exif:
+        """Extract the Exif item from the meta box of a HEIF/HEIC file without decoding the image"""
+        container = IsoBmff(file)
+        try:
+            data = container.exif_item()
+        except IsoBmffError as e:
+            raise ExifError(str(e))
+        exif = ExifReader.from_tiff(data) if data is not None else Exif()
+        exif.bytes_read = container.bytes_read
+        return exif
+
+    @staticmethod
+    def from_jpeg(file) -> Exif:
+        bytes_read = 2
+        if file.read(2) != b'\xff\xd8':
+            raise ExifError("Not a JPEG file")
+        while True:
+            header = file.read(4)
+            bytes_read += len(header)
+            if len(header) < 4 or header[0] != 0xFF:
+                raise ExifError("Invalid JPEG marker")
+            marker, length = header[1], struct.unpack('>H', header[2:])[0]
+            if length < 2:
+                raise ExifError("Invalid JPEG segment length")
+            if marker in (0xDA, 0xD9):
+                exif = Exif()   # start of scan or end of image: no Exif in this file
+                exif.bytes_read = bytes_read
+                return exif
+            if marker == 0xE1:
+                segment = file.read(length - 2)
+                bytes_read += len(segment)
+                if segment.startswith(b'Exif\x00\x00'):
+                    exif = ExifReader.from_tiff(segment[6:])
+                    exif.bytes_read = bytes_read
+                    return exif
+            else:
+                file.seek(length - 2, 1)
+
+    @staticmethod
+    def from_tiff(data: bytes) -> Exif:
+        """Parse a TIFF structure that is completely in memory, as found in JPEG APP1 segments or HEIC Exif items"""
+        return ExifReader(buffer=data).parse()
+
+    def parse(self) -> Exif:
+        header = self.__fetch(0, 8)
+        if header[:2] == b'II':
+            self.__order = '<'
+        elif header[:2] == b'MM':
+            self.__order = '>'
+        else:
+            raise ExifError("Invalid TIFF byte order")
+        magic, ifd0 = struct.unpack(self.__order + 'HI', header[2:8])
+        if magic not in ExifReader.__tiff_magic:
+            raise ExifError(f"Invalid TIFF magic {magic}")
+
+        exif = Exif()
+        entries = self.__ifd(ifd0)
+        if ExifReader.EXIF_IFD in entries:
+            exif_entries = self.__ifd(self.__value(entries[ExifReader.EXIF_IFD])[0])
+            if ExifReader.DATE_TIME_ORIGINAL in exif_entries:
+                exif.date_time_original = self.__value(exif_entries[ExifReader.DATE_TIME_ORIGINAL])
+            if ExifReader.PIXEL_X_DIMENSION in exif_entries and ExifReader.PIXEL_Y_DIMENSION in exif_entries:
+                exif.width = self.__value(exif_entries[ExifReader.PIXEL_X_DIMENSION])[0]
+                exif.height = self.__value(exif_entries[ExifReader.PIXEL_Y_DIMENSION])[0]
+        if ExifReader.GPS_IFD in entries:
+            gps = self.__ifd(self.__value(entries[ExifReader.GPS_IFD])[0])
+            if ExifReader.GPS_LATITUDE in gps and ExifReader.GPS_LONGITUDE in gps:
+                exif.latitude = Exif.coord_from_dms(self.__value(gps[ExifReader.GPS_LATITUDE]),
+                                                    self.__optional_value(gps, ExifReader.GPS_LATITUDE_REF))
+                exif.longitude = Exif.coord_from_dms(self.__value(gps[ExifReader.GPS_LONGITUDE]),
+                                                     self.__optional_value(gps, ExifReader.GPS_LONGITUDE_REF))
+        exif.bytes_read = self.bytes_read
+        return exif
+
+    def __fetch(self, offset: int, length: int) -> bytes:
+        """Return length bytes at offset relative to the TIFF header, from the buffer or read from the file"""
+        if offset + length <= len(self.__buffer):
+            return self.__buffer[offset:offset + length]
+        if self.__file is None:
+            raise ExifError(f"Offset {offset} outside of the Exif data")
+        self.__file.seek(self.__base + offset)
+        data = self.__file.read(length)
+        self.bytes_read += len(data)
+        if len(data) != length:
+            raise ExifError(f"Offset {offset} outside of the file")
+        return data
+
+    def __ifd(self, offset: int) -> dict:
+        """Return the entries of the IFD at offset as a dict of tag to (type, count, value or offset field)"""
+        count = struct.unpack(self.__order + 'H', self.__fetch(offset, 2))[0]
+        data = self.__fetch(offset + 2, count * 12)
+        entries = dict()
+        for i in range(0, count):
+            tag, value_type, value_count = struct.unpack(self.__order + 'HHI', data[i * 12:i * 12 + 8])
+            entries[tag] = (value_type, value_count, data[i * 12 + 8:i * 12 + 12])
+        return entries
+
+    def __optional_value(self, entries: dict, tag: int):
+        return self.__value(entries[tag]) if tag in entries else None
+
+    def __value(self, entry: Tuple[int, int, bytes]):
+        """Decode an IFD entry: ASCII as a string, rationals as a list of Rational, integers as a list of int"""
+        value_type, count, field = entry
+        size = ExifReader.__type_sizes.get(value_type)
+        if size is None:
+            raise ExifError(f"Unknown TIFF type {value_type}")
+        if size * count <= 4:
+            data = field[:size * count]
+        else:
+            data = self.__fetch(struct.unpack(self.__order + 'I', field)[0], size * count)
+
+        if value_type == 2:
+            return data.split(b'\x00', 1)[0].decode('latin-1').strip()
+        if value_type in (5, 10):
+            fmt = 'I' if value_type == 5 else 'i'
+            values = struct.unpack(self.__order + fmt * 2 * count, data)
+            return [Rational(values[i], values[i + 1]) for i in range(0, len(values), 2)]
+        fmt = {1: 'B', 3: 'H', 4: 'I', 6: 'b', 7: 'B', 8: 'h', 9: 'i'}[value_type]
+        return list(struct.unpack(self.__order + fmt * count, data))
@@ -1,17 +1,21 @@
-from typing import Pattern
 from data.video import Video, InvalidVideoError
 from data.image import Image, InvalidImageError
 from data.other import Other, InvalidOtherError
+from data.cache import MetadataCache
+from data.isobmff import IsoBmff, IsoBmffError
+from data.exif import Exif, ExifReader, ExifError
 from tools import Constants
 import os
 import io
 import hashlib
+import itertools
 import exifread
 import pyheif
 import subprocess
-import inspect
-import re
+import json
 from datetime import datetime
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 
 class FactoryError(ValueError):
@@ -25,52 +29,123 @@ class FactoryZeroFileSizeError(ValueError):
 
 
 class Factory:
-    _duration: Pattern[str] = re.compile('.*(?P<hour>\d\d):(?P<min>\d\d):(?P<sec>\d\d)\.(?P<msec>\d+).*')
+    _cache: MetadataCache = None
+    _checksum_workers: int = 0
+    # the attributes copied from elastic hits, the others are derived from path and name
+    elastic_attributes: tuple = tuple(a for a in Constants.attributes
+                                      if a not in Constants.leave_out_when_reading_from_elastic)
+    _kinds: dict = {Constants.IMAGE_KIND: Image, Constants.VIDEO_KIND: Video, Constants.OTHER_KIND: Other}
+    _hydrated = itertools.count()
 
     def __init__(self):
         pass
 
     @staticmethod
-    def from_elastic_entry(e):
-        if e.kind == Constants.IMAGE_KIND:
-            item = Image()
-        elif e.kind == Constants.VIDEO_KIND:
-            item = Video()
-        elif e.kind == Constants.OTHER_KIND:
-            item = Other()
+    def from_elastic_entry(e, validate: str = "full"):
+        """Create an Image, Video or Other from an elasticsearch_dsl hit"""
+        return Factory.from_source(e.to_dict(), e.meta.id, validate)
+
+    @staticmethod
+    def from_source(source: dict, _id: str = None, validate: str = "full"):
+        """Create an Image, Video or Other from the _source of an elastic hit, as returned by elastic.
+        validate is one of Constants.validations: full recomputes hash and path_hash of every entry and compares
+        them with the stored ones, sampled does so for one in Constants.validate_sample_rate entries and off
+        trusts the stored hashes."""
+        name = source.get('name')
+        kind = source.get('kind')
+        if kind not in Factory._kinds:
+            raise FactoryError(f"Entry mismatch, wrong kind {kind} found for: {name}; id:{_id}")
+        if validate not in Constants.validations:
+            raise FactoryError(f"Unknown validation {validate}")
+
+        item = Factory._kinds[kind]()
+        item.path = source.get('path')
+        item.name = name
+        if source.get('type') != item.type:
+            raise FactoryError(f"Type mismatch for {name}")
+        for attr in Factory.elastic_attributes:
+            if attr in source:
+                setattr(item, attr, source[attr])
+        if validate == "full" or \
+                (validate == "sampled" and next(Factory._hydrated) % Constants.validate_sample_rate == 0):
+            if item.hash != source.get('hash'):
+                raise FactoryError(f"Hash mismatch for {name}")
+            if item.path_hash != source.get('path_hash'):
+                raise FactoryError(f"Path-hash mismatch for {name}")
         else:
-            raise FactoryError(f"Entry mismatch, wrong kind {e.kind} found for: {e.name}; id:{e.meta.id}")
-
-        item.full_path = os.path.join(e.path, e.name)
-        if e.type != item.type:
-            raise FactoryError(f"Type mismatch for {e.name}")
-        if e.kind != item.kind:
-            raise FactoryError(f"Kind mismatch for {e.name}")
-        for attr, value in inspect.getmembers(e, lambda a: not(inspect.isroutine(a))):
-            if attr not in Constants.leave_out_when_reading_from_elastic:
-                setattr(item, attr, value)
-        if item.hash != e.hash:
-            raise FactoryError(f"Hash mismatch for {e.name}")
-        if item.path_hash != e.path_hash:
-            raise FactoryError(f"Path-hash mismatch for {e.name}")
-        item.id = e.meta.id
+            item.use_hashes(source.get('hash'), source.get('path_hash'))
+        item.id = _id
 
         return item
 
+    @staticmethod
+    def use_cache(cache: MetadataCache):
+        """Use the given cache in from_path. Files that did not change since they were cached are not read again."""
+        Factory._cache = cache
+
     @staticmethod
     def from_path(path: str):
         """Create an Image or Video object based on a path name to one.
         Will throw exceptions if the item is neither or if it does not exist"""
+        st = os.stat(path)
+        cached = Factory.from_cache(path, st)
+        if cached is not None:
+            return cached
         try:
-            return Factory.__image_from_directory_item(path)
+            item = Factory.__image_from_directory_item(path, st)
         except InvalidImageError:
             try:
-                return Factory.__video_from_directory_item(path)
+                item = Factory.__video_from_directory_item(path, st)
             except InvalidVideoError:
                 try:
-                    return Factory.__other_from_directory_item(path)
+                    item = Factory.__other_from_directory_item(path, st)
                 except InvalidOtherError:
                     raise FactoryError(f"Path {path} is neither image nor video nor other")
+        Factory.add_to_cache(st, Factory.to_record(item))
+        return item
+
+    @staticmethod
+    def from_cache(path: str, st: os.stat_result):
+        """Return the entry for the path from the cache, None if there is no cache or the file is not cached"""
+        if Factory._cache is None:
+            return None
+        record = Factory._cache.get(st)
+        if record is None:
+            return None
+        try:
+            return Factory.from_record(path, record)
+        except (InvalidImageError, InvalidVideoError, InvalidOtherError):
+            return None     # renamed to another type since it was cached, read it again
+
+    @staticmethod
+    def add_to_cache(st: os.stat_result, record: tuple):
+        if Factory._cache is not None:
+            Factory._cache.put(st, record)
+
+    @staticmethod
+    def to_record(entry) -> tuple:
+        """Return the data extracted from a file as a compact tuple: the kind followed by the values of
+        Constants.record_attributes, None if not set."""
+        return (entry.kind,) + tuple(getattr(entry, attr, None) for attr in Constants.record_attributes)
+
+    @staticmethod
+    def from_record(path: str, record: tuple):
+        """Create an Image, Video or Other object from the path and the record created by to_record"""
+        kind = record[0]
+        if kind == Constants.IMAGE_KIND:
+            item = Image()
+        elif kind == Constants.VIDEO_KIND:
+            item = Video()
+        elif kind == Constants.OTHER_KIND:
+            item = Other()
+        else:
+            raise FactoryError(f"Record mismatch, wrong kind {kind} found for: {path}")
+
+        item.full_path = path
+        for attr, value in zip(Constants.record_attributes, record[1:]):
+            if value is not None:
+                setattr(item, attr, value)
+        return item
 
     @staticmethod
     def from_dropbox(entry):
@@ -92,14 +167,38 @@ class Factory:
         return result.update(entry)
 
     @staticmethod
-    def __image_from_directory_item(path: str) -> Image:
+    def __image_from_directory_item(path: str, st: os.stat_result) -> Image:
         image = Image()
-        Factory.__entry_from_directory_item(image, path)
+        Factory.__entry_from_directory_item(image, path, st)
         Factory.__add_captured_time_and_location(image, path)
         return image
 
     @staticmethod
     def __add_captured_time_and_location(image: Image, path: str):
+        exif = None
+        if ExifReader.supports(image.type):
+            try:
+                exif = ExifReader.read(path, image.type)
+            except ExifError:
+                pass    # let exifread have a go at it
+        if exif is None:
+            exif = Factory.__exif_from_exifread(image, path)
+
+        if exif.date_time_original is not None:
+            try:
+                dt = datetime.strptime(exif.date_time_original, Constants.exif_date_time_format)
+            except ValueError as e:
+                print(e)
+                print(image.full_path)
+            else:
+                image.captured = dt.timestamp() * 1000
+        if exif.latitude is not None and exif.longitude is not None:
+            image.set_location_from_lat_lon(exif.latitude, exif.longitude)
+        if exif.width is not None:
+            image.dimensions = f"{exif.width}x{exif.height}"
+
+    @staticmethod
+    def __exif_from_exifread(image: Image, path: str) -> Exif:
         with open(path, 'rb') as file:
             if image.type == 'heic':
                 i = pyheif.read_heif(file)
@@ -108,82 +207,67 @@ class Factory:
                         file = io.BytesIO(metadata['data'][6:])  # for some reason there is a leading 'Exif00' .. ignore
 
             tags = exifread.process_file(file, details=False)
-            if tags:
-                if Constants.exif_date_time_original in tags.keys():
-                    try:
-                        dt = datetime.strptime(str(tags[Constants.exif_date_time_original]),
-                                               Constants.exif_date_time_format)
-                    except ValueError as e:
-                        print(e)
-                        print(image.full_path)
-                    else:
-                        image.captured = dt.timestamp() * 1000
-                if Constants.GPS['lat'] in tags.keys() and Constants.GPS['lon'] in tags.keys():
-                    lat = Factory.__coord_from_dms(tags[Constants.GPS['lat']].values,
-                                                   tags[Constants.GPS['latR']].values)
-                    lon = Factory.__coord_from_dms(tags[Constants.GPS['lon']].values,
-                                                   tags[Constants.GPS['lonR']].values)
-                    image.set_location_from_lat_lon(lat, lon)
-                if Constants.exif_width in tags.keys():
-                    image.dimensions = f"{tags[Constants.exif_width].printable}x{tags[Constants.exif_height].printable}"
-
-    @staticmethod
-    def __coord_from_dms(dms, ref):
-        factor = 1
-        if ref in ['S', 'W']:
-            factor = -1
-
-        coord = dms[0].num / dms[0].den
-        coord += dms[1].num / dms[1].den / 60.0
-        coord += dms[2].num / dms[2].den / 3600.0
-
-        return factor * round(coord, 5)
-
-    @staticmethod
-    def __video_from_directory_item(path: str) -> Video:
+            return Exif.from_tags(tags if tags else {})
+
+    @staticmethod
+    def __video_from_directory_item(path: str, st: os.stat_result) -> Video:
         video = Video()
-        Factory.__entry_from_directory_item(video, path)
+        Factory.__entry_from_directory_item(video, path, st)
         Factory.__add_video_length_and_captured_time(video)
         return video
 
     @staticmethod
     def __add_video_length_and_captured_time(video: Video):
-        output = subprocess.run(['docker', 'run', '--rm',
-                                 '-v', f"{os.path.abspath(video.path)}:/files", 'sjourdan/ffprobe',
-                                f"/files/{video.name}"], capture_output=True)
+        """Read duration and creation time from the movie header for mp4 and QuickTime files,
+        use ffprobe for all other formats or if the header cannot be read."""
+        duration = creation_time = None
+        if video.type in Constants.iso_media_types:
+            try:
+                with open(video.full_path, 'rb') as file:
+                    duration, creation_time = IsoBmff(file).movie_header()
+            except IsoBmffError:
+                pass
+        if duration is None:
+            duration, creation_time = Factory.__probe_video(video.full_path)
+        if duration is not None:
+            video.duration = duration
+        if creation_time is not None:
+            video.captured = creation_time.timestamp() * 1000
+
+    @staticmethod
+    def __probe_video(path: str):
+        """Run a locally installed ffprobe, return duration in seconds and creation time, None if not found."""
+        output = subprocess.run(['ffprobe', '-v', 'quiet', '-print_format', 'json', '-show_format', path],
+                                capture_output=True)
         try:
-            lines = output.stderr.decode("utf-8").splitlines()
-        except UnicodeDecodeError:
-            lines = Factory.mydecode(output.stderr).splitlines()
-        for line in lines:
-            if line.find("Duration") > 0:
-                d = Factory._duration.match(line)
-                if d:
-                    video.duration = int(d.group('hour'))*3600 + int(d.group('min'))*60 + int(d.group('sec'))
-            if line.find("creation_time") > 0:
+            probe = json.loads(output.stdout)['format']
+        except (ValueError, KeyError):
+            print(f"ffprobe failed on {path}")
+            return None, None
+
+        duration = int(float(probe['duration'])) if 'duration' in probe else None
+        creation_time = None
+        if 'creation_time' in probe.get('tags', {}):
+            value = probe['tags']['creation_time']
+            for time_format in (Constants.video_creation_time_format, Constants.video_duration_format):
                 try:
-                    video.captured = datetime.strptime(line[line.find(':')+2:],
-                                                       Constants.video_duration_format).timestamp() * 1000
+                    creation_time = datetime.strptime(value[:19], time_format)
+                    break
                 except ValueError:
-                    try:
-                        video.captured = datetime.strptime(line[line.find(':')+2:].rstrip(),
-                                                           Constants.video_duration_format2).timestamp() * 1000
-                    except ValueError as e:
-                        print(line)
-                        print(video)
-                        print(lines)
-                        raise e
+                    continue
+            else:
+                print(f"Invalid creation time {value} in {path}")
+        return duration, creation_time
 
     @staticmethod
-    def __other_from_directory_item(path: str) -> Other:
+    def __other_from_directory_item(path: str, st: os.stat_result) -> Other:
         other = Other()
-        Factory.__entry_from_directory_item(other, path)
+        Factory.__entry_from_directory_item(other, path, st)
         return other
 
     @staticmethod
-    def __entry_from_directory_item(e, path: str):
+    def __entry_from_directory_item(e, path: str, st: os.stat_result):
         e.full_path = path
-        st = os.stat(path)
         e.modified = st.st_mtime * 1000
         e.size = st.st_size
         if e.size == 0:
@@ -191,13 +275,24 @@ class Factory:
         e.checksum = Factory.checksum(path)
 
     @staticmethod
-    def checksum(filename: str) -> str:
+    def use_parallel_checksum(workers: int):
+        """Hash files larger than one block with this many threads in from_path. 0 or 1 hashes sequentially."""
+        Factory._checksum_workers = workers
+
+    @staticmethod
+    def checksum(filename: str, workers: int = None) -> str:
         """Return the hex representation of the checksum on the full binary using the same method as dropbox.
-        See the description at https://www.dropbox.com/developers/reference/content-hash . Needs full path as input."""
+        See the description at https://www.dropbox.com/developers/reference/content-hash . Needs full path as input.
+        If workers is more than 1, the blocks of large files are hashed concurrently, the result is the same."""
+        if workers is None:
+            workers = Factory._checksum_workers
         hasher = DropboxHash()
         with open(filename, "rb") as f:
-            for chunk in iter(lambda: f.read(DropboxHash.block_size), b""):
-                hasher.update(chunk)
+            if workers > 1 and os.fstat(f.fileno()).st_size > DropboxHash.block_size:
+                hasher.update_from_file(f, workers)
+            else:
+                for chunk in iter(lambda: f.read(DropboxHash.block_size), b""):
+                    hasher.update(chunk)
         return hasher.dropbox_hash
 
     @staticmethod
@@ -223,9 +318,28 @@ class DropboxHash:
         self._hasher = hashlib.sha256()
 
     def update(self, chunk):
-        h = hashlib.sha256()
-        h.update(chunk)
-        self._hasher.update(h.digest())
+        self._hasher.update(DropboxHash.block_digest(chunk))
+
+    def update_from_file(self, file, workers: int):
+        """Read the whole file block by block and hash the blocks concurrently in a thread pool. hashlib releases
+        the GIL, so this uses as many cores as workers. The blocks are read into a fixed set of reused buffers,
+        a buffer is only filled again once its digest has been added, so the block digests are combined in order."""
+        buffers = [bytearray(DropboxHash.block_size) for _ in range(2 * workers)]
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for buffer in itertools.cycle(buffers):
+                if len(pending) == len(buffers):
+                    self._hasher.update(pending.popleft().result())
+                n = file.readinto(buffer)
+                if not n:
+                    break
+                pending.append(pool.submit(DropboxHash.block_digest, memoryview(buffer)[:n]))
+            while pending:
+                self._hasher.update(pending.popleft().result())
+
+    @staticmethod
+    def block_digest(block) -> bytes:
+        return hashlib.sha256(block).digest()
 
     @property
     def dropbox_hash(self):
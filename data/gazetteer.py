@@ -0,0 +1,165 @@
+import csv
+import math
+import mmap
+import struct
+from typing import Dict, Iterable, List, Tuple
+
+import numpy
+
+from tools.constants import Constants
+
+
+class GazetteerError(ValueError):
+    def __init__(self, message):
+        self.message = message
+
+
+class Gazetteer:
+    """The cities of the reverse_geocoder data set in a compact binary file, which is memory-mapped instead of
+    parsed, so looking up a few locations costs no startup time. Build it once with tools/build_gazetteer.py.
+
+    The cities are sorted by their cell in a grid of Constants.gazetteer_cell_degrees, and the offsets of the cells
+    are kept, so the cities near a location are one slice per row of cells. Names are stored once each. The
+    nearest city is found by great circle distance. reverse_geocoder takes the sine of the latitude in degrees for
+    its z coordinate, so it often finds another city nearby instead."""
+    __header = struct.Struct("<8sdIIII")
+    __magic = b"GAZETT01"
+
+    __map: mmap.mmap
+    __cell_degrees: float
+    __rows: int
+    __columns: int
+    __offsets: numpy.ndarray
+    __latitudes: numpy.ndarray
+    __longitudes: numpy.ndarray
+    __names: numpy.ndarray
+    __name_offsets: numpy.ndarray
+    __name_start: int
+
+    def __init__(self, filename: str):
+        with open(filename, 'rb') as file:
+            self.__map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.__map) < Gazetteer.__header.size:
+            raise GazetteerError(f"{filename} is not a gazetteer")
+        magic, self.__cell_degrees, self.__rows, self.__columns, count, names = \
+            Gazetteer.__header.unpack_from(self.__map)
+        if magic != Gazetteer.__magic:
+            raise GazetteerError(f"{filename} is not a gazetteer of this version, build it again")
+        position = Gazetteer.__header.size
+        arrays = []
+        for dtype, length in ((numpy.uint32, self.__rows * self.__columns + 1), (numpy.float32, count),
+                              (numpy.float32, count), (numpy.uint32, count), (numpy.uint32, names + 1)):
+            arrays.append(numpy.frombuffer(self.__map, dtype=dtype, count=length, offset=position))
+            position = Gazetteer.__aligned(position + arrays[-1].nbytes)
+        self.__offsets, self.__latitudes, self.__longitudes, self.__names, self.__name_offsets = arrays
+        self.__name_start = position
+
+    def __len__(self) -> int:
+        return len(self.__latitudes)
+
+    def search(self, locations: Iterable[Tuple[float, float]]) -> List[Dict]:
+        """The nearest city of each (latitude, longitude), as dicts with lat, lon and name like reverse_geocoder"""
+        results = []
+        for latitude, longitude in locations:
+            i = self.__nearest(latitude, longitude)
+            results.append({'lat': float(self.__latitudes[i]), 'lon': float(self.__longitudes[i]),
+                            'name': self.name(int(self.__names[i]))})
+        return results
+
+    def name(self, i: int) -> str:
+        start, end = self.__name_offsets[i], self.__name_offsets[i + 1]
+        return self.__map[self.__name_start + start:self.__name_start + end].decode('utf-8')
+
+    def close(self) -> None:
+        del self.__offsets, self.__latitudes, self.__longitudes, self.__names, self.__name_offsets
+        self.__map.close()
+
+    def __nearest(self, latitude: float, longitude: float) -> int:
+        # widen the window of cells around the location until it has a city, then look at all cells that may
+        # hold one nearer than that, which the window may not cover
+        row, column = Gazetteer.__cell(latitude, longitude, self.__cell_degrees, self.__rows, self.__columns)
+        if len(self) == 0:
+            raise GazetteerError("The gazetteer has no cities")
+        radius = 0
+        while True:
+            candidates = self.__window(range(row - radius, row + radius + 1), column - radius, column + radius)
+            if candidates.size:
+                break
+            radius += 1
+        distance = self.__distances(candidates, latitude, longitude).min()
+        candidates = self.__cap(latitude, longitude, distance)
+        return int(candidates[self.__distances(candidates, latitude, longitude).argmin()])
+
+    def __cap(self, latitude: float, longitude: float, distance: float) -> numpy.ndarray:
+        """The cities in the cells overlapping the circle of the angular distance around the location"""
+        degrees = math.degrees(distance) + self.__cell_degrees
+        south, north = latitude - degrees, latitude + degrees
+        if south <= -90 or north >= 90 or math.sin(distance) >= math.cos(math.radians(latitude)):
+            west, east = 0, self.__columns - 1
+        else:
+            spread = math.degrees(math.asin(math.sin(distance) / math.cos(math.radians(latitude))))
+            west = int(math.floor((longitude - spread + 180) / self.__cell_degrees)) - 1
+            east = int(math.floor((longitude + spread + 180) / self.__cell_degrees)) + 1
+        rows = range(int(math.floor((south + 90) / self.__cell_degrees)),
+                     int(math.floor((north + 90) / self.__cell_degrees)) + 1)
+        return self.__window(rows, west, east)
+
+    def __window(self, rows: range, west: int, east: int) -> numpy.ndarray:
+        """The indices of the cities in the cells of the rows from column west to east, wrapping around"""
+        if east - west + 1 >= self.__columns:
+            west, east = 0, self.__columns - 1
+        west %= self.__columns
+        east %= self.__columns
+        spans = [(west, east)] if west <= east else [(west, self.__columns - 1), (0, east)]
+        slices = [numpy.arange(self.__offsets[row * self.__columns + first],
+                               self.__offsets[row * self.__columns + last + 1])
+                  for row in rows if 0 <= row < self.__rows for first, last in spans]
+        return numpy.concatenate(slices) if slices else numpy.empty(0, dtype=numpy.int64)
+
+    def __distances(self, candidates: numpy.ndarray, latitude: float, longitude: float) -> numpy.ndarray:
+        """Angular distances in radians from the location to the candidates"""
+        lat1, lon1 = math.radians(latitude), math.radians(longitude)
+        lat2 = numpy.radians(self.__latitudes[candidates].astype(numpy.float64))
+        lon2 = numpy.radians(self.__longitudes[candidates].astype(numpy.float64))
+        a = numpy.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * numpy.cos(lat2) * numpy.sin((lon2 - lon1) / 2) ** 2
+        return 2 * numpy.arcsin(numpy.sqrt(numpy.clip(a, 0, 1)))
+
+    @staticmethod
+    def __cell(latitude: float, longitude: float, cell_degrees: float, rows: int, columns: int) -> Tuple[int, int]:
+        row = min(max(int(math.floor((latitude + 90) / cell_degrees)), 0), rows - 1)
+        return row, int(math.floor((longitude + 180) / cell_degrees)) % columns
+
+    @staticmethod
+    def __aligned(position: int) -> int:
+        return (position + 7) // 8 * 8
+
+    @staticmethod
+    def build(csv_file: str, filename: str, cell_degrees: float = Constants.gazetteer_cell_degrees) -> int:
+        """Write the gazetteer of the cities in the csv file of reverse_geocoder, with columns lat, lon and name.
+        Returns the number of cities."""
+        latitudes, longitudes, names = [], [], []
+        interned = dict()
+        with open(csv_file, newline='', encoding='utf-8') as file:
+            for row in csv.DictReader(file):
+                latitudes.append(float(row['lat']))
+                longitudes.append(float(row['lon']))
+                names.append(interned.setdefault(row['name'], len(interned)))
+        rows, columns = int(math.ceil(180 / cell_degrees)), int(math.ceil(360 / cell_degrees))
+        cells = numpy.array([r * columns + c for r, c in (Gazetteer.__cell(lat, lon, cell_degrees, rows, columns)
+                                                          for lat, lon in zip(latitudes, longitudes))],
+                            dtype=numpy.int64)
+        order = numpy.argsort(cells, kind='stable')
+        offsets = numpy.concatenate(([0], numpy.cumsum(numpy.bincount(cells, minlength=rows * columns))))
+        encoded = [name.encode('utf-8') for name in interned]
+        name_offsets = numpy.concatenate(([0], numpy.cumsum([len(name) for name in encoded])))
+
+        with open(filename, 'wb') as file:
+            file.write(Gazetteer.__header.pack(Gazetteer.__magic, cell_degrees, rows, columns, len(latitudes),
+                                               len(encoded)))
+            for array in (offsets.astype(numpy.uint32), numpy.array(latitudes, dtype=numpy.float32)[order],
+                          numpy.array(longitudes, dtype=numpy.float32)[order],
+                          numpy.array(names, dtype=numpy.uint32)[order], name_offsets.astype(numpy.uint32)):
+                file.write(array.tobytes())
+                file.write(b"\0" * (Gazetteer.__aligned(file.tell()) - file.tell()))
+            file.write(b"".join(encoded))
+        return len(latitudes)
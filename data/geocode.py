@@ -0,0 +1,62 @@
+import json
+import sqlite3
+from typing import List, Optional, Tuple
+
+from tools.constants import Constants
+
+
+class GeocodeCache:
+    """Persistent cache of reverse geocoding results, stored in a sqlite file.
+
+    Locations are keyed by their cell in a grid of Constants.geocode_precision decimal places of latitude and
+    longitude, 2 is about a kilometer, so all photos taken at one place share an entry. The city found by
+    reverse_geocoder and the address parts returned by Nominatim are stored. The city is derived from the address
+    when it is used, so it follows changes to Constants.known_locations."""
+    __connection: sqlite3.Connection
+    __hits: int
+    __misses: int
+
+    def __init__(self, filename: str):
+        self.__connection = sqlite3.connect(filename, timeout=60)
+        self.__connection.execute("""CREATE TABLE IF NOT EXISTS places (
+            cell TEXT PRIMARY KEY, default_city TEXT, address TEXT)""")
+        self.__connection.commit()
+        self.__hits = 0
+        self.__misses = 0
+
+    @property
+    def hits(self) -> int:
+        return self.__hits
+
+    @property
+    def misses(self) -> int:
+        return self.__misses
+
+    def __len__(self) -> int:
+        return self.__connection.execute("SELECT COUNT(*) FROM places").fetchone()[0]
+
+    @staticmethod
+    def cell(latitude: float, longitude: float, precision: int = Constants.geocode_precision) -> str:
+        return f"{round(latitude, precision):.{precision}f},{round(longitude, precision):.{precision}f}"
+
+    def get(self, cell: str) -> Optional[Tuple[str, List[str]]]:
+        """Return (default city, Nominatim address parts) of the cell, or None if it is not cached"""
+        row = self.__connection.execute("SELECT default_city, address FROM places WHERE cell = ?",
+                                        (cell,)).fetchone()
+        if row is None:
+            self.__misses += 1
+            return None
+        self.__hits += 1
+        return row[0], json.loads(row[1])
+
+    def put(self, cell: str, default_city: str, address: List[str]) -> None:
+        self.__connection.execute("INSERT OR REPLACE INTO places VALUES (?, ?, ?)",
+                                  (cell, default_city, json.dumps(address)))
+        self.__connection.commit()
+
+    def print_stats(self) -> None:
+        print(f"Geocode cache: {self.__hits} hits, {self.__misses} misses, {len(self)} places")
+
+    def close(self) -> None:
+        self.__connection.commit()
+        self.__connection.close()
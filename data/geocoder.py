@@ -0,0 +1,98 @@
+import asyncio
+import time
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+import geopy
+import geopy.exc
+
+from tools.constants import Constants
+
+
+class TokenBucket:
+    """Rate limiter for the coroutines of one event loop: acquire waits until one of up to burst tokens is
+    available, tokens come back at rate per second. Nothing is awaited between the check and taking the token,
+    so no lock is needed."""
+    __rate: float
+    __burst: float
+    __tokens: float
+    __updated: float
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.__rate = rate
+        self.__burst = burst
+        self.__tokens = burst
+        self.__updated = time.monotonic()
+
+    async def acquire(self) -> None:
+        while True:
+            now = time.monotonic()
+            self.__tokens = min(self.__burst, self.__tokens + (now - self.__updated) * self.__rate)
+            self.__updated = now
+            if self.__tokens >= 1:
+                self.__tokens -= 1
+                return
+            await asyncio.sleep((1 - self.__tokens) / self.__rate)
+
+
+class Geocoder:
+    """Reverse geocode many locations with Nominatim at once, from an asyncio queue served by a bounded number of
+    workers. The requests are spread by a token bucket to the rate the usage policy of the server allows, the
+    public one allows one per second. Failed requests are retried with exponential backoff, a location that
+    still fails has no address, so that the caller falls back to the offline result of reverse_geocoder.
+
+    The url of the server is configurable, e.g. to use a local stand-in for benchmarks and tests. The blocking
+    geopy requests are run in the default thread pool of the event loop."""
+    __nominatim: geopy.geocoders.Nominatim
+    __bucket: TokenBucket
+    __workers: int
+    __retries: int
+    __backoff: float
+    __timeout: float
+
+    def __init__(self, url: str = Constants.nominatim_url, rate: float = Constants.nominatim_rate,
+                 workers: int = Constants.nominatim_workers, retries: int = Constants.nominatim_retries,
+                 backoff: float = Constants.nominatim_backoff, timeout: float = Constants.nominatim_timeout):
+        parts = urlsplit(url)
+        self.__nominatim = geopy.geocoders.Nominatim(user_agent="my_catalog", scheme=parts.scheme,
+                                                     domain=parts.netloc + parts.path.rstrip('/'))
+        self.__bucket = TokenBucket(rate)
+        self.__workers = max(workers, 1)
+        self.__retries = retries
+        self.__backoff = backoff
+        self.__timeout = timeout
+
+    def reverse_all(self, locations: Dict[str, str]) -> Dict[str, Optional[List[str]]]:
+        """The address parts of the given 'lat,lon' locations by their keys, None where the lookup failed"""
+        if not locations:
+            return dict()
+        return asyncio.run(self.__reverse_all(locations))
+
+    async def __reverse_all(self, locations: Dict[str, str]) -> Dict[str, Optional[List[str]]]:
+        queue = asyncio.Queue()
+        for key, location in locations.items():
+            queue.put_nowait((key, location))
+        addresses = dict()
+
+        async def worker():
+            while not queue.empty():
+                key, location = queue.get_nowait()
+                addresses[key] = await self.__reverse(location)
+
+        await asyncio.gather(*(worker() for _ in range(min(self.__workers, len(locations)))))
+        return addresses
+
+    async def __reverse(self, location: str) -> Optional[List[str]]:
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.__retries + 1):
+            await self.__bucket.acquire()
+            try:
+                place = await loop.run_in_executor(
+                    None, lambda: self.__nominatim.reverse(location, timeout=self.__timeout))
+            except geopy.exc.GeocoderServiceError as e:
+                if attempt == self.__retries:
+                    print(f"GeoLookup for {location} failed: {e}")
+                    return None
+                await asyncio.sleep(self.__backoff * 2 ** attempt)
+            else:
+                return place.address.split(', ') if place is not None else []
@@ -10,9 +10,10 @@ class InvalidImageError(ValueError):
 
 class Image(Entry):
     """This is the image entry in the catalog."""
+    __slots__ = ()
 
     def __init__(self):
-        pass
+        super().__init__()
 
     def __repr__(self):
         return str(self.to_dict())
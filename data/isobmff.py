@@ -0,0 +1,172 @@
+import io
+import os
+import struct
+from datetime import datetime, timedelta
+from typing import Generator, Optional, Tuple
+
+
+class IsoBmffError(ValueError):
+    def __init__(self, message: str):
+        super().__init__(message)
+
+
+class IsoBmff:
+    """Minimal reader for the ISO base media file format, the box structure of mp4, mov, m4v, 3gp and heic files.
+    Boxes are located by reading only their 8 or 16 byte headers and seeking over the payload, so a large
+    mdat box is never read. bytes_read counts what was actually read from the file."""
+    __file = None
+    __size: int
+    bytes_read: int
+
+    epoch: datetime = datetime(1904, 1, 1)  # times in the movie header are seconds since this date
+
+    MAX_META_SIZE: int = 1024 * 1024
+
+    def __init__(self, file, size: int = None):
+        """Read from an open binary file. For in-memory files without a file descriptor pass the size."""
+        self.__file = file
+        self.__size = size if size is not None else os.fstat(file.fileno()).st_size
+        self.bytes_read = 0
+
+    @property
+    def size(self) -> int:
+        return self.__size
+
+    def read(self, start: int, length: int) -> bytes:
+        self.__file.seek(start)
+        data = self.__file.read(length)
+        self.bytes_read += len(data)
+        if len(data) != length:
+            raise IsoBmffError(f"Truncated file, expected {length} bytes at {start}")
+        return data
+
+    def boxes(self, start: int = 0, end: int = None) -> Generator[Tuple[str, int, int], None, None]:
+        """Iterate over the boxes between start and end, yield the type and the start and end of the payload"""
+        if end is None:
+            end = self.__size
+        position = start
+        while position + 8 <= end:
+            size, box_type = struct.unpack('>I4s', self.read(position, 8))
+            header_size = 8
+            if size == 1:
+                size = struct.unpack('>Q', self.read(position + 8, 8))[0]
+                header_size = 16
+            elif size == 0:
+                size = end - position   # box extends to the end of the enclosing box
+            if size < header_size or position + size > end:
+                raise IsoBmffError(f"Invalid box size {size} of {box_type} at {position}")
+            yield box_type.decode('latin-1'), position + header_size, position + size
+            position += size
+
+    def find(self, path: Tuple[str, ...], start: int = 0, end: int = None) -> Optional[Tuple[int, int]]:
+        """Return start and end of the payload of the box at the given path of box types, e.g. ('moov', 'mvhd').
+        Returns None if there is no such box."""
+        for box_type, payload_start, payload_end in self.boxes(start, end):
+            if box_type == path[0]:
+                if len(path) == 1:
+                    return payload_start, payload_end
+                return self.find(path[1:], payload_start, payload_end)
+        return None
+
+    def movie_header(self) -> Tuple[int, Optional[datetime]]:
+        """Return the duration in seconds and the creation time from the moov/mvhd box. The creation time is None
+        if it is not set in the file."""
+        box = self.find(('moov', 'mvhd'))
+        if box is None:
+            raise IsoBmffError("No movie header found")
+        start, end = box
+        version = self.read(start, 1)[0]
+        if version == 1:
+            created, _, timescale, duration = struct.unpack('>QQIQ', self.read(start + 4, 28))
+        else:
+            created, _, timescale, duration = struct.unpack('>IIII', self.read(start + 4, 16))
+        if timescale == 0:
+            raise IsoBmffError("Invalid timescale in movie header")
+
+        creation_time = IsoBmff.epoch + timedelta(seconds=created) if created else None
+        return duration // timescale, creation_time
+
+    def exif_item(self) -> Optional[bytes]:
+        """Return the TIFF structure of the Exif item of a HEIF/HEIC image, None if there is none.
+        Only the meta box is read, its item info (iinf) and item location (iloc) boxes give the position of the
+        Exif item, which is then read on its own. The image itself is never read or decoded."""
+        box = self.find(('meta',))
+        if box is None:
+            return None
+        start, end = box
+        if end - start > IsoBmff.MAX_META_SIZE:
+            raise IsoBmffError(f"Meta box too large: {end - start}")
+        payload = self.read(start, end - start)
+        meta = IsoBmff(io.BytesIO(payload), len(payload))
+        children = {
+            box_type: (payload_start, payload_end)
+            for box_type, payload_start, payload_end in meta.boxes(4)   # meta is a full box: skip version, flags
+        }
+        if 'iinf' not in children or 'iloc' not in children:
+            raise IsoBmffError("No item information in meta box")
+
+        item_id = meta.__exif_item_id(*children['iinf'])
+        if item_id is None:
+            return None
+        construction_method, extents = meta.__item_location(*children['iloc'], item_id)
+        if construction_method == 0:
+            data = b"".join(self.read(offset, length) for offset, length in extents)
+        elif construction_method == 1 and 'idat' in children:
+            data = b"".join(meta.read(children['idat'][0] + offset, length) for offset, length in extents)
+        else:
+            raise IsoBmffError(f"Unsupported item construction method {construction_method}")
+
+        # the Exif item starts with the offset to the TIFF header, usually skipping an 'Exif\0\0' prefix
+        if len(data) < 4:
+            raise IsoBmffError("Exif item too short")
+        tiff_offset = struct.unpack('>I', data[:4])[0]
+        return data[4 + tiff_offset:]
+
+    def __exif_item_id(self, start: int, end: int) -> Optional[int]:
+        """Find the ID of the item of type 'Exif' in the item info box"""
+        version = self.read(start, 1)[0]
+        first = start + (6 if version == 0 else 8)  # version and flags, then a 16 or 32 bit entry count
+        for box_type, payload_start, payload_end in self.boxes(first, end):
+            if box_type != 'infe':
+                continue
+            version = self.read(payload_start, 1)[0]
+            if version == 2:
+                item_id, _, item_type = struct.unpack('>HH4s', self.read(payload_start + 4, 8))
+            elif version == 3:
+                item_id, _, item_type = struct.unpack('>IH4s', self.read(payload_start + 4, 10))
+            else:
+                continue    # versions 0 and 1 have no item type
+            if item_type == b'Exif':
+                return item_id
+        return None
+
+    def __item_location(self, start: int, end: int, item_id: int) -> Tuple[int, list]:
+        """Return construction method and a list of (offset, length) extents of the item from the item location box"""
+        data = self.read(start, end - start)
+        version = data[0]
+        offset_size, length_size = data[4] >> 4, data[4] & 0x0F
+        base_offset_size, index_size = data[5] >> 4, (data[5] & 0x0F if version in (1, 2) else 0)
+        position = 6
+
+        def number(size: int) -> int:
+            nonlocal position
+            value = int.from_bytes(data[position:position + size], 'big')
+            position += size
+            return value
+
+        item_count = number(4 if version == 2 else 2)
+        for _ in range(0, item_count):
+            current_id = number(4 if version == 2 else 2)
+            construction_method = number(2) & 0x0F if version in (1, 2) else 0
+            number(2)   # data reference index
+            base_offset = number(base_offset_size)
+            extents = []
+            for _ in range(0, number(2)):
+                number(index_size)
+                offset = base_offset + number(offset_size)
+                extents.append((offset, number(length_size)))
+            if current_id == item_id:
+                if any(length == 0 for _, length in extents):
+                    raise IsoBmffError("Items extending to the end of the file are not supported")
+                return construction_method, extents
+        raise IsoBmffError(f"No location for item {item_id}")
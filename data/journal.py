@@ -0,0 +1,61 @@
+import hashlib
+import sqlite3
+from typing import Iterable, List, Set
+
+
+class DirectoryJournal:
+    """Persistent state of the directories at the last successful sync with the catalog, stored in a sqlite file.
+
+    A directory is fingerprinted by its modification time (in ns), its number of entries and a digest of their
+    names. If the fingerprint of a directory is the recorded one, no file was added, removed or renamed in it
+    since, and it does not need to be compared with the catalog again. Directories are keyed by their path
+    relative to the catalog root."""
+    __connection: sqlite3.Connection
+
+    def __init__(self, filename: str):
+        self.__connection = sqlite3.connect(filename, timeout=60)
+        self.__connection.execute("""CREATE TABLE IF NOT EXISTS directories (
+            path TEXT PRIMARY KEY, mtime_ns INTEGER, count INTEGER, digest TEXT)""")
+        self.__connection.commit()
+
+    def __len__(self) -> int:
+        return self.__connection.execute("SELECT COUNT(*) FROM directories").fetchone()[0]
+
+    @staticmethod
+    def fingerprint(mtime_ns: int, names: Iterable[str]) -> tuple:
+        names = sorted(names)
+        return mtime_ns, len(names), hashlib.md5("\0".join(names).encode()).hexdigest()
+
+    def unchanged(self, directory: str, fingerprint: tuple) -> bool:
+        row = self.__connection.execute("SELECT mtime_ns, count, digest FROM directories WHERE path = ?",
+                                        (directory,)).fetchone()
+        return row is not None and tuple(row) == tuple(fingerprint)
+
+    def directories_below(self, directory: str) -> List[str]:
+        """The journaled directories below and including directory, all of them for the root ''"""
+        if directory == "":
+            rows = self.__connection.execute("SELECT path FROM directories")
+        else:
+            prefix = directory + "/"
+            rows = self.__connection.execute(
+                "SELECT path FROM directories WHERE path = ? OR substr(path, 1, ?) = ?",
+                (directory, len(prefix), prefix))
+        return [row[0] for row in rows]
+
+    def update(self, directory: str, fingerprints: dict, unsynced: Set[str] = frozenset()) -> None:
+        """Replace the journal below directory with the fingerprints of the directories found there by a sync.
+        The unsynced directories are left out, so that they are compared again next time."""
+        with self.__connection:
+            for path in self.directories_below(directory):
+                self.__connection.execute("DELETE FROM directories WHERE path = ?", (path,))
+            self.__connection.executemany(
+                "INSERT OR REPLACE INTO directories VALUES (?, ?, ?, ?)",
+                ((path,) + tuple(fingerprint) for path, fingerprint in fingerprints.items() if path not in unsynced))
+
+    def clear(self) -> None:
+        self.__connection.execute("DELETE FROM directories")
+        self.__connection.commit()
+
+    def close(self) -> None:
+        self.__connection.commit()
+        self.__connection.close()
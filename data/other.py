@@ -10,9 +10,10 @@ class InvalidOtherError(ValueError):
 
 class Other(Entry):
     """This is the other entry in the catalog. Files we want to keep but are not images or videos"""
+    __slots__ = ()
 
     def __init__(self):
-        pass
+        super().__init__()
 
     def __repr__(self):
         return str(self.to_dict())
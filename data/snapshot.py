@@ -0,0 +1,242 @@
+import datetime
+import json
+import os
+from typing import Generator, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+
+
+class SnapshotError(ValueError):
+    def __init__(self, message: str):
+        super().__init__(message)
+
+
+class Snapshot:
+    """A local columnar copy of the catalog in a directory of .npy files, memory mapped on load.
+
+    Numbers and flags are one array per attribute, checksum, hash and path_hash are fixed width byte arrays of
+    their digests, all zero if the entry has none. Paths are interned into a sorted table that rows refer to by
+    index, and names are kept in one utf-8 blob with offsets. Queries are evaluated on whole columns with numpy
+    and return arrays of row numbers.
+
+    meta.json keeps the highest elastic _seq_no in the snapshot: a refresh only needs the entries indexed or
+    updated since, updated entries replace their rows by id. Deleted entries are only dropped when the refresh
+    is given the ids of all entries in the catalog."""
+    __dirname: str
+    __columns: dict
+    __seq_no: int
+
+    numeric: dict = {'size': np.int64, 'captured': np.int64, 'modified': np.int64, 'duration': np.int64,
+                     'kind': np.int8, 'nas': np.bool_, 'dropbox': np.bool_}
+    digests: dict = {'checksum': 32, 'hash': 16, 'path_hash': 16}
+    fields: list = list(numeric) + list(digests) + ['path', 'name']    # the source fields to read from elastic
+    MISSING: int = -1 << 63     # value of captured, modified and duration if the entry has none, kind has -128
+    CHUNK: int = 100000
+
+    def __init__(self, dirname: str):
+        self.__dirname = dirname
+        self.__load()
+
+    def __load(self):
+        self.__seq_no = -1
+        meta = os.path.join(self.__dirname, "meta.json")
+        if not os.path.exists(meta):
+            self.__columns = Snapshot.__empty()
+            return
+        with open(meta, 'r') as file:
+            self.__seq_no = json.load(file)['seq_no']
+        self.__columns = {
+            name: np.load(os.path.join(self.__dirname, name + ".npy"), mmap_mode='r')
+            for name in Snapshot.__column_names()
+        }
+
+    def __len__(self) -> int:
+        return len(self.__columns['id'])
+
+    @property
+    def seq_no(self) -> int:
+        """The highest elastic _seq_no in the snapshot, -1 if it is empty"""
+        return self.__seq_no
+
+    def column(self, name: str) -> np.ndarray:
+        """The array of a numeric or digest column, or of the path index into paths"""
+        return self.__columns[name]
+
+    @property
+    def paths(self) -> np.ndarray:
+        return self.__columns['paths']
+
+    def path(self, row: int) -> str:
+        return str(self.__columns['paths'][self.__columns['path_index'][row]])
+
+    def name(self, row: int) -> str:
+        offsets = self.__columns['name_offsets']
+        return self.__columns['names'][offsets[row]:offsets[row + 1]].tobytes().decode()
+
+    def select(self, captured_from: Union[datetime.datetime, int] = None,
+               captured_to: Union[datetime.datetime, int] = None, kind: int = None, nas: bool = None,
+               dropbox: bool = None, path_prefix: str = None) -> np.ndarray:
+        """Rows matching all given conditions. The captured range includes captured_from and excludes
+        captured_to, given as datetime or as milliseconds since the epoch like in the catalog."""
+        mask = np.ones(len(self), dtype=bool)
+        if captured_from is not None or captured_to is not None:
+            captured = self.__columns['captured']
+            mask &= captured != Snapshot.MISSING
+            if captured_from is not None:
+                mask &= captured >= Snapshot.__milliseconds(captured_from)
+            if captured_to is not None:
+                mask &= captured < Snapshot.__milliseconds(captured_to)
+        if kind is not None:
+            mask &= self.__columns['kind'] == kind
+        if nas is not None:
+            mask &= self.__columns['nas'] == nas
+        if dropbox is not None:
+            mask &= self.__columns['dropbox'] == dropbox
+        if path_prefix is not None:
+            # the path table is small: match the prefix there once, then look the result up for every row
+            matching = np.char.startswith(np.asarray(self.__columns['paths']), path_prefix)
+            mask &= matching[self.__columns['path_index']]
+        return np.flatnonzero(mask)
+
+    def duplicates(self, rows: np.ndarray = None, column: str = 'checksum') -> List[np.ndarray]:
+        """Groups of rows that have the same value in the column, within the given rows or all rows. Rows without
+        a value are not duplicates of each other."""
+        if rows is None:
+            rows = np.arange(len(self))
+        rows = rows[self.__columns[column][rows] != b'']     # numpy drops the trailing zeros of a missing digest
+        values = self.__columns[column][rows]
+        order = np.argsort(values, kind='stable')
+        _, starts, counts = np.unique(values[order], return_index=True, return_counts=True)
+        return [rows[order[start:start + count]] for start, count in zip(starts, counts) if count > 1]
+
+    def entries(self, rows: Iterable[int]) -> Generator[dict, None, None]:
+        """The given rows as dicts like Entry.to_dict, with the elastic id as 'id'"""
+        for row in rows:
+            entry = {'id': self.__columns['id'][row].decode(), 'path': self.path(row), 'name': self.name(row)}
+            for name, dtype in Snapshot.numeric.items():
+                value = self.__columns[name][row].item()
+                if dtype == np.bool_ or value != np.iinfo(dtype).min:
+                    entry[name] = value
+            for name in Snapshot.digests:
+                if self.__columns[name][row] != b'':
+                    entry[name] = self.__columns[name][row:row + 1].tobytes().hex()
+            yield entry
+
+    def refresh(self, hits: Iterable[Tuple[str, int, dict]], all_ids: Optional[Iterable[str]] = None,
+                replace: bool = False):
+        """Merge (id, _seq_no, source) of entries indexed or updated since seq_no into the snapshot and write it.
+        If all_ids is given, rows whose id is not among them are dropped as deleted. With replace the hits
+        replace the snapshot."""
+        new = Snapshot.__empty()
+        seq_no = -1 if replace else self.__seq_no
+        chunks = []
+        for chunk in Snapshot.__chunks(hits):
+            seq_no = max([seq_no] + [hit_seq_no for _, hit_seq_no, _ in chunk])
+            chunks.append(Snapshot.__to_columns(chunk))
+        if chunks:
+            new = Snapshot.__concatenate(chunks)
+
+        old = Snapshot.__empty() if replace else self.__columns
+        keep = ~np.isin(old['id'], new['id'])
+        if all_ids is not None:
+            keep &= np.isin(old['id'], np.array([i.encode() for i in all_ids], dtype=bytes))
+        merged = Snapshot.__concatenate([Snapshot.__take(old, np.flatnonzero(keep)), new])
+        self.__write(merged, seq_no)
+        self.__load()
+
+    def __write(self, columns: dict, seq_no: int):
+        os.makedirs(self.__dirname, exist_ok=True)
+        for name in Snapshot.__column_names():
+            filename = os.path.join(self.__dirname, name + ".npy")
+            np.save(filename + ".tmp.npy", columns[name])
+            os.replace(filename + ".tmp.npy", filename)
+        meta = os.path.join(self.__dirname, "meta.json")
+        with open(meta + ".tmp", 'w') as file:
+            json.dump({'seq_no': seq_no, 'count': len(columns['id'])}, file)
+        os.replace(meta + ".tmp", meta)
+
+    @staticmethod
+    def __column_names() -> list:
+        return ['id'] + list(Snapshot.numeric) + list(Snapshot.digests) + \
+            ['paths', 'path_index', 'names', 'name_offsets']
+
+    @staticmethod
+    def __empty() -> dict:
+        columns = {name: np.empty(0, dtype=dtype) for name, dtype in Snapshot.numeric.items()}
+        columns.update({name: np.empty(0, dtype=f'S{size}') for name, size in Snapshot.digests.items()})
+        columns.update(id=np.empty(0, dtype='S1'), paths=np.empty(0, dtype='U1'),
+                       path_index=np.empty(0, dtype=np.int32), names=np.empty(0, dtype=np.uint8),
+                       name_offsets=np.zeros(1, dtype=np.int64))
+        return columns
+
+    @staticmethod
+    def __chunks(hits: Iterable) -> Generator[list, None, None]:
+        chunk = []
+        for hit in hits:
+            chunk.append(hit)
+            if len(chunk) == Snapshot.CHUNK:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    @staticmethod
+    def __to_columns(hits: list) -> dict:
+        columns = dict()
+        columns['id'] = np.array([_id.encode() for _id, _, _ in hits], dtype=bytes)
+        for name, dtype in Snapshot.numeric.items():
+            default = False if dtype == np.bool_ else np.iinfo(dtype).min
+            columns[name] = np.array([source.get(name, default) for _, _, source in hits], dtype=dtype)
+        for name, size in Snapshot.digests.items():
+            try:
+                values = [bytes.fromhex(source.get(name, '')).ljust(size, b'\0') for _, _, source in hits]
+            except ValueError as e:
+                raise SnapshotError(f"Invalid {name}: {e}")
+            columns[name] = np.array(values, dtype=f'S{size}')
+        paths = np.array([source.get('path', '') for _, _, source in hits], dtype=str)
+        columns['paths'], columns['path_index'] = np.unique(paths, return_inverse=True)
+        columns['path_index'] = columns['path_index'].astype(np.int32)
+        names = [source.get('name', '').encode() for _, _, source in hits]
+        columns['names'] = np.frombuffer(b"".join(names), dtype=np.uint8)
+        columns['name_offsets'] = np.zeros(len(names) + 1, dtype=np.int64)
+        np.cumsum([len(name) for name in names], out=columns['name_offsets'][1:])
+        return columns
+
+    @staticmethod
+    def __take(columns: dict, rows: np.ndarray) -> dict:
+        """The given rows of all columns, in memory"""
+        taken = {name: np.asarray(columns[name])[rows] for name in ['id'] + list(Snapshot.numeric) +
+                 list(Snapshot.digests)}
+        taken['paths'] = np.asarray(columns['paths'])
+        taken['path_index'] = np.asarray(columns['path_index'])[rows]
+        offsets = np.asarray(columns['name_offsets'])
+        starts, lengths = offsets[rows], offsets[rows + 1] - offsets[rows]
+        taken['name_offsets'] = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=taken['name_offsets'][1:])
+        index = np.repeat(starts - taken['name_offsets'][:-1], lengths) + np.arange(taken['name_offsets'][-1])
+        taken['names'] = np.asarray(columns['names'])[index]
+        return taken
+
+    @staticmethod
+    def __concatenate(parts: List[dict]) -> dict:
+        columns = {name: np.concatenate([part[name] for part in parts]) for name in ['id'] +
+                   list(Snapshot.numeric) + list(Snapshot.digests) + ['names']}
+        # re-intern the paths: map the path table of every part into the common one
+        columns['paths'] = np.unique(np.concatenate([part['paths'] for part in parts]))
+        columns['path_index'] = np.concatenate([
+            np.searchsorted(columns['paths'], part['paths']).astype(np.int32)[part['path_index']]
+            if len(part['paths']) else part['path_index'] for part in parts
+        ])
+        offsets = [np.zeros(1, dtype=np.int64)]
+        end = 0
+        for part in parts:
+            offsets.append(part['name_offsets'][1:] + end)
+            end += part['name_offsets'][-1]
+        columns['name_offsets'] = np.concatenate(offsets)
+        return columns
+
+    @staticmethod
+    def __milliseconds(value: Union[datetime.datetime, int]) -> int:
+        if isinstance(value, datetime.datetime):
+            return int(value.timestamp() * 1000)
+        return value
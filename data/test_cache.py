@@ -0,0 +1,56 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from .cache import MetadataCache
+from .factory import Factory
+from tools import TestConstants
+
+
+class TestMetadataCache(TestCase):
+    def setUp(self) -> None:
+        self.tempdir = tempfile.mkdtemp()
+        self.image = os.path.join(self.tempdir, "spiderman.jpg")
+        shutil.copy2(os.path.join("..", TestConstants.testdir, "spiderman.jpg"), self.image)
+        self.cache = MetadataCache(os.path.join(self.tempdir, "cache.db"), max_entries=10)
+        Factory.use_cache(self.cache)
+
+    def tearDown(self) -> None:
+        Factory.use_cache(None)
+        self.cache.close()
+        shutil.rmtree(self.tempdir)
+
+    def test_hit_and_miss(self):
+        first = Factory.from_path(self.image)
+        self.assertEqual(self.cache.misses, 1)
+        second = Factory.from_path(self.image)
+        self.assertEqual(self.cache.hits, 1)
+        self.assertEqual(first.to_dict(), second.to_dict())
+
+    def test_invalidate_on_change(self):
+        first = Factory.from_path(self.image)
+        with open(self.image, "ab") as file:
+            file.write(b"more")
+        second = Factory.from_path(self.image)
+        self.assertEqual(self.cache.hits, 0)
+        self.assertEqual(self.cache.misses, 2)
+        self.assertNotEqual(first.checksum, second.checksum)
+        self.assertEqual(len(self.cache), 1)
+
+    def test_renamed_file_keeps_record(self):
+        Factory.from_path(self.image)
+        renamed = os.path.join(self.tempdir, "renamed.jpg")
+        os.rename(self.image, renamed)
+        entry = Factory.from_path(renamed)
+        self.assertEqual(self.cache.hits, 1)
+        self.assertEqual(entry.name, "renamed.jpg")
+
+    def test_eviction(self):
+        for i in range(0, 20):
+            name = os.path.join(self.tempdir, f"file{i}.psd")
+            with open(name, "w") as file:
+                file.write(f"file number {i}")
+            Factory.from_path(name)
+        self.assertLessEqual(len(self.cache), 10)
+        self.assertGreater(self.cache.evicted, 0)
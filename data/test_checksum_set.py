@@ -0,0 +1,64 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from .checksum_set import ChecksumSet, ChecksumSetError
+
+
+def checksums(start: int, end: int) -> list:
+    return [hashlib.sha256(str(i).encode()).hexdigest() for i in range(start, end)]
+
+
+def entries(start: int, end: int) -> list:
+    return [(checksum, start + i) for i, checksum in enumerate(checksums(start, end))]
+
+
+class TestChecksumSet(TestCase):
+    def setUp(self) -> None:
+        self.tempdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tempdir, "checksums.npy")
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.tempdir)
+
+    def test_empty(self):
+        checksum_set = ChecksumSet(self.filename)
+        self.assertEqual(len(checksum_set), 0)
+        self.assertEqual(checksum_set.seq_no, -1)
+        self.assertFalse(checksums(0, 1)[0] in checksum_set)
+
+    def test_add_and_refresh(self):
+        checksum_set = ChecksumSet(self.filename)
+        checksum_set.add(entries(0, 1000))
+        checksum_set.add(entries(500, 1500) + entries(0, 1))
+
+        reopened = ChecksumSet(self.filename)
+        self.assertEqual(len(reopened), 1500)
+        self.assertEqual(reopened.seq_no, 1499)
+        self.assertTrue(all(reopened.contains_many(checksums(0, 1500))))
+        self.assertFalse(any(reopened.contains_many(checksums(1500, 3000))))
+
+    def test_bloom_filter(self):
+        checksum_set = ChecksumSet(self.filename)
+        checksum_set.add(entries(0, 1000), bloom_bits=10)
+        self.assertTrue(os.path.exists(self.filename + ".bloom.npy"))
+        self.assertTrue(all(checksum_set.contains_many(checksums(0, 1000))))
+        self.assertFalse(any(checksum_set.contains_many(checksums(1000, 11000))))
+
+        checksum_set.add(entries(1000, 1100))
+        self.assertTrue(os.path.exists(self.filename + ".bloom.npy"))
+        self.assertTrue(all(ChecksumSet(self.filename).contains_many(checksums(0, 1100))))
+        self.assertFalse(any(checksum_set.contains_many(checksums(1100, 11000))))
+
+    def test_replace(self):
+        checksum_set = ChecksumSet(self.filename)
+        checksum_set.add(entries(0, 1000))
+        checksum_set.add(entries(0, 10), replace=True)
+        self.assertEqual(len(checksum_set), 10)
+        self.assertEqual(checksum_set.seq_no, 9)
+
+    def test_invalid_checksum(self):
+        self.assertRaises(ChecksumSetError, ChecksumSet(self.filename).contains_many, ["abc"])
+        self.assertRaises(ChecksumSetError, ChecksumSet(self.filename).contains_many, ["00" * 16])
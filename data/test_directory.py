@@ -1,6 +1,8 @@
 from unittest import TestCase
 import os
-from catalog import TestConstants, Constants
+import shutil
+import tempfile
+from tools import TestConstants, Constants
 from data import Image
 from data.directory import Folder
 
@@ -27,6 +29,25 @@ class TestFolder(TestCase):
         self.assertEqual("2020-02-08 19-10-04", sorted_list[3].captured_str)
         self.assertEqual('47.50632,8.69123', sorted_list[3].location)
 
+    def test_read_in_parallel(self):
+        tempdir = tempfile.mkdtemp()
+        try:
+            for name in ("cartoon.png", "food.heic", "spiderman.jpg", "thor.jpeg", "ztest.psd", "README.md"):
+                shutil.copy2(os.path.join("..", TestConstants.testdir, name), tempdir)
+            open(os.path.join(tempdir, "empty.jpg"), "w").close()
+
+            sequential = Folder()
+            sequential.read(tempdir)
+            with Folder(workers=2) as parallel:
+                parallel.read(tempdir)
+
+            self.assertEqual(sequential.file_list_as_dict(), parallel.file_list_as_dict())
+            self.assertEqual(sequential.invalid_types, parallel.invalid_types)
+            self.assertEqual(len(parallel.file_list), 5)
+            self.assertIn('.md', parallel.invalid_types)
+        finally:
+            shutil.rmtree(tempdir)
+
     def test_scan_invalid_directory_to_read(self):
         test_directory = Folder()
 
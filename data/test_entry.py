@@ -35,3 +35,27 @@ class TestEntry(TestCase):
         entry = Entry()
         entry.modified = 0
         self.assertEqual(entry.modified_str, "1970-01-01")
+
+    def test_derived_values_follow_changes(self):
+        entry = Entry()
+        entry.full_path = "2020/01_January/myname.jpg"
+        entry.checksum = "abc"
+        entry.captured = 0
+        first_hash, first_path_hash = entry.hash, entry.path_hash
+        self.assertEqual(entry.captured_str, "1970-01-01 00-00-00")
+
+        entry.name = "other.jpg"
+        self.assertNotEqual(entry.hash, first_hash)
+        self.assertEqual(entry.hash, Entry.hash_from_name("2020/01_January/other.jpg"))
+        self.assertEqual(entry.path_hash, first_path_hash)
+        entry.checksum = "def"
+        self.assertNotEqual(entry.path_hash, first_path_hash)
+        entry.captured = 86400000
+        self.assertEqual(entry.captured_str, "1970-01-02 00-00-00")
+
+    def test_to_dict_skips_unset(self):
+        entry = Entry()
+        entry.full_path = "2020/01_January/myname.jpg"
+        entry.size = 10
+        self.assertEqual(list(entry.to_dict().keys()), ["hash", "name", "path", "size", "type"])
+        self.assertFalse(hasattr(entry, "__dict__"))
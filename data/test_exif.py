@@ -0,0 +1,83 @@
+import io
+import os
+import struct
+import tempfile
+from unittest import TestCase
+
+import exifread
+
+from .exif import Exif, ExifReader, ExifError
+from tools import TestConstants
+
+
+def tiff(order: str = '>') -> bytes:
+    """A minimal TIFF structure with DateTimeOriginal, dimensions and a GPS position"""
+    def entry(tag, value_type, count, value):
+        if isinstance(value, bytes):
+            return struct.pack(order + 'HHI', tag, value_type, count) + value.ljust(4, b'\x00')
+        return struct.pack(order + 'HHII', tag, value_type, count, value)
+
+    def ifd(entries):
+        return struct.pack(order + 'H', len(entries)) + b''.join(entries) + struct.pack(order + 'I', 0)
+
+    exif_offset, gps_offset, data_offset = 38, 80, 134
+    header = (b'MM' if order == '>' else b'II') + struct.pack(order + 'HI', 42, 8)
+    ifd0 = ifd([entry(0x8769, 4, 1, exif_offset), entry(0x8825, 4, 1, gps_offset)])
+    exif_ifd = ifd([entry(0x9003, 2, 20, data_offset),
+                    entry(0xA002, 3, 1, struct.pack(order + 'H', 4032)),
+                    entry(0xA003, 4, 1, 3024)])
+    gps_ifd = ifd([entry(1, 2, 2, b'N'), entry(2, 5, 3, data_offset + 20),
+                   entry(3, 2, 2, b'W'), entry(4, 5, 3, data_offset + 44)])
+    data = b'2020:02:08 19:10:04\x00'
+    data += struct.pack(order + 'IIIIII', 47, 1, 30, 1, 1137, 50)
+    data += struct.pack(order + 'IIIIII', 8, 1, 41, 1, 2841, 100)
+    return header + ifd0 + exif_ifd + gps_ifd + data
+
+
+def jpeg(tiff_data: bytes) -> bytes:
+    comment = b'\xff\xfe' + struct.pack('>H', 7) + b'hello'
+    app1 = b'\xff\xe1' + struct.pack('>H', len(tiff_data) + 8) + b'Exif\x00\x00' + tiff_data
+    return b'\xff\xd8' + comment + app1 + b'\xff\xda\x00\x02' + bytes(100000)
+
+
+class TestExifReader(TestCase):
+    def assertExif(self, exif: Exif):
+        self.assertEqual(exif.date_time_original, "2020:02:08 19:10:04")
+        self.assertEqual(exif.latitude, 47.50632)
+        self.assertEqual(exif.longitude, -8.69123)
+        self.assertEqual(f"{exif.width}x{exif.height}", "4032x3024")
+
+    def test_tiff(self):
+        self.assertExif(ExifReader.from_tiff(tiff('>')))
+        self.assertExif(ExifReader.from_tiff(tiff('<')))
+
+    def test_jpeg_reads_only_header(self):
+        data = jpeg(tiff())
+        exif = ExifReader.from_jpeg(io.BytesIO(data))
+        self.assertExif(exif)
+        self.assertLess(exif.bytes_read, 300)
+
+    def test_same_as_exifread(self):
+        data = jpeg(tiff())
+        exif = Exif.from_tags(exifread.process_file(io.BytesIO(data), details=False))
+        self.assertExif(exif)
+
+    def test_raw(self):
+        handle, name = tempfile.mkstemp(suffix=".nef")
+        with os.fdopen(handle, "wb") as file:
+            file.write(tiff('<') + bytes(ExifReader.TIFF_WINDOW * 2))
+        try:
+            exif = ExifReader.read(name, 'nef')
+            self.assertExif(exif)
+            self.assertEqual(exif.bytes_read, ExifReader.TIFF_WINDOW)
+        finally:
+            os.remove(name)
+
+    def test_jpeg_without_exif(self):
+        exif = ExifReader.read(os.path.join("..", TestConstants.testdir, "thor.jpeg"), 'jpeg')
+        self.assertIsNone(exif.date_time_original)
+        self.assertIsNone(exif.latitude)
+
+    def test_not_a_jpeg(self):
+        self.assertRaises(ExifError, ExifReader.read, os.path.join("..", TestConstants.testdir, "cartoon.png"),
+                          'jpg')
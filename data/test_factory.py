@@ -1,5 +1,9 @@
+import os
+import tempfile
 from unittest import TestCase
-from data.factory import Factory
+from data.factory import Factory, FactoryError, DropboxHash
+from data.image import Image
+from tools import Constants
 
 
 class TestFactory(TestCase):
@@ -12,3 +16,46 @@ class TestFactory(TestCase):
         teststr = Factory.mydecode(testbinary)
         for lines in teststr.splitlines():
             print(lines)
+
+    def test_parallel_checksum(self):
+        handle, name = tempfile.mkstemp()
+        with os.fdopen(handle, "wb") as file:
+            file.write(os.urandom(DropboxHash.block_size * 3 + 12345))
+        try:
+            self.assertEqual(Factory.checksum(name, workers=0), Factory.checksum(name, workers=4))
+        finally:
+            os.remove(name)
+
+    @staticmethod
+    def __source() -> dict:
+        image = Image()
+        image.full_path = "2020/01_January/myname.jpg"
+        image.size = 10
+        image.modified = 1587456138000
+        image.checksum = "abc"
+        return image.to_dict()
+
+    def test_from_source(self):
+        source = TestFactory.__source()
+        item = Factory.from_source(source, "an-id")
+        self.assertEqual(item.id, "an-id")
+        self.assertEqual(item.to_dict(), source)
+
+        source['hash'] = "0" * 32
+        with self.assertRaises(FactoryError):
+            Factory.from_source(source)
+        item = Factory.from_source(source, validate="off")
+        self.assertEqual(item.hash, "0" * 32)
+        with self.assertRaises(FactoryError):
+            Factory.from_source(source, validate="unknown")
+
+    def test_from_source_sampled(self):
+        source = TestFactory.__source()
+        source['path_hash'] = "0" * 32
+        failed = 0
+        for _ in range(0, Constants.validate_sample_rate):
+            try:
+                Factory.from_source(source, validate="sampled")
+            except FactoryError:
+                failed += 1
+        self.assertEqual(failed, 1)
@@ -0,0 +1,49 @@
+import math
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from .gazetteer import Gazetteer, GazetteerError
+
+CITIES = [(47.37689, 8.54169, "Zürich"), (47.50564, 8.72413, "Winterthur"), (46.20222, 6.14569, "Geneve"),
+          (34.05223, -118.24368, "Los Angeles"), (41.38879, 2.15899, "Barcelona"), (64.5, 179.9, "East"),
+          (64.5, -179.9, "West"), (89.5, 0.0, "North"), (-33.86785, 151.20732, "Sydney"),
+          (47.37689, 8.54169, "Zürich")]
+
+
+class TestGazetteer(TestCase):
+    def setUp(self) -> None:
+        self.tempdir = tempfile.mkdtemp()
+        csv_file = os.path.join(self.tempdir, "cities.csv")
+        with open(csv_file, 'w', encoding='utf-8') as file:
+            file.write("lat,lon,name,admin1,admin2,cc\n")
+            file.writelines(f"{lat},{lon},{name},,,\n" for lat, lon, name in CITIES)
+        self.filename = os.path.join(self.tempdir, "gazetteer.bin")
+        self.assertEqual(Gazetteer.build(csv_file, self.filename), len(CITIES))
+        self.gazetteer = Gazetteer(self.filename)
+
+    def tearDown(self) -> None:
+        self.gazetteer.close()
+        shutil.rmtree(self.tempdir)
+
+    @staticmethod
+    def nearest(latitude: float, longitude: float) -> str:
+        def distance(city):
+            lat1, lon1, lat2, lon2 = map(math.radians, (latitude, longitude, city[0], city[1]))
+            return math.acos(min(1.0, math.sin(lat1) * math.sin(lat2) +
+                                 math.cos(lat1) * math.cos(lat2) * math.cos(lon2 - lon1)))
+        return min(CITIES, key=distance)[2]
+
+    def test_search(self):
+        locations = [(47.38, 8.54), (47.45, 8.7), (46.0, 6.0), (0.0, 0.0), (64.0, -179.99), (64.0, 179.0),
+                     (89.9, 170.0), (-89.0, 0.0), (-30.0, -170.0), (35.0, -100.0)]
+        found = self.gazetteer.search(locations)
+        self.assertEqual([city['name'] for city in found], [TestGazetteer.nearest(*l) for l in locations])
+        self.assertAlmostEqual(found[0]['lat'], 47.37689, places=4)
+        self.assertEqual(len(self.gazetteer), len(CITIES))
+
+    def test_invalid(self):
+        with open(self.filename, 'r+b') as file:
+            file.write(b"NOTAGAZE")
+        self.assertRaises(GazetteerError, Gazetteer, self.filename)
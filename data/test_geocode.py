@@ -0,0 +1,29 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from .geocode import GeocodeCache
+
+
+class TestGeocodeCache(TestCase):
+    def setUp(self) -> None:
+        self.tempdir = tempfile.mkdtemp()
+        self.cache = GeocodeCache(os.path.join(self.tempdir, "geocode.db"))
+
+    def tearDown(self) -> None:
+        self.cache.close()
+        shutil.rmtree(self.tempdir)
+
+    def test_cell(self):
+        self.assertEqual(GeocodeCache.cell(47.37691, 8.54169), "47.38,8.54")
+        self.assertEqual(GeocodeCache.cell(47.37691, 8.54169), GeocodeCache.cell(47.3801, 8.5399))
+        self.assertNotEqual(GeocodeCache.cell(47.37691, 8.54169), GeocodeCache.cell(-47.37691, 8.54169))
+        self.assertEqual(GeocodeCache.cell(47.0, -8.0, 3), "47.000,-8.000")
+
+    def test_put_and_get(self):
+        cell = GeocodeCache.cell(47.37691, 8.54169)
+        self.assertIsNone(self.cache.get(cell))
+        self.cache.put(cell, "Zurich", ["Altstadt", "Zürich", "Schweiz"])
+        self.assertEqual(self.cache.get(cell), ("Zurich", ["Altstadt", "Zürich", "Schweiz"]))
+        self.assertEqual((self.cache.hits, self.cache.misses, len(self.cache)), (1, 1, 1))
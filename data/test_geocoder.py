@@ -0,0 +1,60 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import TestCase
+from urllib.parse import urlsplit, parse_qs
+
+from .geocoder import Geocoder
+
+
+class StandIn(BaseHTTPRequestHandler):
+    """Answers reverse requests like Nominatim, slowly for latitudes above 80"""
+    requests = []
+
+    def do_GET(self):
+        query = parse_qs(urlsplit(self.path).query)
+        lat, lon = float(query['lat'][0]), float(query['lon'][0])
+        StandIn.requests.append(time.monotonic())
+        if lat > 80:
+            time.sleep(1)
+        body = json.dumps({'lat': str(lat), 'lon': str(lon), 'display_name': f"Street {lat}, Town {lon}, Country"})
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(body.encode())
+
+    def log_message(self, *args):
+        pass
+
+
+class TestGeocoder(TestCase):
+    def setUp(self) -> None:
+        StandIn.requests = []
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StandIn)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+
+    def tearDown(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_reverse_all(self):
+        geocoder = Geocoder(self.url, rate=20, workers=4)
+        addresses = geocoder.reverse_all({'a': "47.0,8.0", 'b': "46.0,7.0", 'c': "45.0,6.0"})
+        self.assertEqual(addresses, {'a': ["Street 47.0", "Town 8.0", "Country"],
+                                     'b': ["Street 46.0", "Town 7.0", "Country"],
+                                     'c': ["Street 45.0", "Town 6.0", "Country"]})
+        self.assertEqual(geocoder.reverse_all({}), {})
+
+    def test_rate(self):
+        Geocoder(self.url, rate=10, workers=4).reverse_all({str(i): f"{i}.0,8.0" for i in range(6)})
+        self.assertEqual(len(StandIn.requests), 6)
+        self.assertGreaterEqual(StandIn.requests[-1] - StandIn.requests[0], 0.45)
+
+    def test_timeout(self):
+        geocoder = Geocoder(self.url, rate=20, workers=2, retries=1, backoff=0.1, timeout=0.2)
+        addresses = geocoder.reverse_all({'slow': "85.0,8.0", 'fast': "47.0,8.0"})
+        self.assertIsNone(addresses['slow'])
+        self.assertEqual(addresses['fast'], ["Street 47.0", "Town 8.0", "Country"])
+        self.assertEqual(len(StandIn.requests), 3)
@@ -0,0 +1,58 @@
+import os
+import struct
+import tempfile
+from datetime import datetime
+from unittest import TestCase
+
+from .isobmff import IsoBmff, IsoBmffError
+from .exif import ExifReader
+from tools import TestConstants
+
+
+def box(box_type: bytes, payload: bytes) -> bytes:
+    return struct.pack('>I4s', len(payload) + 8, box_type) + payload
+
+
+class TestIsoBmff(TestCase):
+    def test_movie_header(self):
+        with open(os.path.join("..", TestConstants.testdir, TestConstants.files[0]), "rb") as file:
+            reader = IsoBmff(file)
+            duration, created = reader.movie_header()
+            self.assertEqual(duration, TestConstants.duration[0])
+            self.assertEqual(created, datetime(2001, 1, 3, 11, 48, 41))
+            self.assertLess(reader.bytes_read, 1024)
+
+    def test_version_1_header_after_large_mdat(self):
+        created = int((datetime(2020, 2, 8, 19, 10, 4) - IsoBmff.epoch).total_seconds())
+        mvhd = box(b'mvhd', b'\x01\x00\x00\x00' + struct.pack('>QQIQ', created, created, 1000, 65432) + bytes(80))
+        mdat = struct.pack('>I4sQ', 1, b'mdat', 16 + 1024 * 1024) + bytes(1024 * 1024)
+        handle, name = tempfile.mkstemp(suffix=".mp4")
+        with os.fdopen(handle, "wb") as file:
+            file.write(box(b'ftyp', b'isom\x00\x00\x02\x00') + mdat + box(b'moov', mvhd))
+        try:
+            with open(name, "rb") as file:
+                reader = IsoBmff(file)
+                self.assertEqual(reader.movie_header(), (65, datetime(2020, 2, 8, 19, 10, 4)))
+                self.assertLess(reader.bytes_read, 1024)
+        finally:
+            os.remove(name)
+
+    def test_no_movie_header(self):
+        handle, name = tempfile.mkstemp(suffix=".mp4")
+        with os.fdopen(handle, "wb") as file:
+            file.write(box(b'ftyp', b'isom\x00\x00\x02\x00') + b'\x00\x00\x10\x00mdat')
+        try:
+            with open(name, "rb") as file:
+                self.assertRaises(IsoBmffError, IsoBmff(file).movie_header)
+        finally:
+            os.remove(name)
+
+    def test_heic_exif_item(self):
+        with open(os.path.join("..", TestConstants.testdir, "food.heic"), 'rb') as file:
+            container = IsoBmff(file)
+            data = container.exif_item()
+            self.assertTrue(data.startswith(b'MM') or data.startswith(b'II'))
+            self.assertLess(container.bytes_read, 64 * 1024)
+        exif = ExifReader.from_tiff(data)
+        self.assertEqual(exif.date_time_original, "2020:02:08 19:10:04")
+        self.assertEqual(f"{exif.width}x{exif.height}", "4032x3024")
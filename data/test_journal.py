@@ -0,0 +1,34 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from .journal import DirectoryJournal
+
+
+class TestDirectoryJournal(TestCase):
+    def setUp(self) -> None:
+        self.tempdir = tempfile.mkdtemp()
+        self.journal = DirectoryJournal(os.path.join(self.tempdir, "journal.db"))
+
+    def tearDown(self) -> None:
+        self.journal.close()
+        shutil.rmtree(self.tempdir)
+
+    def test_fingerprint(self):
+        fingerprint = DirectoryJournal.fingerprint(1, ["b.jpg", "a.jpg"])
+        self.assertEqual(fingerprint, DirectoryJournal.fingerprint(1, ["a.jpg", "b.jpg"]))
+        self.assertNotEqual(fingerprint, DirectoryJournal.fingerprint(2, ["a.jpg", "b.jpg"]))
+        self.assertNotEqual(fingerprint, DirectoryJournal.fingerprint(1, ["a.jpg", "c.jpg"]))
+        self.assertEqual(fingerprint[1], 2)
+
+    def test_update(self):
+        fingerprint = DirectoryJournal.fingerprint(1, ["a.jpg"])
+        self.journal.update("", {"2020": fingerprint, "2020/01_January": fingerprint, "2020/01x": fingerprint,
+                                 "2021": fingerprint}, {"2021"})
+        self.assertTrue(self.journal.unchanged("2020", fingerprint))
+        self.assertFalse(self.journal.unchanged("2021", fingerprint))
+        self.assertEqual(sorted(self.journal.directories_below("2020/01_January")), ["2020/01_January"])
+
+        self.journal.update("2020", {"2020": fingerprint})
+        self.assertEqual(sorted(self.journal.directories_below("")), ["2020"])
@@ -0,0 +1,98 @@
+import datetime
+import hashlib
+import shutil
+import tempfile
+from unittest import TestCase
+
+from .snapshot import Snapshot
+from tools import Constants
+
+
+def hit(i: int, path: str, checksum: int, seq_no: int = None, **source) -> tuple:
+    entry = {
+        'name': f"IMG_{i}.jpg", 'path': path, 'size': 1000 + i, 'kind': Constants.IMAGE_KIND, 'nas': True,
+        'checksum': hashlib.sha256(str(checksum).encode()).hexdigest(),
+        'hash': hashlib.md5(f"{path}/IMG_{i}.jpg".encode()).hexdigest(),
+        'path_hash': hashlib.md5(f"{path}{checksum}".encode()).hexdigest(),
+        'captured': int(datetime.datetime(2020, 1 + i % 12, 1).timestamp() * 1000),
+    }
+    entry.update(source)
+    return f"id{i}", i if seq_no is None else seq_no, entry
+
+
+class TestSnapshot(TestCase):
+    def setUp(self) -> None:
+        self.tempdir = tempfile.mkdtemp()
+        self.snapshot = Snapshot(self.tempdir)
+        hits = [hit(i, f"2020/{1 + i % 12:02d}", i) for i in range(0, 24)]
+        hits.append(hit(24, "2021/01", 3, kind=Constants.VIDEO_KIND, duration=12, dropbox=True))
+        self.snapshot.refresh(hits)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.tempdir)
+
+    def test_load(self):
+        snapshot = Snapshot(self.tempdir)
+        self.assertEqual(len(snapshot), 25)
+        self.assertEqual(snapshot.seq_no, 24)
+        self.assertEqual(len(snapshot.paths), 13)
+        entry = next(snapshot.entries([24]))
+        self.assertEqual(entry['id'], "id24")
+        self.assertEqual(entry['path'], "2021/01")
+        self.assertEqual(entry['name'], "IMG_24.jpg")
+        self.assertEqual(entry['duration'], 12)
+        self.assertEqual(entry['checksum'], hashlib.sha256(b"3").hexdigest())
+        self.assertNotIn('duration', next(snapshot.entries([0])))
+
+    def test_select(self):
+        self.assertEqual(len(self.snapshot.select(path_prefix="2020/")), 24)
+        self.assertEqual(list(self.snapshot.select(kind=Constants.VIDEO_KIND)), [24])
+        self.assertEqual(list(self.snapshot.select(dropbox=True, nas=True)), [24])
+        rows = self.snapshot.select(captured_from=datetime.datetime(2020, 3, 1),
+                                    captured_to=datetime.datetime(2020, 5, 1), path_prefix="2020")
+        self.assertEqual(sorted(self.snapshot.path(row) for row in rows), ["2020/03", "2020/03", "2020/04", "2020/04"])
+
+    def test_duplicates(self):
+        groups = self.snapshot.duplicates()
+        self.assertEqual(len(groups), 1)
+        self.assertEqual(sorted(groups[0]), [3, 24])
+        self.assertEqual(self.snapshot.duplicates(self.snapshot.select(path_prefix="2020")), [])
+
+    def test_missing_checksum(self):
+        hits = [hit(i, "2023/01", i) for i in (25, 26)]
+        for _, _, source in hits:
+            del source['checksum']
+        self.snapshot.refresh(hits)
+        groups = self.snapshot.duplicates()
+        self.assertEqual(len(groups), 1)
+        self.assertEqual(sorted(groups[0]), [3, 24])
+        entry = next(self.snapshot.entries([25]))
+        self.assertNotIn('checksum', entry)
+        self.assertEqual(entry['hash'], hits[0][2]['hash'])
+
+    def test_missing_kind(self):
+        hits = [hit(25, "2023/01", 25)]
+        del hits[0][2]['kind']
+        self.snapshot.refresh(hits)
+        self.assertEqual(len(self.snapshot), 26)
+        self.assertNotIn('kind', next(self.snapshot.entries([25])))
+        self.assertEqual(len(self.snapshot.select(kind=Constants.IMAGE_KIND)), 24)
+
+    def test_incremental_refresh(self):
+        self.snapshot.refresh([hit(3, "2022/01", 3, seq_no=30, name="renamed.jpg"), hit(25, "2022/01", 25)],
+                              all_ids=[f"id{i}" for i in range(1, 26)])
+        self.assertEqual(len(self.snapshot), 25)
+        self.assertEqual(self.snapshot.seq_no, 30)
+        names = {entry['id']: entry for entry in self.snapshot.entries(range(0, len(self.snapshot)))}
+        self.assertNotIn("id0", names)
+        self.assertEqual(names["id3"]['name'], "renamed.jpg")
+        self.assertEqual(names["id3"]['path'], "2022/01")
+        self.assertEqual(names["id7"]['name'], "IMG_7.jpg")
+        self.assertEqual(names["id7"]['path'], "2020/08")
+        self.assertEqual(len(self.snapshot.select(path_prefix="2022")), 2)
+
+    def test_replace(self):
+        self.snapshot.refresh([hit(30, "2023/01", 30, seq_no=3)], replace=True)
+        self.assertEqual(len(self.snapshot), 1)
+        self.assertEqual(self.snapshot.seq_no, 3)
+        self.assertEqual(self.snapshot.path(0), "2023/01")
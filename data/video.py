@@ -10,9 +10,10 @@ class InvalidVideoError(ValueError):
 
 class Video(Entry):
     """This is the video entry in the catalog."""
+    __slots__ = ()
 
     def __init__(self):
-        pass
+        super().__init__()
 
     def __repr__(self):
         return str(self.to_dict())
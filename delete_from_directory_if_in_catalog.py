@@ -3,16 +3,26 @@ import argparse
 import sys
 import shutil
 
-from data import Factory, Entry, FactoryError, DBox
-from tools import elastic_arguments, root_arguments, read_config
+from data import Factory, Entry, FactoryError, DBox, MetadataCache
+from tools import elastic_arguments, root_arguments, read_config, cache_arguments, checksum_arguments
+from tools import walk_arguments
+from tools.walker import Walker
 import elastic
+from export_checksums import refresh_checksums
 
 
 global local_limit
 
 
+def in_catalog(checksum: str) -> Entry:
+    """Ask elastic only if the checksum set, when given, does not rule the checksum out"""
+    if checksums is not None and checksum not in checksums:
+        return None
+    return next(reader.get_by_checksum(checksum), None)
+
+
 def process_item(item):
-    cat_item: Entry = next(reader.get_by_checksum(item.checksum), None)
+    cat_item: Entry = in_catalog(item.checksum)
     if cat_item:
         nas_path = os.path.join(config['nas_root'], cat_item.full_path)
         if os.path.exists(nas_path):
@@ -29,33 +39,37 @@ def process_item(item):
 
 def check_dir(directory: str, limit: int):
     global local_limit
-    with os.scandir(directory) as iterator:
-        for item in iterator:
+    directories = []
+    walker = Walker(args.walk_threads, max_depth=None if args.recursive else 0)
+    for found, entries in walker.walk(directory):
+        if 0 < limit < local_limit:
+            break   # stop walking, the directories not listed yet are left alone
+        directories.append(found.path)
+        for item in entries:
             if 0 < limit < local_limit:
                 break
             if item.is_dir():
-                if args.recursive:
-                    check_dir(item.path, limit)
-            else:
-                try:
-                    process_item(Factory.from_path(item.path))
-                except FactoryError:
-                    print(f"NotImg: {item.path}")
-                    continue     # ignore nonvideo / nonimage files.
-                finally:
-                    local_limit += 1
-
-    if not os.listdir(directory):  # remove empty directories as well
-        if not args.dryrun:
-            os.rmdir(directory)
-        print(f"RMDIR : {directory}")
+                continue
+            try:
+                process_item(Factory.from_path(item.path))
+            except FactoryError:
+                print(f"NotImg: {item.path}")
+                continue     # ignore nonvideo / nonimage files.
+            finally:
+                local_limit += 1
+
+    for path in sorted(directories, reverse=True):  # remove empty directories as well, below ones first
+        if not os.listdir(path):
+            if not args.dryrun:
+                os.rmdir(path)
+            print(f"RMDIR : {path}")
 
 
 def check_dropbox_dir(directory: str, limit):
     dbox = DBox(True)
     for item in dbox.list_dir(directory, recurse=args.recursive, limit=None if limit < 0 else limit,
                               path_only=False):
-        cat_item: Entry = next(reader.get_by_checksum(item.content_hash), None)
+        cat_item: Entry = in_catalog(item.content_hash)
         if cat_item:
             dbox_path = os.path.join(config['dropbox_root'], cat_item.full_path)
             if dbox.exists(dbox_path):
@@ -80,15 +94,22 @@ if __name__ == '__main__':
     parser.add_argument('--dryrun', '-d', action='store_true', help="""Do a dry run only, print what would be done. """)
     parser.add_argument('--limit', '-l', type=int, help='Limit the number of files processed', default=-1)
     parser.add_argument('--dropbox', action='store_true', help='Do this on a dropbox folder. Check against dropbox.')
+    parser.add_argument('--checksums', type=str, help='''Checksum file written by export_checksums. It is refreshed
+    first and then rules out files that are not in the catalog without asking elastic. Default: none''')
     root_arguments(parser)
     elastic_arguments(parser)
+    cache_arguments(parser)
+    checksum_arguments(parser)
+    walk_arguments(parser)
     args = parser.parse_args()
+    elastic.Connection.use_transport(args.pool_size, args.timeout, args.retries, args.compress)
 
     connection = elastic.Connection(args.host, args.port)
     if args.index is not None:
         connection.index = args.index
 
     reader = elastic.Retrieve(connection)
+    checksums = refresh_checksums(args.checksums, connection) if args.checksums else None
 
     config = read_config()
     if args.nas_root:
@@ -107,4 +128,12 @@ if __name__ == '__main__':
     if args.dropbox:
         check_dropbox_dir(args.directory, args.limit)
     else:
+        Factory.use_parallel_checksum(args.hash_threads)
+        cache = None
+        if args.cache:
+            cache = MetadataCache(args.cache, args.cache_size)
+            Factory.use_cache(cache)
         check_dir(args.directory, args.limit)
+        if cache:
+            cache.print_stats()
+            cache.close()
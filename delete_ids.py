@@ -1,7 +1,7 @@
 import argparse
 import os
 import csv
-from tools import elastic_arguments
+from tools import elastic_arguments, directories_arguments
 import elastic
 
 
@@ -19,12 +19,16 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Delete id or list of IDs')
     parser.add_argument('id_or_csvfile', type=str, help='An ID string or a csv file with a list of ID strings')
     elastic_arguments(parser)
+    directories_arguments(parser)
     args = parser.parse_args()
+    elastic.Connection.use_transport(args.pool_size, args.timeout, args.retries, args.compress)
 
     connection = elastic.Connection(args.host, args.port)
     if args.index is not None:
         connection.index = args.index
     deleter = elastic.Delete(connection)
+    if args.directories:
+        deleter.use_directories(elastic.Directories(connection))
 
     if os.path.isfile(args.id_or_csvfile):
         # delete all IDs from file
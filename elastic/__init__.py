@@ -2,3 +2,4 @@ from .connection import Connection
 from .delete import Delete, StorageError
 from .store import Store
 from .retrieve import Retrieve
+from .directories import Directories
@@ -1,3 +1,4 @@
+from typing import List
 from elasticsearch import Elasticsearch
 from elasticsearch_dsl import connections
 from tools.constants import Constants
@@ -10,16 +11,45 @@ class Connection:
     __duplicate_dict: dict
     __host: str
     __port: int
+    __hosts: List[str]
     __index: str
+    __transport: dict
 
     # The connection is a static class variable, reused every time
     __connection = connections.Connections()
-
-    def __init__(self, host: str = None, port: int = None):
+    # The indices known to exist, by client name and index
+    __indices: set = set()
+    # The transport settings of new connections, see use_transport
+    __transport_defaults: dict = {
+        'maxsize': Constants.elastic_pool_size,
+        'http_compress': False,
+        'timeout': Constants.elastic_timeout,
+        'max_retries': Constants.elastic_max_retries,
+    }
+
+    def __init__(self, host: str = None, port: int = None, hosts: List[str] = None,
+                 maxsize: int = None, http_compress: bool = None, timeout: int = None, max_retries: int = None,
+                 retry_on_timeout: bool = True):
+        """hosts is a list of host:port to spread the requests over, it replaces host and port. maxsize is the
+        number of keep-alive connections per host, it should be at least the number of threads using this client.
+        The transport settings not given are those of use_transport. They take effect when the client for these
+        hosts is first created, later connections to the same hosts share that client."""
         self.__duplicate_dict = {}
         self.host = host if host else 'localhost'
         self.port = port if port else 9200
+        self.__hosts = hosts if hosts else []
         self.index = 'catalog'
+        given = {'maxsize': maxsize, 'http_compress': http_compress, 'timeout': timeout, 'max_retries': max_retries}
+        self.__transport = dict(Connection.__transport_defaults, **{k: v for k, v in given.items() if v is not None})
+        self.__transport['retry_on_timeout'] = retry_on_timeout
+        self.__transport['retry_on_status'] = (502, 503, 504)
+
+    @staticmethod
+    def use_transport(pool_size: int = None, timeout: int = None, retries: int = None, compress: bool = None):
+        """Set the transport of the connections created from now on, None keeps a setting. Requests failing with
+        a timeout or 502/503/504 are retried right away on the next connection, the client does not back off."""
+        given = {'maxsize': pool_size, 'http_compress': compress, 'timeout': timeout, 'max_retries': retries}
+        Connection.__transport_defaults.update({k: v for k, v in given.items() if v is not None})
 
     @property
     def host(self) -> str:
@@ -29,15 +59,32 @@ class Connection:
     def port(self) -> int:
         return self.__port
 
+    @property
+    def hosts(self) -> List[str]:
+        return self.__hosts if self.__hosts else [self.__host + ':' + str(self.__port)]
+
     @property
     def index(self) -> str:
-        if not self.get().indices.exists(self.__index):
-            self.create_index(self.__index)
+        """The index is checked for existence, and created if needed, only on first use per client. An index
+        deleted while the client is open is created again after close."""
+        if self.__key not in type(self).__indices:
+            if not self.get().indices.exists(self.__index):
+                self.create_index(self.__index)
+            type(self).__indices.add(self.__key)
         return self.__index
 
     @property
     def connection_name(self) -> str:
-        return self.__index + self.host + str(self.port)
+        return self.__index + self.client_name
+
+    @property
+    def __key(self) -> tuple:
+        return self.client_name, self.__index
+
+    @property
+    def client_name(self) -> str:
+        """All indices on the same hosts share one client and its connection pool"""
+        return ",".join(self.hosts)
 
     @host.setter
     def host(self, host: str):
@@ -53,24 +100,26 @@ class Connection:
 
     def get(self) -> Elasticsearch:
         """The connection is reused. On first try there will be no 'elastic' connection. Create it.
-        Will create different connections for each host:port combination, by using that in the name."""
+        Will create different connections for each set of hosts, by using them in the name."""
 
         try:
-            self.__elastic = type(self).__connection.get_connection(self.connection_name)
+            self.__elastic = type(self).__connection.get_connection(self.client_name)
         except KeyError:
-            type(self).__connection.configure(**{self.connection_name: {'hosts': [self.__host+':'+str(self.__port)]}})
+            type(self).__connection.configure(**{self.client_name: dict(hosts=self.hosts, **self.__transport)})
             return self.get()
 
         return self.__elastic
 
     def close(self) -> None:
         """Force closing connection to elastic on given host and port. Only use if you know what you are doing"""
+        for key in [key for key in type(self).__indices if key[0] == self.client_name]:
+            type(self).__indices.discard(key)
         try:
-            type(self).__connection.get_connection(self.connection_name)
+            type(self).__connection.get_connection(self.client_name)
         except KeyError:
             return
-        type(self).__connection.remove_connection(self.connection_name)
-        print("closed connection to " + self.host + ':' + str(self.port))
+        type(self).__connection.remove_connection(self.client_name)
+        print("closed connection to " + self.client_name)
 
     def create_index(self, index):
-        self.__elastic.indices.create(index=index, body=Constants.index)
+        self.get().indices.create(index=index, body=Constants.index)
@@ -1,4 +1,5 @@
 from elastic.connection import Connection
+from elastic.directories import Directories
 from elasticsearch import Elasticsearch
 from typing import List
 
@@ -10,9 +11,15 @@ class StorageError(EnvironmentError):
 
 class Delete:
     __connection: Connection
+    __directories: Directories
 
     def __init__(self, connection: Connection):
         self.__connection = connection
+        self.__directories = None
+
+    def use_directories(self, directories: Directories):
+        """Mark the directories of the deleted entries as dirty, see update_directories"""
+        self.__directories = directories
 
     @property
     def elastic(self) -> Elasticsearch:
@@ -23,12 +30,16 @@ class Delete:
         return self.__connection.index
 
     def id(self, _id: str) -> None:
+        paths = self.__paths_of([_id])
         result = self.elastic.delete(index=self.index, id=_id)
         if result['result'] != 'deleted':
             raise StorageError("Failed Delete " + result['result'])
+        self.__mark(paths)
 
     def id_list(self, array_of_ids: List[str]) -> int:
+        paths = self.__paths_of(array_of_ids)
         result = self.elastic.delete_by_query(index=self.index, body={"query": {"ids": {"values": array_of_ids}}})
+        self.__mark(paths)
         if len(result['failures']) > 0:
             raise StorageError("Failed Delete " + result['failures'])
         if result['deleted'] != len(array_of_ids):
@@ -37,7 +48,18 @@ class Delete:
         return result['deleted']
 
     def checksum(self, checksum: str) -> int:
+        paths = set()
+        if self.__directories is not None:
+            paths = self.__directories.paths_matching({"term": {"checksum": checksum}})
         result = self.elastic.delete_by_query(index=self.index, body={"query": {"term": {"checksum": checksum}}})
+        self.__mark(paths)
         if len(result['failures']) > 0:
             raise StorageError("Failed Delete " + result['failures'])
         return result['deleted']
+
+    def __paths_of(self, ids: List[str]) -> set:
+        return self.__directories.paths_of(ids) if self.__directories is not None else set()
+
+    def __mark(self, paths: set) -> None:
+        if self.__directories is not None and paths:
+            self.__directories.mark(paths)
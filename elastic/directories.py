@@ -0,0 +1,188 @@
+import hashlib
+import os
+import unicodedata
+from typing import Iterable, List, Optional, Tuple
+
+from elasticsearch import Elasticsearch, ConflictError, NotFoundError
+from elasticsearch.helpers import bulk, scan
+from elasticsearch_dsl import Search
+
+from data import Entry
+from elastic.connection import Connection
+from tools.constants import Constants
+
+
+class Directories:
+    """Summary documents of the directories of the catalog, kept in their own index next to the catalog index.
+
+    A directory has the number and size of the files in it, the totals of its subtree, and two Merkle digests of
+    the subtree: digest over the sorted (name, checksum) of its files and the (name, digest) of its subdirectories,
+    and listing, the same over (name, size), which a listing on disk can be compared with. Subtrees with the same
+    digest have the same content, so a comparison starts at the root and only descends where digests differ.
+
+    Changes to the catalog mark the directories they touch as dirty. refresh recomputes these, and then their
+    parents up to the root. Directories are keyed by their path in NFC, the root of the catalog is ''."""
+    __connection: Connection
+
+    # The directory indices known to exist, by client name and index
+    __created: set = set()
+
+    def __init__(self, connection: Connection):
+        self.__connection = connection
+
+    @property
+    def elastic(self) -> Elasticsearch:
+        return self.__connection.get()
+
+    @property
+    def catalog(self) -> str:
+        return self.__connection.index
+
+    @property
+    def index(self) -> str:
+        """The index is checked for existence, and created if needed, only on first use per client"""
+        index = self.catalog + Constants.directories_suffix
+        key = (self.__connection.client_name, index)
+        if key not in Directories.__created:
+            if not self.elastic.indices.exists(index=index):
+                self.elastic.indices.create(index=index, body=Constants.directories_index)
+            Directories.__created.add(key)
+        return index
+
+    @staticmethod
+    def key(path: str) -> str:
+        return unicodedata.normalize('NFC', path.strip(os.path.sep))
+
+    @staticmethod
+    def parent(path: str) -> Optional[str]:
+        return None if path == "" else os.path.dirname(path)
+
+    @staticmethod
+    def depth(path: str) -> int:
+        return 0 if path == "" else path.count(os.path.sep) + 1
+
+    @staticmethod
+    def digest(files: Iterable[Tuple[str, object]], directories: Iterable[Tuple[str, str]]) -> str:
+        """Merkle digest over the (name, value) of the files and the (name, digest) of the subdirectories of a
+        directory, independent of their order and unicode normal form"""
+        h = hashlib.sha256()
+        for kind, items in (("f", files), ("d", directories)):
+            for name, value in sorted((unicodedata.normalize('NFC', name), str(value)) for name, value in items):
+                h.update(f"{kind}\0{name}\0{value}\n".encode())
+        return h.hexdigest()
+
+    def get(self, path: str) -> Optional[dict]:
+        try:
+            return self.elastic.get(index=self.index, id=Entry.hash_from_name(Directories.key(path)))['_source']
+        except NotFoundError:
+            return None
+
+    def children(self, path: str) -> List[dict]:
+        s = Search(using=self.elastic, index=self.index).filter('term', parent=Directories.key(path))
+        return [hit['_source'] for hit in scan(self.elastic, query=s.to_dict(), index=self.index,
+                                               size=Constants.scroll_page_size)]
+
+    def paths_of(self, ids: Iterable[str]) -> set:
+        """The paths of the catalog entries with the given ids, read before they are changed or deleted"""
+        ids = list(ids)
+        paths = set()
+        for i in range(0, len(ids), Constants.precheck_batch_size):
+            result = self.elastic.mget(index=self.catalog, body={'ids': ids[i:i + Constants.precheck_batch_size]},
+                                       _source_includes=['path'])
+            paths.update(doc['_source']['path'] for doc in result['docs'] if doc.get('found'))
+        return paths
+
+    def paths_matching(self, query: dict) -> set:
+        """The paths of the catalog entries matching the query"""
+        return {hit['_source']['path'] for hit in scan(self.elastic, query={'query': query}, index=self.catalog,
+                                                        _source_includes=['path'], size=Constants.scroll_page_size)}
+
+    def mark(self, paths: Iterable[str]) -> None:
+        """Mark the directories as dirty, after the catalog entries in them changed. The change to the catalog was
+        made already, so a directory that cannot be marked is only reported, rebuild then brings it up to date."""
+        actions = ({'_op_type': 'update', '_index': self.index, '_id': Entry.hash_from_name(path),
+                    'retry_on_conflict': 3, 'doc': {'dirty': True}, 'upsert': Directories.__dirty(path)}
+                   for path in {Directories.key(p) for p in paths})
+        _, errors = bulk(self.elastic, actions, max_retries=Constants.elastic_max_retries, raise_on_error=False,
+                         raise_on_exception=False)
+        for error in errors:
+            print(f"Failed to mark directory, run update_directories --rebuild: {error}")
+
+    def __mark(self, path: str) -> tuple:
+        result = self.elastic.update(index=self.index, id=Entry.hash_from_name(path), retry_on_conflict=3,
+                                     body={'doc': {'dirty': True}, 'upsert': Directories.__dirty(path)})
+        return result['_seq_no'], result['_primary_term']
+
+    @staticmethod
+    def __dirty(path: str) -> dict:
+        return {'path': path, 'parent': Directories.parent(path), 'depth': Directories.depth(path), 'dirty': True}
+
+    def refresh(self) -> int:
+        """Recompute the dirty directories and then their parents, deepest first, return how many were computed.
+        A directory marked again while it is computed stays dirty for the next refresh."""
+        self.elastic.indices.refresh(index=[self.catalog, self.index])
+        s = Search(using=self.elastic, index=self.index).filter('term', dirty=True).source(['path'])
+        pending = {hit['_source']['path']: (hit['_seq_no'], hit['_primary_term'])
+                   for hit in scan(self.elastic, query=s.to_dict(), index=self.index, seq_no_primary_term=True,
+                                   size=Constants.scroll_page_size)}
+        computed = 0
+        while pending:
+            depth = max(Directories.depth(path) for path in pending)
+            for path in [path for path in pending if Directories.depth(path) == depth]:
+                self.__compute(path, pending.pop(path))
+                computed += 1
+                parent = Directories.parent(path)
+                if parent is not None and parent not in pending:
+                    pending[parent] = self.__mark(parent)
+            self.elastic.indices.refresh(index=self.index)     # the parents search for what was just written
+        return computed
+
+    def rebuild(self) -> int:
+        """Drop all directory documents and compute them again from the catalog"""
+        self.elastic.delete_by_query(index=self.index, body={'query': {'match_all': {}}}, refresh=True,
+                                     conflicts='proceed')
+        self.mark(self.paths_matching({'match_all': {}}))
+        self.elastic.indices.refresh(index=self.index)
+        return self.refresh()
+
+    def __files(self, path: str) -> list:
+        """The (name, size, checksum) of the catalog entries in the directory, in any normal form"""
+        variants = sorted({path, unicodedata.normalize('NFD', path)})
+        if len(path) > Constants.max_keyword_length:
+            s = Search().filter('match_phrase', path=path)
+        else:
+            s = Search().filter('terms', **{'path.keyword': variants})
+        s = s.source(['path', 'name', 'size', 'checksum'])
+        return [(hit['_source']['name'], hit['_source'].get('size', 0), hit['_source'].get('checksum'))
+                for hit in scan(self.elastic, query=s.to_dict(), index=self.catalog, size=Constants.scroll_page_size)
+                if Directories.key(hit['_source'].get('path', '')) == path]
+
+    def __compute(self, path: str, version: tuple) -> None:
+        """Write the summary of the directory from its catalog entries and the summaries of its subdirectories,
+        unless the document changed since version. Directories without any files below are dropped."""
+        seq_no, primary_term = version
+        files = self.__files(path)
+        children = self.children(path)
+        try:
+            if not files and not children:
+                self.elastic.delete(index=self.index, id=Entry.hash_from_name(path),
+                                    if_seq_no=seq_no, if_primary_term=primary_term)
+                return
+            # a subdirectory that is still dirty marks this one again when it is computed
+            subdirectories = [(os.path.basename(child['path']), child) for child in children]
+            size = sum(size for _, size, _ in files)
+            summary = dict(Directories.__dirty(path), dirty=False)
+            summary.update({
+                'files': len(files),
+                'bytes': size,
+                'total_files': len(files) + sum(child.get('total_files', 0) for _, child in subdirectories),
+                'total_bytes': size + sum(child.get('total_bytes', 0) for _, child in subdirectories),
+                'digest': Directories.digest(((name, checksum) for name, _, checksum in files),
+                                             ((name, child.get('digest')) for name, child in subdirectories)),
+                'listing': Directories.digest(((name, size) for name, size, _ in files),
+                                              ((name, child.get('listing')) for name, child in subdirectories)),
+            })
+            self.elastic.index(index=self.index, id=Entry.hash_from_name(path), body=summary,
+                               if_seq_no=seq_no, if_primary_term=primary_term)
+        except (ConflictError, NotFoundError):
+            pass    # marked again meanwhile, or gone
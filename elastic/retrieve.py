@@ -1,7 +1,12 @@
+import queue
+import threading
+from typing import Iterable, List
 from data import Factory
 from elastic.connection import Connection
 from elasticsearch import Elasticsearch
+from elasticsearch.helpers import scan
 from elasticsearch_dsl import Search, A
+from tools.constants import Constants
 
 
 class Retrieve:
@@ -19,7 +24,7 @@ class Retrieve:
         return self.__connection.index
 
     def all_ids(self):
-        s = Search(using=self.elastic, index=self.index)
+        s = Search(using=self.elastic, index=self.index).source(False)
         for entry in s.scan():
             yield entry.meta.id
 
@@ -28,18 +33,115 @@ class Retrieve:
         # note: can add _source_includes=['path', 'name'] to restrict the result set
         return result['_source']
 
-    def get_by_checksum(self, checksum: str):
+    def get_by_checksum(self, checksum: str, validate: str = "full"):
         s = Search(using=self.elastic, index=self.index).filter('term', checksum=checksum)
-        result = s.execute()
-        for e in result.hits:
-            yield Factory.from_elastic_entry(e)
+        result = self.elastic.search(index=self.index, body=s.to_dict())
+        for hit in result['hits']['hits']:
+            yield Factory.from_source(hit['_source'], hit['_id'], validate)
 
-    def all_entries(self, directory_filter: str = None):
-        s = Search(using=self.elastic, index=self.index)
+    def get_by_checksums(self, checksums: Iterable[str], validate: str = "full",
+                         batch_size: int = Constants.precheck_batch_size):
+        """Generator over the entries with any of the given checksums, with one terms query per batch"""
+        yield from self.__get_by_terms('checksum', checksums, validate, batch_size)
+
+    def get_by_hashes(self, hashes: Iterable[str], validate: str = "full",
+                      batch_size: int = Constants.precheck_batch_size):
+        """Generator over the entries with any of the given hashes of path and name, see Entry.hash_from_name"""
+        yield from self.__get_by_terms('hash', hashes, validate, batch_size)
+
+    def __get_by_terms(self, field: str, values: Iterable[str], validate: str, batch_size: int):
+        values = list(values)
+        for i in range(0, len(values), batch_size):
+            s = Search(using=self.elastic, index=self.index).filter('terms', **{field: values[i:i + batch_size]})
+            for hit in scan(self.elastic, query=s.to_dict(), index=self.index, size=Constants.scroll_page_size):
+                yield Factory.from_source(hit['_source'], hit['_id'], validate)
+
+    def checksums_since(self, seq_no: int = -1):
+        """Generator over (checksum, _seq_no) of all entries indexed after the given _seq_no"""
+        for entry in self.entries_since(seq_no, ['checksum']):
+            if 'checksum' in entry:
+                yield entry.checksum, entry.meta.seq_no
+
+    def entries_since(self, seq_no: int = -1, fields: List[str] = None):
+        """Generator over all entries indexed or updated after the given _seq_no, with meta.seq_no set.
+        Sequence numbers are counted per shard, the catalog index has a single one."""
+        s = Search(using=self.elastic, index=self.index).filter('range', _seq_no={'gt': seq_no})
+        s = s.params(seq_no_primary_term=True, size=Constants.scroll_page_size)
+        if fields is not None:
+            s = s.source(fields)
+        yield from s.scan()
+
+    def all_entries(self, directory_filter: str = None, fields: List[str] = None, slices: int = 1,
+                    page_size: int = Constants.scroll_page_size, raw: bool = False):
+        """Generator over all entries, or those with a path matching directory_filter.
+        With fields only these fields of the source are returned. With slices > 1 the index is read with that
+        many sliced scrolls in parallel threads, the entries then come in no particular order.
+        With raw the hits are the dicts returned by elastic instead of elasticsearch_dsl objects."""
+        s = Search(using=self.elastic, index=self.index).params(size=page_size)
         if directory_filter is not None:
             s = s.filter('match_phrase', path=directory_filter)
-        for entry in s.scan():
-            yield entry
+        if fields is not None:
+            s = s.source(fields)
+
+        def scroll(sliced: Search):
+            if raw:
+                return scan(self.elastic, query=sliced.to_dict(), index=self.index, size=page_size)
+            return sliced.scan()
+
+        if slices <= 1:
+            yield from scroll(s)
+        else:
+            yield from Retrieve.__sliced_scan(s, slices, scroll)
+
+    def catalog_entries(self, directory_filter: str = None, slices: int = 1,
+                        page_size: int = Constants.scroll_page_size, validate: str = "full"):
+        """Generator over all entries, or those with a path matching directory_filter, as Image, Video or Other.
+        They are built from the raw hits, see Factory.from_source for validate."""
+        for hit in self.all_entries(directory_filter, slices=slices, page_size=page_size, raw=True):
+            yield Factory.from_source(hit['_source'], hit['_id'], validate)
+
+    @staticmethod
+    def __sliced_scan(s: Search, slices: int, scroll):
+        """Run one scroll per slice in its own thread and merge the hits through a bounded queue. If the caller
+        stops early, the threads are told to stop at their next page."""
+        hits = queue.Queue(maxsize=slices * 4)
+        stop = threading.Event()
+        done = object()
+
+        def put(item) -> bool:
+            while not stop.is_set():
+                try:
+                    hits.put(item, timeout=1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def scan_slice(i: int):
+            try:
+                for hit in scroll(s.extra(slice={'id': i, 'max': slices})):
+                    if not put(hit):
+                        return
+            except Exception as e:
+                put(e)
+            finally:
+                put(done)
+
+        threads = [threading.Thread(target=scan_slice, args=(i,), daemon=True) for i in range(0, slices)]
+        for thread in threads:
+            thread.start()
+        try:
+            running = slices
+            while running > 0:
+                hit = hits.get()
+                if hit is done:
+                    running -= 1
+                elif isinstance(hit, Exception):
+                    raise hit
+                else:
+                    yield hit
+        finally:
+            stop.set()
 
     def all_paths(self):
         """
@@ -66,7 +168,35 @@ class Retrieve:
                 yield path.key
             i = i + 1
 
-    def on_nas_but_not_on_dropbox(self, limit: int = 0):
+    def entries_by_path(self, directory_filter: str = None, page_size: int = Constants.scroll_page_size,
+                        validate: str = "full"):
+        """Generator over all entries, or those with a path matching directory_filter, sorted by path and name.
+        Entries with a path or name too long for the keyword fields come last."""
+        s = Search()
+        if directory_filter is not None:
+            s = s.filter('match_phrase', path=directory_filter)
+        for hit in self.__search_after(s, page_size=page_size):
+            yield Factory.from_source(hit['_source'], hit['_id'], validate)
+
+    def entries_in_directories(self, directories: Iterable[str], page_size: int = Constants.scroll_page_size,
+                               validate: str = "full", batch_size: int = Constants.precheck_batch_size):
+        """Generator over the entries with one of the given paths, sorted by path and name per batch of
+        directories, so sorted overall for sorted directories. Paths too long for the keyword field come last."""
+        directories = list(directories)
+        short = [d for d in directories if len(d) <= Constants.max_keyword_length]
+        for i in range(0, len(short), batch_size):
+            s = Search().filter('terms', **{'path.keyword': short[i:i + batch_size]})
+            for hit in self.__search_after(s, page_size=page_size):
+                yield Factory.from_source(hit['_source'], hit['_id'], validate)
+        for directory in [d for d in directories if len(d) > Constants.max_keyword_length]:
+            s = Search().filter('match_phrase', path=directory)
+            for hit in self.__search_after(s, page_size=page_size):
+                if hit['_source'].get('path') == directory:
+                    yield Factory.from_source(hit['_source'], hit['_id'], validate)
+
+    def on_nas_but_not_on_dropbox(self, limit: int = 0, page_size: int = Constants.sorted_page_size,
+                                  validate: str = "full"):
+        """Generator over the entries on the NAS but not on dropbox, sorted by path and name"""
         s = Search.from_dict({
             "query": {
                 "bool": {
@@ -75,14 +205,12 @@ class Retrieve:
                     }
                 }
             })
-        s = s.using(self.elastic).index(self.index)
-        if limit:
-            s = s[:limit]
-        result = s.execute()
-        for e in result.hits:
-            yield Factory.from_elastic_entry(e)
-
-    def on_dropbox_but_not_on_nas(self, limit: int = 0):
+        for hit in self.__search_after(s, limit, page_size):
+            yield Factory.from_source(hit['_source'], hit['_id'], validate)
+
+    def on_dropbox_but_not_on_nas(self, limit: int = 0, page_size: int = Constants.sorted_page_size,
+                                  validate: str = "full"):
+        """Generator over the entries on dropbox but not on the NAS, sorted by path and name"""
         s = Search.from_dict({
             "query": {
                 "bool": {
@@ -91,9 +219,26 @@ class Retrieve:
                     }
                 }
             })
-        s = s.using(self.elastic).index(self.index)
-        if limit:
-            s = s[:limit]
-        result = s.execute()
-        for e in result.hits:
-            yield Factory.from_elastic_entry(e)
+        for hit in self.__search_after(s, limit, page_size):
+            yield Factory.from_source(hit['_source'], hit['_id'], validate)
+
+    def __search_after(self, s: Search, limit: int = 0, page_size: int = Constants.sorted_page_size):
+        """Stream the raw hits of the search sorted by path and name, page by page with search_after. The hash of
+        path and name breaks ties, also between entries too long for the keyword fields, so no hit is skipped.
+        Only one page is in memory, and as pages start after the sort values of the last hit, entries the caller
+        updates or deletes meanwhile do not shift them. Works on all elastic 7 versions, unlike a point in time.
+        A limit of 0 returns all hits."""
+        s = s.sort('path.keyword', 'name.keyword', 'hash')
+        search_after = None
+        returned = 0
+        while limit == 0 or returned < limit:
+            size = page_size if limit == 0 else min(page_size, limit - returned)
+            page = s.extra(size=size)
+            if search_after is not None:
+                page = page.extra(search_after=search_after)
+            hits = self.elastic.search(index=self.index, body=page.to_dict())['hits']['hits']
+            yield from hits
+            returned += len(hits)
+            if len(hits) < size:
+                break
+            search_after = hits[-1]['sort']
@@ -1,11 +1,14 @@
-from typing import Generator
+from typing import Generator, Iterable
 from elasticsearch import Elasticsearch, RequestError
+from elasticsearch.helpers import streaming_bulk, parallel_bulk
 from elasticsearch_dsl import Search
 
 from data import Entry
 from elastic.connection import Connection
+from elastic.directories import Directories
 from tools.constants import Constants
 import os
+import uuid
 
 
 class StorageError(ValueError):
@@ -14,13 +17,28 @@ class StorageError(ValueError):
 
 
 class Store:
+    """Store entries in the catalog, leaving out those already there and giving the others unique names.
+
+    What a Store found in the catalog is kept for its lifetime, which is meant to be one ingest run. Changes
+    made with update are taken into account. Entries deleted otherwise, e.g. with elastic.Delete, must be
+    passed to forget, or else a new Store used, for files added again to be stored."""
+    __identity = ('path', 'name', 'checksum', 'hash', 'path_hash')     # fields the Store remembers values of
 
     __elastic: Elasticsearch
     __allow_duplicates: bool
     __index: str
     __path_hashes: set
     __name_hashes: set
+    __checksums: set
+    __found: dict
+    __checked: dict
+    __directory_names: dict
     __not_stored_count: int
+    __failed_entries: list
+    __chunk_size: int
+    __max_chunk_bytes: int
+    __bulk_workers: int
+    __directories: Directories
 
     def __init__(self, connection: Connection, allow_duplicates: bool = False):
         self.__elastic = connection.get()
@@ -29,7 +47,26 @@ class Store:
         self.__path_hashes = set()
         self.__name_hashes = set()
         self.__checksums = set()
+        # values known to be in elastic per field, and values that a prefetch found not to be in elastic
+        self.__found = {'checksum': self.__checksums, 'path_hash': self.__path_hashes, 'hash': self.__name_hashes}
+        self.__checked = {'checksum': set(), 'path_hash': set(), 'hash': set()}
+        self.__directory_names = dict()
         self.__not_stored_count = 0
+        self.__failed_entries = []
+        self.__directories = None
+        self.use_bulk(Constants.bulk_chunk_size, Constants.bulk_max_chunk_bytes)
+
+    def use_bulk(self, chunk_size: int, max_chunk_bytes: int = Constants.bulk_max_chunk_bytes, workers: int = 0):
+        """Send the entries to elastic in chunks of chunk_size documents, but at most max_chunk_bytes each.
+        With workers > 1 the chunks are sent in parallel by that many threads. A chunk_size of 0 indexes
+        every entry with its own request."""
+        self.__chunk_size = chunk_size
+        self.__max_chunk_bytes = max_chunk_bytes
+        self.__bulk_workers = workers
+
+    def use_directories(self, directories: Directories):
+        """Mark the directories of the entries stored and moved as dirty, see update_directories"""
+        self.__directories = directories
 
     @property
     def allow_duplicates(self) -> bool:
@@ -48,39 +85,133 @@ class Store:
         return self.__elastic
 
     def list(self, entries: Generator, dryrun: bool = False) -> list:
-        stored = []
         self.__not_stored_count = 0
+        self.__failed_entries = []
+        if dryrun:
+            return [e for e in self.__new_entries(entries)]
+        if self.__chunk_size > 0:
+            stored = self.__bulk(self.__new_entries(entries))
+        else:
+            stored = []
+            for e in self.__new_entries(entries):
+                try:
+                    self.elastic.index(index=self.index, body=e.to_dict())
+                except RequestError as err:
+                    self.__failed(e, err)
+                else:
+                    stored.append(e)
+        if stored and self.__directories is not None:
+            self.__directories.mark(e.path for e in stored)
+        return stored
+
+    def __new_entries(self, entries: Generator) -> Generator:
+        """Read the entries in batches of Constants.precheck_batch_size and prefetch which of their checksums,
+        path hashes and name hashes are already in the catalog, with one request per field and batch."""
+        batch = []
         for e in entries:
             if e.kind not in (Constants.IMAGE_KIND, Constants.VIDEO_KIND, Constants.OTHER_KIND):
                 raise StorageError(f"Invalid kind {str(e.kind)} in list for {e.name}")
-            if e.check_if_in_catalog and ((e.checksum in self.__checksums) or self.has_checksum(e.checksum)):
+            batch.append(e)
+            if len(batch) >= Constants.precheck_batch_size:
+                yield from self.__new_entries_in_batch(batch)
+                batch = []
+        yield from self.__new_entries_in_batch(batch)
+
+    def __new_entries_in_batch(self, batch: list) -> Generator:
+        """Skip the entries already in the catalog and give the others a unique name. The hashes of the returned
+        entries are remembered right away, so duplicates within the same list or bulk chunk are caught too."""
+        if len(batch) == 0:
+            return
+        self.__prefetch('checksum', {e.checksum for e in batch if e.check_if_in_catalog})
+        if not self.allow_duplicates:
+            self.__prefetch('path_hash', {e.path_hash for e in batch})
+        self.__prefetch('hash', {e.hash for e in batch if len(e.path) > Constants.max_keyword_length})
+
+        for e in batch:
+            if e.check_if_in_catalog and self.__exists('checksum', e.checksum):
                 # a file with this checksum has already been uploaded into the catalog.
                 self.__not_stored_count += 1
                 continue
-            if not self.allow_duplicates and ((e.path_hash in self.__path_hashes) or self.has_path_hash(e.path_hash)):
+            if not self.allow_duplicates and self.__exists('path_hash', e.path_hash):
                 # don't store if we have this already in our list of hashes we already stored. path_hash = path+checksum
                 self.__not_stored_count += 1
                 continue
 
             # avoid same name
             self.get_name(e)
-            try:
-                if not dryrun:
-                    self.elastic.index(index=self.index, body=e.to_dict())
-            except RequestError as err:
-                print("------------- Failed to store:-------------")
-                print(e.to_dict())
-                print(err)
-                self.__not_stored_count += 1
-            else:
-                if not self.allow_duplicates:
-                    self.__path_hashes.add(e.path_hash)
-                    self.__name_hashes.add(e.hash)
-                    self.__checksums.add(e.checksum)
-                stored.append(e)
+            self.__checked['checksum'].discard(e.checksum)
+            self.__checked['path_hash'].discard(e.path_hash)
+            self.__checked['hash'].discard(e.hash)
+            if not self.allow_duplicates:
+                self.__path_hashes.add(e.path_hash)
+                self.__name_hashes.add(e.hash)
+                self.__checksums.add(e.checksum)
+            yield e
+
+    def __prefetch(self, field: str, values: set):
+        """Find out with a single terms aggregation which of the values of field are in the catalog"""
+        values = values - self.__found[field] - self.__checked[field]
+        if len(values) == 0:
+            return
+        s = Search(using=self.elastic, index=self.index).filter('terms', **{field: list(values)}).extra(size=0)
+        s.aggs.bucket('found', 'terms', field=field, size=len(values))
+        result = s.execute()
+        self.__found[field].update(bucket.key for bucket in result.aggregations.found.buckets)
+        self.__checked[field].update(values)
+
+    def __exists(self, field: str, value: str) -> bool:
+        if value in self.__found[field]:
+            return True
+        if value in self.__checked[field]:
+            return False
+        s = Search(using=self.elastic, index=self.index).filter('term', **{field: value})
+        if len(s.execute().hits) == 0:
+            return False
+        self.__found[field].add(value)
+        return True
+
+    def __bulk(self, entries: Generator) -> list:
+        """Index the entries with the bulk API. Every action is given its id here, the results map back to
+        their entries by it, as documents retried after a 429 come back after the rest of their chunk."""
+        stored = []
+        pending = dict()
+
+        def actions():
+            for e in entries:
+                _id = uuid.uuid4().hex
+                pending[_id] = e
+                yield {'_index': self.index, '_id': _id, '_source': e.to_dict()}
 
+        options = dict(chunk_size=self.__chunk_size, max_chunk_bytes=self.__max_chunk_bytes,
+                       raise_on_error=False, raise_on_exception=False)
+        if self.__bulk_workers > 1:
+            results = parallel_bulk(self.elastic, actions(), thread_count=self.__bulk_workers, **options)
+        else:
+            # chunks rejected with 429 because elastic is busy are retried with exponential backoff
+            results = streaming_bulk(self.elastic, actions(), max_retries=Constants.elastic_max_retries, **options)
+        for ok, item in results:
+            result = item.get('index', item)
+            e = pending.pop(result['_id'])
+            if ok:
+                e.id = result['_id']
+                stored.append(e)
+            else:
+                self.__failed(e, result.get('error', result))
         return stored
 
+    def __failed(self, e: Entry, err):
+        print("------------- Failed to store:-------------")
+        print(e.to_dict())
+        print(err)
+        self.__not_stored_count += 1
+        self.__failed_entries.append(e)
+        if not self.allow_duplicates:
+            self.__path_hashes.discard(e.path_hash)
+            self.__name_hashes.discard(e.hash)
+            self.__checksums.discard(e.checksum)
+        if e.path in self.__directory_names:
+            self.__directory_names[e.path].discard(e.name)
+
     def has_path_hash(self, path_hash) -> bool:
         s = Search(using=self.elastic, index=self.index).filter('term', path_hash=path_hash)
         result = s.execute()
@@ -94,30 +225,83 @@ class Store:
         return hits > 0
 
     def get_name(self, entry):
-        """If a file with the same name already exists, append a '_n' to the name to enumerate through"""
+        """If a file with the same name already exists, append a '_n' to the name to enumerate through.
+        The names in the directory of the entry are read with one query and kept for the run, new names are
+        added as they are given out, so further entries in the same directory are resolved locally."""
+        names = self.__names_in(entry.path)
+        if names is None:
+            self.__get_name_by_hash(entry)
+            return
+        name = entry.name
+        while name in names:
+            name = Store.__next_name(name)
+        entry.name = name
+        names.add(name)
+
+    def __names_in(self, path: str):
+        """The names of all entries in the directory, None if the path is too long for the path.keyword field"""
+        if len(path) > Constants.max_keyword_length:
+            return None
+        if path not in self.__directory_names:
+            s = Search(using=self.elastic, index=self.index).filter('term', **{'path.keyword': path}).source(['name'])
+            self.__directory_names[path] = {hit.name for hit in s.scan()}
+        return self.__directory_names[path]
+
+    def __get_name_by_hash(self, entry):
         name = entry.name
         name_hash = entry.hash
         while self.has_name(name_hash):
-            n, e = os.path.splitext(name)
-            prev_n = n.split("_")[-1]
-            if not prev_n.isdigit() or len(prev_n) == len(n):
-                n = n + '_1'
-            else:
-                n = "_".join(n.split("_")[0:-1]) + '_' + str(int(prev_n)+1)
-            name = n + e
+            name = Store.__next_name(name)
             name_hash = Entry.hash_from_name(os.path.join(entry.path, name))
         entry.name = name
 
+    @staticmethod
+    def __next_name(name: str) -> str:
+        """name.ext -> name_1.ext -> name_2.ext ..."""
+        n, e = os.path.splitext(name)
+        prev_n = n.split("_")[-1]
+        if not prev_n.isdigit() or len(prev_n) == len(n):
+            n = n + '_1'
+        else:
+            n = "_".join(n.split("_")[0:-1]) + '_' + str(int(prev_n)+1)
+        return n + e
+
     def has_name(self, h: str) -> bool:
-        if h in self.__name_hashes:
-            return True
-        s = Search(using=self.elastic, index=self.index).filter('term', hash=h)
-        result = s.execute()
-        return len(result.hits) > 0
+        return self.__exists('hash', h)
 
     def update(self, change, _id: str):
+        """Change fields of the entry with the given id. If the change moves or renames the entry, what the
+        Store remembers about its old and new values, including the names in both directories, is forgotten,
+        so that they are looked up again."""
+        before = None
+        if any(field in change for field in Store.__identity):
+            before = self.elastic.get(index=self.index, id=_id, _source_includes=list(Store.__identity))['_source']
+        paths = self.__directories.paths_of([_id]) if self.__directories is not None else set()
         self.elastic.update(index=self.index, id=_id, body={'doc': change})
+        if before is not None:
+            self.__forget(before)
+            self.__forget(dict(before, **change))
+        if self.__directories is not None:
+            self.__directories.mark(paths | ({change['path']} if 'path' in change else set()))
+
+    def forget(self, entries: Iterable[Entry]):
+        """Forget what the Store found out about the entries, after they were deleted from the catalog"""
+        for e in entries:
+            self.__forget({'path': e.path, 'name': e.name, 'checksum': e.checksum, 'hash': e.hash,
+                           'path_hash': e.path_hash})
+
+    def __forget(self, values: dict):
+        for field in self.__found:
+            self.__found[field].discard(values.get(field))
+            self.__checked[field].discard(values.get(field))
+        # the names of the directory are read again when next needed
+        self.__directory_names.pop(values.get('path'), None)
 
     @property
     def not_stored(self):
         return self.__not_stored_count
+
+    @property
+    def failed(self) -> list:
+        """The entries of the last list that elastic rejected, the others not stored were in the catalog already"""
+        return self.__failed_entries
@@ -0,0 +1,51 @@
+import argparse
+from unittest import TestCase
+
+from elastic.connection import Connection
+from tools import elastic_arguments
+from tools.constants import Constants
+
+
+class TestConnection(TestCase):
+    testIndex = 'test_unit_elastic_connection'
+
+    def tearDown(self) -> None:
+        Connection.use_transport(Constants.elastic_pool_size, Constants.elastic_timeout,
+                                 Constants.elastic_max_retries, False)
+
+    def test_transport(self):
+        parser = argparse.ArgumentParser()
+        elastic_arguments(parser)
+        args = parser.parse_args(['--pool_size', '7', '--timeout', '11', '--retries', '5', '--compress'])
+        Connection.use_transport(args.pool_size, args.timeout, args.retries, args.compress)
+        connection = Connection(hosts=['transport-test:9200'])
+        try:
+            transport = connection.get().transport
+            self.assertEqual(transport.max_retries, 5)
+            self.assertTrue(transport.retry_on_timeout)
+            self.assertEqual(transport.connection_pool.connection.timeout, 11)
+            self.assertTrue(transport.connection_pool.connection.http_compress)
+            self.assertEqual(transport.connection_pool.connection.pool.pool.maxsize, 7)
+        finally:
+            connection.close()
+        # given settings win over those of use_transport
+        connection = Connection(hosts=['transport-test:9200'], timeout=3)
+        try:
+            transport = connection.get().transport
+            self.assertEqual(transport.connection_pool.connection.timeout, 3)
+            self.assertEqual(transport.max_retries, 5)
+        finally:
+            connection.close()
+
+    def test_index(self):
+        connection = Connection()
+        connection.index = self.testIndex
+        self.assertEqual(connection.index, self.testIndex)
+        self.assertTrue(connection.get().indices.exists(self.testIndex))
+        # the index is known to exist, it is not created again while the client is open
+        connection.get().indices.delete(index=self.testIndex)
+        self.assertEqual(connection.index, self.testIndex)
+        self.assertFalse(connection.get().indices.exists(self.testIndex))
+        connection.close()
+        self.assertEqual(connection.index, self.testIndex)
+        self.assertTrue(connection.get().indices.exists(self.testIndex))
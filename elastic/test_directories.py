@@ -0,0 +1,45 @@
+import time
+import unicodedata
+from unittest import TestCase
+
+from data.directory import Folder
+from elastic.connection import Connection
+from elastic.delete import Delete
+from elastic.directories import Directories
+from elastic.retrieve import Retrieve
+from elastic.store import Store
+
+
+class TestDirectories(TestCase):
+    testIndex = 'test_unit_elastic_directories'
+    testDirectory = '../testfiles'
+
+    def test_digest(self):
+        digest = Directories.digest([("b.jpg", "c2"), ("a.jpg", "c1")], [("2020", "d1")])
+        self.assertEqual(digest, Directories.digest([("a.jpg", "c1"), ("b.jpg", "c2")], [("2020", "d1")]))
+        self.assertNotEqual(digest, Directories.digest([("a.jpg", "c1"), ("b.jpg", "c3")], [("2020", "d1")]))
+        self.assertNotEqual(digest, Directories.digest([("a.jpg", "c1"), ("b.jpg", "c2")], [("2020", "d2")]))
+        nfc, nfd = unicodedata.normalize('NFC', "\u00e9.jpg"), unicodedata.normalize('NFD', "\u00e9.jpg")
+        self.assertNotEqual(nfc, nfd)
+        self.assertEqual(Directories.digest([(nfc, "c1")], []), Directories.digest([(nfd, "c1")], []))
+
+    def test_refresh(self):
+        connection = Connection()
+        connection.index = self.testIndex
+        Delete(connection).id_list([i for i in Retrieve(connection).all_ids()])
+        directories = Directories(connection)
+        directories.rebuild()
+        self.assertIsNone(directories.get(""))
+
+        test_directory = Folder()
+        test_directory.read(self.testDirectory)
+        store = Store(connection)
+        store.use_directories(directories)
+        stored = store.list(item for item in test_directory.file_list)
+        time.sleep(1)
+        directories.refresh()
+        root = directories.get("")
+        self.assertEqual(root['total_files'], len(stored))
+        self.assertEqual(root['total_bytes'], sum(e.size for e in stored))
+        self.assertGreater(directories.rebuild(), 0)
+        self.assertEqual(directories.get("")['digest'], root['digest'])
@@ -1,3 +1,4 @@
+import copy
 import json
 import os
 import time
@@ -10,6 +11,7 @@ from elastic.delete import Delete
 from elastic.retrieve import Retrieve
 from elastic.store import Store
 from data.directory import Folder
+from tools.constants import Constants
 
 
 class TestStorage(TestCase):
@@ -112,3 +114,89 @@ class TestStorage(TestCase):
                                                   name_from_captured_date=True,
                                                   keep_manual_names=True)),
                          len(self.file_list) - 1)
+
+    def test_entries_by_path_pages(self):
+        elastic_storage = Store(self.connection)
+        stored = elastic_storage.list(item for item in self.file_list)
+        self.assertGreater(len(stored), 2)
+        time.sleep(1)
+        reader = Retrieve(self.connection)
+        entries = list(reader.entries_by_path(page_size=2, validate="off"))
+        self.assertEqual(sorted(e.id for e in entries), sorted(e.id for e in stored))
+        self.assertEqual([(e.path, e.name) for e in entries], sorted((e.path, e.name) for e in entries))
+
+    def test_prefetch_duplicates(self):
+        entries = self.file_list + self.file_list
+        batch_size = Constants.precheck_batch_size
+        Constants.precheck_batch_size = 3     # the copies are in other batches than the originals
+        try:
+            elastic_storage = Store(self.connection)
+            stored = elastic_storage.list(item for item in entries)
+        finally:
+            Constants.precheck_batch_size = batch_size
+        self.assertEqual(len(stored), len(self.file_list) - 1)
+        self.assertEqual(elastic_storage.not_stored, len(self.file_list) + 1)
+        time.sleep(1)
+        # a new Store finds all of them in the catalog, in a single batch
+        elastic_storage = Store(self.connection)
+        self.assertEqual(len(elastic_storage.list(item for item in entries)), 0)
+        self.assertEqual(elastic_storage.not_stored, len(entries))
+
+    def test_update_forgets(self):
+        elastic_storage = Store(self.connection)
+        stored = elastic_storage.list(item for item in self.file_list)
+        time.sleep(1)
+        moved = copy.copy(stored[0])
+        moved.path = "/ImageCatalog/moved"
+        elastic_storage.update(stored[0].diff(moved), stored[0].id)
+        time.sleep(1)
+        # the same file at the old path is not in the catalog anymore
+        again = copy.copy(stored[0])
+        self.assertEqual(len(elastic_storage.list(item for item in [again, moved])), 1)
+        self.assertEqual(elastic_storage.not_stored, 1)
+
+    def test_bulk_rejected(self):
+        reader = Retrieve(self.connection)
+        for workers in (0, 2):
+            with self.subTest(workers=workers):
+                Delete(self.connection).id_list([i for i in reader.all_ids()])
+                time.sleep(1)
+                entries = [copy.copy(e) for e in self.file_list]
+                rejected = entries[2]
+                rejected.location = "100,200"       # not a valid geo_point, elastic rejects the document
+                elastic_storage = Store(self.connection)
+                elastic_storage.use_bulk(2, workers=workers)
+                stored = elastic_storage.list(item for item in entries)
+                self.assertNotIn(rejected, stored)
+                self.assertEqual(len(stored), len(entries) - 2)     # the exact duplicate and the rejected one
+                self.assertEqual(elastic_storage.not_stored, 2)
+                self.assertEqual(elastic_storage.failed, [rejected])
+                for e in stored:
+                    self.assertEqual(self.elastic_source(e.id)['path_hash'], e.path_hash)
+
+    def elastic_source(self, _id: str) -> dict:
+        return self.connection.get().get(index=self.testIndex, id=_id)['_source']
+
+    def test_unique_names(self):
+        entries = [copy.copy(self.file_list[0]) for _ in range(3)]
+        for i, e in enumerate(entries):
+            e.name = "same.jpg"
+            e.checksum = f"{i:032x}"      # three different files with the same name
+        elastic_storage = Store(self.connection)
+        first = elastic_storage.list(item for item in entries[:1])
+        time.sleep(1)
+        # a new Store reads the name already in the index, the two others are enumerated within the list call
+        elastic_storage = Store(self.connection)
+        stored = elastic_storage.list(item for item in entries[1:3])
+        self.assertEqual([e.name for e in stored], ["same_1.jpg", "same_2.jpg"])
+        time.sleep(1)
+        # renaming and deleting frees the names again
+        elastic_storage.update({'name': "other.jpg"}, first[0].id)
+        Delete(self.connection).id(stored[0].id)
+        elastic_storage.forget(stored[:1])
+        time.sleep(1)
+        again = [copy.copy(e) for e in entries[:2]]
+        for i, e in enumerate(again):
+            e.name = "same.jpg"
+            e.checksum = f"{i + 3:032x}"
+        self.assertEqual([e.name for e in elastic_storage.list(item for item in again)], ["same.jpg", "same_1.jpg"])
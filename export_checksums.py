@@ -0,0 +1,39 @@
+import argparse
+import elastic
+from data.checksum_set import ChecksumSet
+from tools import elastic_arguments
+
+
+def refresh_checksums(filename: str, connection: elastic.Connection, bloom_bits: int = None,
+                      full: bool = False) -> ChecksumSet:
+    """Add the checksums of all entries indexed since the last export to the set in filename, or export all
+    of them again with full. bloom_bits None keeps the Bloom filter setting of an existing file."""
+    checksum_set = ChecksumSet(filename)
+    reader = elastic.Retrieve(connection)
+    start = -1 if full else checksum_set.seq_no
+    checksum_set.add(reader.checksums_since(start), bloom_bits=bloom_bits, replace=full)
+    return checksum_set
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="""Export the checksums of all catalog entries into a sorted,
+    memory mapped file for fast membership tests. If the file exists, only the entries indexed since the last
+    export are added. Use --full after deleting entries from the catalog.""")
+    parser.add_argument('filename', type=str, help='The checksum file, e.g. checksums.npy')
+    parser.add_argument('--full', action='store_true', help='Export all checksums again. Defaults to FALSE')
+    parser.add_argument('--bloom', type=int,
+                        help='Bits per checksum of the Bloom filter, 0 for none. Default: 10 for a new file')
+    elastic_arguments(parser)
+    args = parser.parse_args()
+    elastic.Connection.use_transport(args.pool_size, args.timeout, args.retries, args.compress)
+
+    connection = elastic.Connection(args.host, args.port)
+    if args.index is not None:
+        connection.index = args.index
+
+    count = 0 if args.full else len(ChecksumSet(args.filename))
+    bloom = args.bloom
+    if bloom is None and count == 0:
+        bloom = 10
+    checksums = refresh_checksums(args.filename, connection, bloom, args.full)
+    print(f"{len(checksums)} checksums up to sequence number {checksums.seq_no}, {len(checksums) - count} new")
@@ -0,0 +1,43 @@
+import argparse
+import elastic
+from data.snapshot import Snapshot
+from tools import elastic_arguments, Constants
+
+
+def refresh_snapshot(dirname: str, connection: elastic.Connection, full: bool = False,
+                     prune: bool = False) -> Snapshot:
+    """Add the entries indexed or updated since the last export to the snapshot in dirname, or export all of
+    them again with full. With prune, entries deleted from the catalog are dropped as well."""
+    snapshot = Snapshot(dirname)
+    reader = elastic.Retrieve(connection)
+    start = -1 if full else snapshot.seq_no
+    hits = ((hit.meta.id, hit.meta.seq_no, hit.to_dict()) for hit in reader.entries_since(start, Snapshot.fields))
+    all_ids = reader.all_ids() if prune and not full else None
+    snapshot.refresh(hits, all_ids, replace=full)
+    return snapshot
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="""Export the catalog into a local columnar snapshot for
+    analysis. If the snapshot exists, only the entries indexed or updated since the last export are read.""")
+    parser.add_argument('dirname', type=str, help='The directory of the snapshot')
+    parser.add_argument('--full', action='store_true', help='Export all entries again. Defaults to FALSE')
+    parser.add_argument('--prune', action='store_true', help="""Also drop entries deleted from the catalog,
+    this reads the ids of all entries. Defaults to FALSE""")
+    parser.add_argument('--duplicates', action='store_true', help='Print entries with the same checksum')
+    elastic_arguments(parser)
+    args = parser.parse_args()
+    elastic.Connection.use_transport(args.pool_size, args.timeout, args.retries, args.compress)
+
+    connection = elastic.Connection(args.host, args.port)
+    if args.index is not None:
+        connection.index = args.index
+
+    snapshot = refresh_snapshot(args.dirname, connection, args.full, args.prune)
+    images = len(snapshot.select(kind=Constants.IMAGE_KIND))
+    videos = len(snapshot.select(kind=Constants.VIDEO_KIND))
+    print(f"{len(snapshot)} entries up to sequence number {snapshot.seq_no}: {images} images, {videos} videos "
+          f"in {len(snapshot.paths)} directories")
+    if args.duplicates:
+        for rows in snapshot.duplicates():
+            print(", ".join(f"{entry['path']}/{entry['name']}" for entry in snapshot.entries(rows)))
@@ -1,13 +1,15 @@
 import argparse
 import sys
 import elastic
-import data
 import os
-import json
+import unicodedata
+from collections import defaultdict
 
-from tools import elastic_arguments, run_time, root_arguments
-from tools import Constants
-from data import Factory
+from tools import elastic_arguments, run_time, root_arguments, cache_arguments, checksum_arguments
+from tools import bulk_arguments, validate_arguments, walk_arguments, directories_arguments
+from tools import Constants, read_config
+from tools.walker import Walker
+from data import Entry, Factory, MetadataCache, DirectoryJournal
 
 store: elastic.Store
 reader: elastic.Retrieve
@@ -16,76 +18,171 @@ updated: int = 0
 deleted: int = 0
 loaded: int = 0
 total: int = 0
+in_sync: int = 0
 nas_root: str = ""
 in_catalog_only: list = []
 in_catalog_only_checksums: set = set()
-elastic_paths: set = set()
 on_disk_only: list = []
 updated_checksums: set = set()
+catalog_by_checksum: dict = dict()
+fingerprints: dict = dict()
+sizes: dict = dict()
+unsynced: set = set()
+
+
+def normalized(name: str) -> str:
+    """Paths on disk and in the catalog may be in different unicode normal forms, compare them composed"""
+    return unicodedata.normalize('NFC', name)
 
 
 @run_time
-def check_files_in_catalog(dirname: str):
-    for entry in reader.all_entries(dirname):
-        check_catalog(data.Factory.from_elastic_entry(entry))
-
-
-def check_catalog(elastic_entry):
-    global deleted, updated
-    path = os.path.join(nas_root, elastic_entry.full_path)
-    if not os.path.isfile(path):
-        print(f"In Catalog but not on disk: {elastic_entry.full_path}")
-        in_catalog_only.append(elastic_entry)
-        in_catalog_only_checksums.add(elastic_entry.checksum)
+def check_files(dirname: str, page_size: int = Constants.scroll_page_size, validate: str = "full",
+                journal: DirectoryJournal = None, summaries: elastic.Directories = None,
+                threads: int = Constants.walk_threads):
+    """Merge the catalog entries below dirname, sorted by path and name, with the files below it on disk, walked
+    in the same order. Entries the catalog returns out of that order, e.g. in another normal form or with a path
+    too long to sort on, are left over on both sides and paired up at the end.
+    With a journal of an earlier sync only the directories that changed since are compared, with the directory
+    summaries of the catalog only those whose listing digest differs from the one on disk."""
+    directory = normalized(dirname.strip(os.path.sep))
+    directories = walk_sorted(os.path.join(nas_root, dirname), directory, threads, stat=summaries is not None)
+    compared = None
+    if journal is not None and journal.directories_below(directory):
+        compared = changed_directories(directories, directory, journal)
+        print(f"Directories changed since the last sync: {len(compared)} of {len(fingerprints)}")
+    elif summaries is not None:
+        summaries.refresh()
+        compared = differing_directories(directories, directory, summaries)
+        print(f"Directories that differ from the catalog: {len(compared)} of {len(fingerprints)}")
+    if compared is None:
+        catalog = catalog_sorted(reader.entries_by_path(dirname, page_size, validate), directory)
     else:
-        elastic_paths.add(path)
+        directories = compared
+        variants = sorted({form for d, _ in directories for form in (d, unicodedata.normalize('NFD', d))})
+        catalog = catalog_sorted(reader.entries_in_directories(variants, page_size, validate), directory)
+    merge(catalog, ((key, path) for d, files in directories for key, path in files))
+
+
+def merge(catalog, disk):
+    """Merge join the sorted ((directory, name), entry) of the catalog with the ((directory, name), path) on disk"""
+    global in_sync
+    catalog_only = []
+    disk_only = defaultdict(list)
+    cat_item = next(catalog, None)
+    disk_item = next(disk, None)
+    while cat_item is not None or disk_item is not None:
+        if disk_item is None or (cat_item is not None and cat_item[0] < disk_item[0]):
+            catalog_only.append(cat_item)
+            cat_item = next(catalog, None)
+        elif cat_item is None or disk_item[0] < cat_item[0]:
+            disk_only[disk_item[0]].append(disk_item[1])
+            disk_item = next(disk, None)
+        else:
+            in_sync += 1
+            cat_item = next(catalog, None)
+            disk_item = next(disk, None)
+
+    for key, entry in catalog_only:
+        if disk_only.get(key):
+            disk_only[key].pop()
+            in_sync += 1
+        else:
+            print(f"In Catalog but not on disk: {entry.full_path}")
+            in_catalog_only.append(entry)
+            in_catalog_only_checksums.add(entry.checksum)
+    for paths in disk_only.values():
+        for path in paths:
+            on_disk_only.append(Factory.from_path(path))
+
+
+def catalog_sorted(entries, directory: str):
+    """Generator over ((directory, name), entry) of the catalog entries below directory"""
+    for entry in entries:
+        path = normalized(entry.path)
+        if is_below(path, directory):
+            yield (path, normalized(entry.name)), entry
+
+
+def is_below(path: str, directory: str) -> bool:
+    return directory == "" or path == directory or path.startswith(directory + os.path.sep)
+
+
+def walk_sorted(top: str, directory: str, threads: int = Constants.walk_threads, stat: bool = False):
+    """Generator over (directory, files) of the directories below top, where directory is relative to the
+    catalog root and files are the ((directory, name), path) of the files in it, sorted. Directories come
+    in the order of their names, not depth first, which is the order of the catalog sorted by path and name.
+    The fingerprints of the directories are kept for the journal, with stat the sizes of the files too."""
+    top = top.rstrip(os.path.sep)
+    for found, entries in Walker(threads, stat=stat).walk(top, order=normalized):
+        relative = normalized(found.path[len(top):].lstrip(os.path.sep))
+        path = os.path.join(directory, relative) if relative else directory
+        files = []
+        for item in entries:
+            if item.is_file():
+                files.append(((path, normalized(item.name)), item.path))
+                if stat:
+                    sizes[item.path] = item.stat().st_size
+        fingerprints[path] = DirectoryJournal.fingerprint(found.stat().st_mtime_ns,
+                                                          (normalized(item.name) for item in entries))
+        yield path, sorted(files)
+
+
+def changed_directories(directories, directory: str, journal: DirectoryJournal) -> list:
+    """The walked directories that changed since they were journaled, and the journaled directories below
+    directory that are gone, without files"""
+    changed = [(d, files) for d, files in directories if not journal.unchanged(d, fingerprints[d])]
+    gone = [(d, []) for d in journal.directories_below(directory) if d not in fingerprints]
+    return sorted(changed + gone)
+
+
+def differing_directories(directories, directory: str, summaries: elastic.Directories) -> list:
+    """The directories whose listing digest on disk differs from the one in the catalog, from directory down.
+    Subtrees with the same digest are skipped, without reading their summaries. Directories that are only in
+    the catalog come without files."""
+    files = dict(directories)
+    below = defaultdict(list)
+    for d in files:
+        if d != directory:
+            below[os.path.dirname(d)].append(d)
+    listings = disk_listings(files, below)
+    catalog = {directory: summaries.get(directory)}
+    differing = []
+    pending = [directory]
+    while pending:
+        d = pending.pop()
+        summary = catalog.get(d)
+        if (summary or {}).get('listing') == listings.get(d):
+            continue
+        differing.append((d, files.get(d, [])))
+        children = {child['path']: child for child in summaries.children(d)}
+        catalog.update(children)
+        pending.extend(set(children) | set(below[d]))
+    return sorted(differing)
 
 
-@run_time
-def check_files_on_disk(dirname: str):
-    check_files(dirname)
-
-
-def check_files(dirname: str):
-    with os.scandir(dirname) as iterator:
-        for item in iterator:
-            if item.name in Constants.ignored_paths:
-                continue
-            if item.is_dir():
-                check_files(item.path)
-            elif item.is_file():
-                if item.path not in elastic_paths and relaxed_encoding_compares_false(item.path, elastic_paths):
-                    # print(f"File {item.path} is on disk but not in elastic")
-                    on_disk_only.append(Factory.from_path(item.path))
-
-
-def relaxed_encoding_compares_false(path: str, paths: set) -> bool:
-    arr_path = path.encode()
-    diaeresis = arr_path.find(b"\xcc\x88")
-    if diaeresis > 0:
-        if arr_path[diaeresis - 1] == ord('u'):
-            arr_path = arr_path.replace(b"u\xcc\x88", b"\xc3\xbc")
-        elif arr_path[diaeresis - 1] == ord('a'):
-            arr_path = arr_path.replace(b"a\xcc\x88", b"\xc3\xa4")
-        elif arr_path[diaeresis - 1] == ord('o'):
-            arr_path = arr_path.replace(b"o\xcc\x88", b"\xc3\xb6")
-
-    # acute = arr_path.find(b"\xcc\x81")
-    # if acute > 0:
-    #     if arr_path[diaeresis - 1] == ord('u'):
-    #         arr_path = arr_path.replace(b"u\xcc\x81", b"\xc3\xba")
-    #     elif arr_path[diaeresis - 1] == ord('a'):
-    #         arr_path = arr_path.replace(b"a\xcc\x81", b"\xc3\xa1")
-    #     elif arr_path[diaeresis - 1] == ord('o'):
-    #         arr_path = arr_path.replace(b"o\xcc\x81", b"\xc3\xb3")
-    #     elif arr_path[diaeresis - 1] == ord('e'):
-    #         arr_path = arr_path.replace(b"e\xcc\x81", b"\xc3\xa9")
-
-    return not arr_path.decode() in paths
+def disk_listings(files: dict, below: dict) -> dict:
+    """The listing digests of the walked directories with files below them, see elastic.Directories"""
+    listings = dict()
+    for d in sorted(files, key=elastic.Directories.depth, reverse=True):
+        subdirectories = [(os.path.basename(sub), listings[sub]) for sub in below[d] if sub in listings]
+        if files[d] or subdirectories:
+            listing = ((name, Entry.capped_size(sizes[path])) for (_, name), path in files[d])
+            listings[d] = elastic.Directories.digest(listing, subdirectories)
+    return listings
+
+
+def catalog_entries_with(checksum: str) -> list:
+    return catalog_by_checksum.get(checksum, [])
+
+
+def forget_deleted(entry):
+    store.forget([entry])
+    catalog_by_checksum[entry.checksum] = [item for item in catalog_entries_with(entry.checksum)
+                                           if item.id != entry.id]
 
 
 def main(arg):
-    global updated, deleted, loaded, store, reader, deleter, total, nas_root
+    global updated, deleted, loaded, store, reader, deleter, total, nas_root, in_sync
 
     parser = argparse.ArgumentParser(
         description="""This tool will sync the catalog with the disk contents. The disk is taken as truth,
@@ -98,46 +195,87 @@ def main(arg):
     parser.add_argument('dirname', type=str, help='name of directory to look at')
     parser.add_argument('--quiet', '-q', action='store_true', help='no verbose output')
     parser.add_argument('--yes', '-y', action='store_true', help='answer yes to new catalog files')
+    parser.add_argument('--journal', type=str, help="""sqlite file with the state of the directories at the last
+    sync. Only directories that changed since are compared. Default: none""")
+    parser.add_argument('--digests', action='store_true', help="""Compare the directory digests of the catalog
+    with the disk first and only merge the directories that differ, see update_directories""")
+    parser.add_argument('--full', action='store_true', help='Compare all directories, also with a journal or digests')
     root_arguments(parser)
     elastic_arguments(parser)
+    cache_arguments(parser)
+    checksum_arguments(parser)
+    parser.add_argument('--page_size', type=int, default=Constants.scroll_page_size,
+                        help='Number of catalog entries read per request. Default: 1000')
+    bulk_arguments(parser)
+    validate_arguments(parser)
+    walk_arguments(parser)
+    directories_arguments(parser)
     args = parser.parse_args(arg)
+    elastic.Connection.use_transport(args.pool_size, args.timeout, args.retries, args.compress)
 
     connection = elastic.Connection(args.host, args.port)
     if args.index is not None:
         connection.index = args.index
 
-    with open("config.json", 'r') as file:
-        config = json.load(file)
-    nas_root = config['nas_root'] if not args.nas_root else args.nas_root
+    nas_root = args.nas_root if args.nas_root else read_config()['nas_root']
 
     if not args.quiet:
         print(f"Checking catalog on {connection.host}:{connection.port} with index {connection.index}")
 
     store = elastic.Store(connection)
+    store.use_bulk(args.bulk_size, args.bulk_bytes, args.bulk_threads)
     reader = elastic.Retrieve(connection)
     deleter = elastic.Delete(connection)
-
-    updated = deleted = total = loaded = 0
-
-    check_files_in_catalog(args.dirname)
-    check_files_on_disk(os.path.join(nas_root, args.dirname))
+    if args.directories:
+        directories = elastic.Directories(connection)
+        store.use_directories(directories)
+        deleter.use_directories(directories)
+
+    updated = deleted = total = loaded = in_sync = 0
+
+    Factory.use_parallel_checksum(args.hash_threads)
+    cache = None
+    if args.cache:
+        cache = MetadataCache(args.cache, args.cache_size)
+        Factory.use_cache(cache)
+
+    fingerprints.clear()
+    sizes.clear()
+    unsynced.clear()
+    in_catalog_only.clear()
+    in_catalog_only_checksums.clear()
+    on_disk_only.clear()
+    journal = DirectoryJournal(args.journal) if args.journal else None
+    summaries = elastic.Directories(connection) if args.digests and not args.full else None
+    check_files(args.dirname, args.page_size, args.validate, None if args.full else journal, summaries,
+                args.walk_threads)
+    if cache:
+        if not args.quiet:
+            cache.print_stats()
+        cache.close()
+        Factory.use_cache(None)
     if not args.quiet:
-        print(f"Catalog entries in sync: {len(elastic_paths)}")
+        print(f"Catalog entries in sync: {in_sync}")
         print(f"Catalog entries not found on disk: {len(in_catalog_only)}")
         print(f"On disk but not on catalog: {len(on_disk_only)}")
-    elastic_paths.clear()
+
+    # look up the checksums of all files left over on either side at once
+    catalog_by_checksum.clear()
+    checksums = {item.checksum for item in on_disk_only} | in_catalog_only_checksums
+    for item in reader.get_by_checksums(checksums, args.validate):
+        catalog_by_checksum.setdefault(item.checksum, []).append(item)
 
     # detected moved file or deleted duplicate
     store_list = []
     updated_checksums.clear()
     for new_file in on_disk_only:
         if new_file.checksum in in_catalog_only_checksums:
-            for cat_item in reader.get_by_checksum(new_file.checksum):
+            for cat_item in catalog_entries_with(new_file.checksum):
                 update_catalog_entry_for_moved_file(cat_item, new_file)
                 break
         else:
             found = False
-            for item in reader.get_by_checksum(new_file.checksum):
+            for item in catalog_entries_with(new_file.checksum):
                 if not os.path.exists(os.path.join(nas_root, item.full_path)):
                     update_catalog_entry_for_moved_file(item, new_file)
                     found = True
@@ -152,19 +290,24 @@ def main(arg):
                     new_file.nas = True
                     store_list.append(new_file)
                     loaded += 1
+                else:
+                    unsynced.add(normalized(new_file.path[len(nas_root) + 1:]))
 
     if len(store_list) > 0:
         store.list(item for item in store_list)
+        # the directories of files elastic rejected are compared again next time
+        unsynced.update(normalized(item.path) for item in store.failed)
 
     for file in in_catalog_only:
         if file.checksum in updated_checksums:
             continue
         print(f"""{file.full_path} is only in the catalog.""")
         skip = False
-        for item in reader.get_by_checksum(file.checksum):
+        for item in catalog_entries_with(file.checksum):
             if item.id != file.id:
                 print(f"{file.full_path} is still in catalog as {item.full_path}. Deleting this duplicate.")
                 deleter.id(file.id)
+                forget_deleted(file)
                 deleted += 1
                 skip = True
                 break
@@ -173,7 +316,16 @@ def main(arg):
         yes = input('Delete this file from catalog y/n?:')
         if yes.lower().startswith('y'):
             deleter.id(file.id)
+            forget_deleted(file)
             deleted += 1
+        else:
+            unsynced.add(normalized(file.path))
+
+    if journal is not None:
+        journal.update(normalized(args.dirname.strip(os.path.sep)), fingerprints, unsynced)
+        journal.close()
+    if summaries is not None:
+        summaries.refresh()
 
     return
 
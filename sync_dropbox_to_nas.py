@@ -1,7 +1,7 @@
 import argparse
-from tools import elastic_arguments, root_arguments
+from tools import elastic_arguments, root_arguments, validate_arguments, directories_arguments
 from catalog import CatalogDropbox
-from elastic import Retrieve, Delete
+from elastic import Connection, Retrieve, Delete, Directories
 from data import DBoxError, DBoxNoFileError
 
 if __name__ == '__main__':
@@ -11,7 +11,10 @@ if __name__ == '__main__':
     parser.add_argument('--verbose', '-v', action='store_true', help='Verbose output, print each file name copied')
     root_arguments(parser)
     elastic_arguments(parser)
+    validate_arguments(parser)
+    directories_arguments(parser)
     args = parser.parse_args()
+    Connection.use_transport(args.pool_size, args.timeout, args.retries, args.compress)
 
     index = ""
     if args.index:
@@ -20,6 +23,9 @@ if __name__ == '__main__':
     cat_folder = CatalogDropbox(args.host, args.port, index=index, nas=True)
     retrieve = Retrieve(cat_folder.connection)
     delete = Delete(cat_folder.connection)
+    if args.directories:
+        cat_folder.use_directories()
+        delete.use_directories(Directories(cat_folder.connection))
 
     if args.nas_root:
         cat_folder.nas_root = args.nas_root
@@ -27,7 +33,7 @@ if __name__ == '__main__':
         cat_folder.dropbox_root = args.dropbox_root
 
     n = 0
-    for entry in retrieve.on_dropbox_but_not_on_nas(args.limit):
+    for entry in retrieve.on_dropbox_but_not_on_nas(args.limit, validate=args.validate):
         entry.prepend_original_path(cat_folder.dropbox_root)
         try:
             cat_folder.download_item(entry)
@@ -0,0 +1,65 @@
+import os
+import unicodedata
+from types import SimpleNamespace
+from unittest import TestCase
+
+from dropbox.exceptions import ApiError
+
+import check_copies
+
+
+class Listing:
+    """Dropbox folders by path, counting the listings"""
+    def __init__(self, folders: dict):
+        self.folders = folders
+        self.listed = []
+
+    def list_dir(self, path: str, recurse: bool = False, limit: int = None, path_only: bool = True):
+        self.listed.append(path)
+        if path not in self.folders:
+            raise ApiError("id", "not_found", None, None)
+        return (SimpleNamespace(path_display=os.path.join(path, name), content_hash=content_hash)
+                for name, content_hash in self.folders[path].items())
+
+
+class TestCheckCopies(TestCase):
+    nas = dict(size=1, mtime=2)
+    dropbox = dict(size=1, mtime=2)
+
+    def status(self, nas_checksum, dropbox_checksum, catalog_checksum, reason='size') -> str:
+        return check_copies.verified("a.jpg", nas_checksum, dropbox_checksum, catalog_checksum, reason,
+                                     self.nas, self.dropbox)['status']
+
+    def test_verified(self):
+        self.assertEqual(self.status("n", None, None), 'not_in_catalog_nor_on_dropbox')
+        self.assertEqual(self.status("n", "n", None), 'not_in_catalog')
+        self.assertEqual(self.status("n", "d", None), 'copies_differ')
+        self.assertEqual(self.status("c", None, "c"), 'not_on_dropbox')
+        self.assertEqual(self.status("n", "d", "c"), 'both_differ')
+        self.assertEqual(self.status("n", "c", "c"), 'nas_differs')
+        self.assertEqual(self.status("c", "d", "c"), 'dropbox_differs')
+        self.assertEqual(self.status("c", "c", "c"), 'metadata_differs')
+        self.assertEqual(self.status("c", "c", "c", 'sampled'), 'ok')
+        self.assertEqual(self.status("c", "c", "c", 'full'), 'ok')
+
+    def test_verified_record(self):
+        record = check_copies.verified("a.jpg", "n", "d", "c", 'mtime', self.nas, self.dropbox)
+        self.assertEqual(record, dict(path="a.jpg", status='both_differ', reason='mtime', catalog="c",
+                                      nas=dict(size=1, mtime=2, checksum="n"),
+                                      dropbox=dict(size=1, mtime=2, checksum="d")))
+
+    def test_content_hashes(self):
+        cafe = unicodedata.normalize('NFD', "Café.jpg")
+        check_copies.dbox = Listing({"/Photos/2020": {"A.jpg": "ha", cafe: "hc", "other.jpg": "ho"},
+                                     "/Photos/2021": {"b.jpg": "hb"}})
+        check_copies.listings.clear()
+        paths = ["/Photos/2020/a.jpg", "/Photos/2020/Café.jpg", "/Photos/2020/gone.jpg", "/Photos/2021/b.jpg",
+                 "/Photos/2022/c.jpg"]
+        hashes = check_copies.content_hashes(paths)
+        self.assertEqual({path: hashes.get(check_copies.dropbox_key(path)) for path in paths},
+                         {"/Photos/2020/a.jpg": "ha", "/Photos/2020/Café.jpg": "hc", "/Photos/2020/gone.jpg": None,
+                          "/Photos/2021/b.jpg": "hb", "/Photos/2022/c.jpg": None})
+        # one listing per directory, the last one is kept for the next batch
+        self.assertEqual(check_copies.dbox.listed, ["/Photos/2020", "/Photos/2021", "/Photos/2022"])
+        check_copies.content_hashes(["/Photos/2022/d.jpg"])
+        self.assertEqual(len(check_copies.dbox.listed), 3)
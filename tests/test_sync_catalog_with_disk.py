@@ -1,5 +1,9 @@
 import os
+import shutil
+import tempfile
 import time
+import unicodedata
+from types import SimpleNamespace
 from unittest import TestCase
 
 import sync_catalog_with_disk
@@ -12,6 +16,7 @@ class TestSyncCatalogWithDisk(TestCase):
     test_dir = "../testfiles"
     test_index = 'test_sync'
     test_path = os.path.join(test_dir, test_file)
+    test_image = os.path.join(os.path.dirname(__file__), "..", "testfiles", "spiderman.jpg")
 
     def test_sync(self):
 
@@ -46,3 +51,91 @@ class TestSyncCatalogWithDisk(TestCase):
         reader = Retrieve(connection)
 
         delete.id_list([e for e in reader.all_ids()])
+
+    def test_moved(self):
+        connection = Connection()
+        connection.index = self.test_index
+        reader = Retrieve(connection)
+        Delete(connection).id_list([e for e in reader.all_ids()])
+        root = tempfile.mkdtemp()
+        try:
+            os.makedirs(os.path.join(root, "photos", "a"))
+            shutil.copy(self.test_image, os.path.join(root, "photos", "a", "moved.jpg"))
+            folder = Folder()
+            folder.read(os.path.join(root, "photos", "a"))
+            for e in folder.file_list:
+                e.path = os.path.join("photos", "a")
+            Store(connection).list(item for item in folder.file_list)
+            time.sleep(1)
+
+            # the file left over on disk is paired with the one left over in the catalog by its checksum
+            os.mkdir(os.path.join(root, "photos", "b"))
+            shutil.move(os.path.join(root, "photos", "a", "moved.jpg"), os.path.join(root, "photos", "b"))
+            sync_catalog_with_disk.main(['photos', '--nas_root', root, '--index', self.test_index, '-q', '-y'])
+            time.sleep(1)
+            self.assertEqual([(e.path, e.name) for e in reader.all_entries()], [(os.path.join("photos", "b"),
+                                                                                  "moved.jpg")])
+            self.assertEqual(sync_catalog_with_disk.updated, 1)
+            self.assertEqual((sync_catalog_with_disk.loaded, sync_catalog_with_disk.deleted), (0, 0))
+        finally:
+            shutil.rmtree(root)
+
+
+class TestMerge(TestCase):
+    nfc = unicodedata.normalize('NFC', "Caf\u00e9")
+    nfd = unicodedata.normalize('NFD', "Caf\u00e9")
+    test_image = os.path.join(os.path.dirname(__file__), "..", "testfiles", "spiderman.jpg")
+
+    def setUp(self) -> None:
+        sync_catalog_with_disk.in_sync = 0
+        sync_catalog_with_disk.in_catalog_only.clear()
+        sync_catalog_with_disk.in_catalog_only_checksums.clear()
+        sync_catalog_with_disk.on_disk_only.clear()
+
+    @staticmethod
+    def entry(path: str, name: str, checksum: str = "0" * 32):
+        return SimpleNamespace(path=path, name=name, checksum=checksum, full_path=os.path.join(path, name))
+
+    def merge(self, catalog: list, disk: list):
+        entries = sync_catalog_with_disk.catalog_sorted(iter(catalog), "photos")
+        sync_catalog_with_disk.merge(entries, ((key, path) for key, path in disk))
+
+    def test_normalized(self):
+        self.assertNotEqual(self.nfc, self.nfd)
+        self.assertEqual(sync_catalog_with_disk.normalized(self.nfd), self.nfc)
+        self.assertEqual(sync_catalog_with_disk.normalized(self.nfc), self.nfc)
+
+    def test_normal_forms(self):
+        # the catalog has the names decomposed, the disk composed
+        catalog = [self.entry("photos", self.nfd + ".jpg"), self.entry(os.path.join("photos", self.nfd), "x.jpg")]
+        disk = [(("photos", self.nfc + ".jpg"), ""), ((os.path.join("photos", self.nfc), "x.jpg"), "")]
+        self.merge(catalog, disk)
+        self.assertEqual(sync_catalog_with_disk.in_sync, 2)
+        self.assertEqual(sync_catalog_with_disk.in_catalog_only, [])
+        self.assertEqual(sync_catalog_with_disk.on_disk_only, [])
+
+    def test_out_of_order(self):
+        # entries the catalog sorts differently are left over on both sides and paired by their key
+        catalog = [self.entry("photos", "c.jpg"), self.entry("photos", "a.jpg"), self.entry("photos", "b.jpg")]
+        disk = [(("photos", "a.jpg"), ""), (("photos", "b.jpg"), ""), (("photos", "c.jpg"), "")]
+        self.merge(catalog, disk)
+        self.assertEqual(sync_catalog_with_disk.in_sync, 3)
+        self.assertEqual(sync_catalog_with_disk.in_catalog_only, [])
+        self.assertEqual(sync_catalog_with_disk.on_disk_only, [])
+
+    def test_catalog_only(self):
+        gone = self.entry("photos", "b.jpg", "1" * 32)
+        catalog = [self.entry("photos", "a.jpg"), gone, self.entry("other", "b.jpg")]
+        self.merge(catalog, [(("photos", "a.jpg"), "")])
+        self.assertEqual(sync_catalog_with_disk.in_sync, 1)
+        self.assertEqual(sync_catalog_with_disk.in_catalog_only, [gone])
+        self.assertEqual(sync_catalog_with_disk.in_catalog_only_checksums, {gone.checksum})
+        self.assertEqual(sync_catalog_with_disk.on_disk_only, [])
+
+    def test_disk_only(self):
+        catalog = [self.entry("photos", "b.jpg")]
+        disk = [(("photos", "a.jpg"), self.test_image), (("photos", "b.jpg"), "")]
+        self.merge(catalog, disk)
+        self.assertEqual(sync_catalog_with_disk.in_sync, 1)
+        self.assertEqual(sync_catalog_with_disk.in_catalog_only, [])
+        self.assertEqual([e.name for e in sync_catalog_with_disk.on_disk_only], ["spiderman.jpg"])
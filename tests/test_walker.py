@@ -0,0 +1,71 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from tools.walker import Walker
+
+
+class TestWalker(TestCase):
+    def setUp(self) -> None:
+        self.root = tempfile.mkdtemp()
+        for directory in ("B", "a", os.path.join("a", "c"), os.path.join("a", "c", "d"), ".hidden"):
+            os.mkdir(self.path(directory))
+        for file in ("top.jpg", os.path.join("a", "x.jpg"), os.path.join("a", "c", "d", "y.jpg"),
+                     os.path.join("B", ".z.jpg"), os.path.join(".hidden", "h.jpg"), os.path.join("a", ".DS_Store")):
+            with open(self.path(file), 'w') as f:
+                f.write(file)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.root)
+
+    def path(self, *names) -> str:
+        return os.path.join(self.root, *names)
+
+    def directories(self, walker: Walker, order=None) -> list:
+        return [directory.path for directory, _ in walker.walk(self.root, order)]
+
+    def test_unordered(self):
+        self.assertEqual(sorted(self.directories(Walker(4))),
+                         sorted([self.root, self.path("B"), self.path("a"), self.path("a", "c"),
+                                 self.path("a", "c", "d"), self.path(".hidden")]))
+
+    def test_ordered(self):
+        self.assertEqual(self.directories(Walker(4), order=str.lower),
+                         [self.root, self.path(".hidden"), self.path("a"), self.path("a", "c"),
+                          self.path("a", "c", "d"), self.path("B")])
+        self.assertEqual(self.directories(Walker(4), order=lambda path: path)[-1], self.path("a", "c", "d"))
+
+    def test_max_depth(self):
+        self.assertEqual(self.directories(Walker(2, max_depth=0)), [self.root])
+        self.assertEqual(sorted(self.directories(Walker(2, max_depth=1))),
+                         sorted([self.root, self.path("B"), self.path("a"), self.path(".hidden")]))
+        # the entries of the deepest directory listed are still returned
+        top, entries = next(Walker(2, max_depth=0).walk(self.root))
+        self.assertEqual(sorted(entry.name for entry in entries), [".hidden", "B", "a", "top.jpg"])
+
+    def test_filters(self):
+        names = {entry.name for _, entries in Walker(2).walk(self.root) for entry in entries}
+        self.assertIn(".z.jpg", names)
+        self.assertIn("h.jpg", names)
+        self.assertNotIn(".DS_Store", names)
+        walker = Walker(2, hidden=False)
+        names = {entry.name for _, entries in walker.walk(self.root) for entry in entries}
+        self.assertEqual(names, {"top.jpg", "B", "a", "x.jpg", "c", "d", "y.jpg"})
+        self.assertNotIn(self.path(".hidden"), self.directories(walker))
+
+    def test_files(self):
+        self.assertEqual(sorted(entry.path for entry in Walker(2, hidden=False).files(self.root)),
+                         sorted([self.path("top.jpg"), self.path("a", "x.jpg"), self.path("a", "c", "d", "y.jpg")]))
+
+    def test_stat(self):
+        for stat in (True, False):
+            for directory, entries in Walker(2, stat=stat).walk(self.root):
+                self.assertEqual(directory.stat().st_mtime_ns, os.stat(directory.path).st_mtime_ns)
+                for entry in entries:
+                    self.assertEqual(entry._stat is not None, stat)
+                    self.assertEqual(entry.stat().st_size, os.stat(entry.path).st_size)
+                    self.assertEqual(entry.depth, directory.depth + 1)
+                    if entry.is_file():
+                        self.assertFalse(entry.is_dir())
+                        self.assertEqual(entry.stat().st_size, len(os.path.relpath(entry.path, self.root)))
@@ -0,0 +1,103 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import TestCase
+
+from tools.watcher import Poller, Watcher
+
+
+class TestPoller(TestCase):
+    def setUp(self) -> None:
+        self.root = tempfile.mkdtemp()
+        for directory in ("a", "b", os.path.join("b", "c")):
+            os.mkdir(os.path.join(self.root, directory))
+        for file in (os.path.join("a", "x.jpg"), os.path.join("b", "c", "y.jpg")):
+            open(os.path.join(self.root, file), 'w').close()
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.root)
+
+    def path(self, *names) -> str:
+        return os.path.join(self.root, *names)
+
+    def test_events(self):
+        poller = Poller(self.root, 0)
+        self.assertEqual(poller.events(0), [])
+        time.sleep(0.01)
+        open(self.path("a", "new.jpg"), 'w').close()
+        os.remove(self.path("a", "x.jpg"))
+        os.mkdir(self.path("d"))
+        open(self.path("d", "z.jpg"), 'w').close()
+        shutil.rmtree(self.path("b"))
+        self.assertEqual(sorted(poller.events(0)), [('changed', self.path("a", "new.jpg")),
+                                                    ('changed', self.path("d", "z.jpg")),
+                                                    ('deleted', self.path("a", "x.jpg")),
+                                                    ('deleted_dir', self.path("b"))])
+        self.assertEqual(poller.events(0), [])
+
+        # the directories below the deleted one are not watched anymore, the new one is
+        time.sleep(0.01)
+        open(self.path("d", "w.jpg"), 'w').close()
+        self.assertEqual(poller.events(0), [('changed', self.path("d", "w.jpg"))])
+
+    def test_interval(self):
+        poller = Poller(self.root, 60)
+        open(self.path("a", "new.jpg"), 'w').close()
+        self.assertEqual(poller.events(0.01), [])
+
+
+class TestWatcher(TestCase):
+    def setUp(self) -> None:
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.root)
+
+    def write(self, name: str, times: int, every: float):
+        with open(os.path.join(self.root, name), 'a') as file:
+            for _ in range(times):
+                file.write("more")
+                file.flush()
+                time.sleep(every)
+
+    def test_settle(self):
+        watcher = Watcher(self.root, settle=0.3, interval=0.05, max_delay=10, polling=True)
+        writer = threading.Thread(target=self.write, args=("photo.jpg", 8, 0.1))
+        writer.start()
+        start = time.monotonic()
+        added, deleted, deleted_dirs = next(watcher.changes())
+        # only reported once it stopped changing for the settle time
+        self.assertGreaterEqual(time.monotonic() - start, 0.8 + 0.3)
+        self.assertEqual((added, deleted, deleted_dirs), ([os.path.join(self.root, "photo.jpg")], [], []))
+        writer.join()
+        watcher.close()
+
+    def test_max_delay(self):
+        watcher = Watcher(self.root, settle=0.2, interval=0.05, max_delay=0.8, polling=True)
+        open(os.path.join(self.root, "done.jpg"), 'w').close()
+        writer = threading.Thread(target=self.write, args=("busy.jpg", 40, 0.05))
+        writer.start()
+        start = time.monotonic()
+        added, _, _ = next(watcher.changes())
+        # the settled file does not wait for the one still written longer than max_delay
+        self.assertLess(time.monotonic() - start, 1.8)
+        self.assertEqual(added, [os.path.join(self.root, "done.jpg")])
+        writer.join()
+        added, _, _ = next(watcher.changes())
+        self.assertEqual(added, [os.path.join(self.root, "busy.jpg")])
+        watcher.close()
+
+    def test_deleted(self):
+        os.mkdir(os.path.join(self.root, "album"))
+        open(os.path.join(self.root, "album", "old.jpg"), 'w').close()
+        watcher = Watcher(self.root, settle=0.2, interval=0.05, max_delay=10, polling=True)
+        open(os.path.join(self.root, "photo.jpg"), 'w').close()
+        changes = watcher.changes()
+        self.assertEqual(next(changes), ([os.path.join(self.root, "photo.jpg")], [], []))
+        os.remove(os.path.join(self.root, "photo.jpg"))
+        shutil.rmtree(os.path.join(self.root, "album"))
+        self.assertEqual(next(changes), ([], [os.path.join(self.root, "photo.jpg")],
+                                         [os.path.join(self.root, "album")]))
+        watcher.close()
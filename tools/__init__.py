@@ -1,4 +1,6 @@
-from .default_args import elastic_arguments, upload_arguments, root_arguments
+from .default_args import elastic_arguments, upload_arguments, root_arguments, cache_arguments, \
+    checksum_arguments, bulk_arguments, scroll_arguments, validate_arguments, walk_arguments, \
+    geocode_arguments, directories_arguments
 from .my_decorators import run_time
 from .constants import Constants, TestConstants, get_months, get_month_by_number
 from .read_config import read_config
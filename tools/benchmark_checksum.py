@@ -0,0 +1,50 @@
+import os
+import argparse
+import tempfile
+from data import Factory
+from tools import run_time
+
+
+@run_time
+def sequential(filename: str) -> str:
+    return Factory.checksum(filename, workers=0)
+
+
+@run_time
+def parallel(filename: str, workers: int) -> str:
+    return Factory.checksum(filename, workers=workers)
+
+
+def throughput(size: int, seconds: float) -> str:
+    return f"{size / 1024 / 1024 / seconds:.1f} MB/s"
+
+
+def create_test_file(size_mb: int) -> str:
+    handle, name = tempfile.mkstemp(suffix=".bin")
+    with os.fdopen(handle, "wb") as file:
+        for _ in range(size_mb):
+            file.write(os.urandom(1024 * 1024))
+    return name
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="""Measure the throughput of the dropbox content hash in MB/s,
+    sequential against hashing the blocks in a thread pool. Run it twice for numbers that come from the page cache.""")
+    parser.add_argument('filename', nargs='?', type=str, help='File to hash. Default: a random temporary file')
+    parser.add_argument('--size', type=int, default=1024, help='Size in MB of the temporary file. Default: 1024')
+    parser.add_argument('--threads', type=int, nargs='+', default=[2, 4, 8], help='Thread counts to measure')
+    args = parser.parse_args()
+
+    name = args.filename if args.filename else create_test_file(args.size)
+    try:
+        file_size = os.path.getsize(name)
+        expected = sequential(name)
+        print(f"sequential: {throughput(file_size, sequential.timed)}")
+        for threads in args.threads:
+            if parallel(name, threads) != expected:
+                print(f"{threads} threads: checksum MISMATCH")
+            else:
+                print(f"{threads} threads: {throughput(file_size, parallel.timed)}")
+    finally:
+        if not args.filename:
+            os.remove(name)
@@ -0,0 +1,69 @@
+import argparse
+import time
+import tracemalloc
+
+from elasticsearch_dsl.response import Hit
+
+from data import Factory, Image
+from tools import Constants
+
+
+def create(count: int) -> list:
+    entries = []
+    for i in range(0, count):
+        image = Image()
+        image.full_path = f"2020/{1 + i % 12:02d}_Month/IMG_{i}.jpg"
+        image.size = 1000000 + i
+        image.modified = 1587456138000 + i
+        image.captured = 1487456138000 + i
+        image.checksum = f"{i:064x}"
+        image.location = "47.50632,8.69123"
+        image.dimensions = "4032x3024"
+        image.nas = True
+        entries.append(image)
+    return entries
+
+
+def per_entry(seconds: float, count: int) -> str:
+    return f"{seconds / count * 1000000:.2f} us/entry"
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="""Measure time and memory per catalog entry to create
+    entries, serialize them with to_dict, read them back from raw sources with each validation and from
+    elastic hits, and diff them.""")
+    parser.add_argument('--count', type=int, default=1000000, help='Number of entries. Default: 1000000')
+    args = parser.parse_args()
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    images = create(args.count)
+    elapsed = time.perf_counter() - start
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"create:    {per_entry(elapsed, args.count)}, {memory / args.count:.0f} bytes/entry")
+
+    start = time.perf_counter()
+    documents = [image.to_dict() for image in images]
+    print(f"to_dict:   {per_entry(time.perf_counter() - start, args.count)}")
+
+    start = time.perf_counter()
+    documents = [image.to_dict() for image in images]
+    print(f"again:     {per_entry(time.perf_counter() - start, args.count)}")
+
+    for validate in Constants.validations:
+        start = time.perf_counter()
+        for i, document in enumerate(documents):
+            Factory.from_source(document, str(i), validate)
+        print(f"{validate + ':':10} {per_entry(time.perf_counter() - start, args.count)}")
+
+    hits = [Hit({'_id': str(i), '_index': 'catalog', '_source': document}) for i, document in enumerate(documents)]
+    del documents
+    start = time.perf_counter()
+    read = [Factory.from_elastic_entry(hit) for hit in hits]
+    print(f"hydrate:   {per_entry(time.perf_counter() - start, args.count)}")
+
+    start = time.perf_counter()
+    for image, other in zip(images, read):
+        image.diff(other)
+    print(f"diff:      {per_entry(time.perf_counter() - start, args.count)}")
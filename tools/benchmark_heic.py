@@ -0,0 +1,48 @@
+import io
+import os
+import argparse
+import time
+
+import exifread
+import pyheif
+
+from data import ExifReader, Exif
+from tools import TestConstants
+
+
+def with_pyheif(path: str) -> Exif:
+    with open(path, 'rb') as file:
+        for metadata in pyheif.read_heif(file).metadata or []:
+            if metadata['type'] == 'Exif':
+                return Exif.from_tags(exifread.process_file(io.BytesIO(metadata['data'][6:]), details=False))
+    return Exif()
+
+
+def with_box_reader(path: str) -> Exif:
+    return ExifReader.read(path, 'heic')
+
+
+def measure(method, path: str, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(0, repeat):
+        method(path)
+    return (time.perf_counter() - start) / repeat
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="""Compare the time to extract the Exif data of HEIC files by
+    decoding them with pyheif against reading only the meta box. The cost of decoding grows with the resolution
+    of the image, give photos taken with a camera or phone to see it.""")
+    parser.add_argument('files', type=str, nargs='*', help='HEIC files to read. Default: the test image')
+    parser.add_argument('--repeat', type=int, default=5, help='Repetitions per file. Default: 5')
+    args = parser.parse_args()
+
+    for path in args.files or [os.path.join(TestConstants.testdir, "food.heic")]:
+        expected, actual = with_pyheif(path), with_box_reader(path)
+        if (expected.date_time_original, expected.latitude, expected.longitude) != \
+                (actual.date_time_original, actual.latitude, actual.longitude):
+            print(f"{path}: results differ")
+        pyheif_time = measure(with_pyheif, path, args.repeat)
+        box_time = measure(with_box_reader, path, args.repeat)
+        print(f"{path} ({os.path.getsize(path) / 1024 / 1024:.1f} MB): pyheif {pyheif_time * 1000:.1f} ms, "
+              f"meta box {box_time * 1000:.2f} ms, {pyheif_time / box_time:.0f}x faster")
@@ -0,0 +1,27 @@
+import argparse
+import os
+import time
+
+import reverse_geocoder
+
+from data import Gazetteer
+from tools import Constants
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="""Build the gazetteer file from the cities of reverse_geocoder.
+    Pass it to the upload scripts with --gazetteer, they then find the nearest cities of locations in it without
+    loading reverse_geocoder. Build it again after reverse_geocoder was updated.""")
+    parser.add_argument('filename', type=str, help='the gazetteer file to write')
+    parser.add_argument('--csv', type=str,
+                        default=os.path.join(os.path.dirname(reverse_geocoder.__file__), 'rg_cities1000.csv'),
+                        help='csv file of the cities with columns lat, lon and name. Default: the one of '
+                             'reverse_geocoder')
+    parser.add_argument('--cell_degrees', type=float, default=Constants.gazetteer_cell_degrees,
+                        help='Size of the grid cells in degrees. Default: 1')
+    args = parser.parse_args()
+
+    start = time.time()
+    count = Gazetteer.build(args.csv, args.filename, args.cell_degrees)
+    print(f"Wrote {count} cities to {args.filename}, {os.path.getsize(args.filename)} bytes, "
+          f"in {time.time() - start:.1f} seconds")
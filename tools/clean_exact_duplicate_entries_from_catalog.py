@@ -9,7 +9,10 @@ if __name__ == '__main__':
     parser.add_argument('--dirname', '-d', type=str, help='name of directory check for exact duplicates')
     parser.add_argument('--dryrun', action='store_true', help="don't delete, just print. Default: false")
     default_args.elastic_arguments(parser)
+    default_args.scroll_arguments(parser)
+    default_args.directories_arguments(parser)
     args = parser.parse_args()
+    elastic.Connection.use_transport(args.pool_size, args.timeout, args.retries, args.compress)
 
     connection = elastic.Connection(args.host, args.port)
     if args.index is not None:
@@ -17,7 +20,7 @@ if __name__ == '__main__':
 
     reader = elastic.Retrieve(connection)
     entry_list = dict()
-    for entry in reader.all_entries(args.dirname):
+    for entry in reader.all_entries(args.dirname, fields=['hash'], slices=args.slices, page_size=args.page_size):
         entry_list.setdefault(entry.hash, []).append(entry.meta.id)
 
     duplicates = [
@@ -31,5 +34,7 @@ if __name__ == '__main__':
         print(duplicates)
     else:
         deleter = elastic.Delete(connection)
+        if args.directories:
+            deleter.use_directories(elastic.Directories(connection))
         n = deleter.id_list(duplicates)
         print(f"Deleted {n} duplicates.")
@@ -3,6 +3,7 @@ class Constants:
                   "type", "checksum", "captured", "location", "dimensions", "duration", "kind")
     leave_out_when_reading_from_elastic = ("name", "path", "type", "hash", "path_hash", "kind", "meta")
     date_keys = ("modified", "captured")
+    record_attributes = ("modified", "size", "checksum", "captured", "location", "dimensions", "duration")
     image_types = {'png', 'jpg', 'jpeg', 'jpg2', 'jp2', 'heic', 'bmp', 'gif', 'orf', 'nef', 'cr2', 'mpo'}
     video_types = {'mov', 'avi', 'mp4', 'mpg', 'm4v', 'wmv', 'mts', '3gp'}
     other_types = {'psd'}
@@ -45,6 +46,51 @@ class Constants:
         }
     }
 
+    directories_suffix: str = "_directories"    # the directory summaries of an index are in index + suffix
+    directories_index = {
+        "mappings": {
+            "properties": {
+                "path": {"type": "keyword"},
+                "parent": {"type": "keyword"},
+                "depth": {"type": "integer"},
+                "files": {"type": "integer"},
+                "bytes": {"type": "long"},
+                "total_files": {"type": "long"},
+                "total_bytes": {"type": "long"},
+                "digest": {"type": "keyword"},
+                "listing": {"type": "keyword"},
+                "dirty": {"type": "boolean"}
+            }
+        }
+    }
+
+    bulk_chunk_size: int = 500
+    bulk_max_chunk_bytes: int = 10 * 1024 * 1024
+    precheck_batch_size: int = 1000
+    elastic_pool_size: int = 16
+    elastic_timeout: int = 30
+    elastic_max_retries: int = 3
+    scroll_page_size: int = 1000
+    sorted_page_size: int = 100     # hits per page when reading the catalog sorted by path
+    validations: tuple = ("full", "sampled", "off")     # how entries read from elastic are checked
+    validate_sample_rate: int = 100    # sampled validation checks one in that many entries
+    geocode_precision: int = 2      # decimal places of the grid cells locations are geocoded for, about 1 km
+    verify_sample_rate: int = 100   # check_copies --verify sampled hashes one in that many copies
+    copy_mtime_tolerance: int = 2   # seconds the modification times of two copies of a file may differ
+    gazetteer_cell_degrees: float = 1.0   # size of the grid cells the cities of the gazetteer are sorted by
+    nominatim_url: str = "https://nominatim.openstreetmap.org"
+    nominatim_rate: float = 1.0     # requests per second, the usage policy of the public server allows one
+    nominatim_workers: int = 2      # requests to Nominatim in flight at once
+    nominatim_retries: int = 3      # a failed request is retried that often before the offline city is used
+    nominatim_backoff: float = 2.0  # seconds before the first retry, doubled for every further one
+    nominatim_timeout: float = 60.0
+    walk_threads: int = 8           # directories listed in parallel when walking a tree
+    watch_settle: float = 5.0       # seconds a new file must stay unchanged before it is read
+    watch_interval: float = 30.0    # seconds between listings when watching by polling
+    watch_max_delay: float = 60.0   # seconds after which changes are applied even if other files are still written
+
+    max_keyword_length: int = 256    # longer names and paths are not in the keyword fields of the index
+
     catalog_root: str = "ImageCatalog"
     nas_mount: str = "/Volumes/Photos"
 
@@ -52,8 +98,13 @@ class Constants:
     exif_width: str = "EXIF ExifImageWidth"
     exif_height: str = "EXIF ExifImageLength"
     exif_date_time_format: str = "%Y:%m:%d %H:%M:%S"
+    exif_jpeg_types = {'jpg', 'jpeg', 'mpo'}
+    exif_tiff_types = {'orf', 'nef', 'cr2'}
+    exif_heif_types = {'heic'}
     video_duration_format: str = "%Y-%m-%d %H:%M:%S"
     video_duration_format2: str = "%Y-%m-%d/ %H:%M"
+    video_creation_time_format: str = "%Y-%m-%dT%H:%M:%S"
+    iso_media_types = {'mov', 'mp4', 'm4v', '3gp'}
     GPS: dict = dict(latR="GPS GPSLatitudeRef",
                      lat="GPS GPSLatitude",
                      lonR="GPS GPSLongitudeRef",
@@ -2,6 +2,15 @@ def elastic_arguments(parser):
     parser.add_argument('--host', type=str, help='the host where elastic runs. Default: localhost')
     parser.add_argument('--port', type=int, help='the port where elastic runs. Default: 9200')
     parser.add_argument('--index', type=str, help='the index in elastic to use. Defauls to ''catalog''')
+    parser.add_argument('--pool_size', type=int, help='keep-alive connections per elastic host. Default: 16')
+    parser.add_argument('--timeout', type=int, help='seconds to wait for an answer from elastic. Default: 30')
+    parser.add_argument('--retries', type=int, help='retries of requests to elastic that timed out. Default: 3')
+    parser.add_argument('--compress', action='store_true', help='compress the requests to elastic. Default: false')
+
+
+def directories_arguments(parser):
+    parser.add_argument('--directories', action='store_true',
+                        help='Mark the directories of the changed entries for update_directories. Default: false')
 
 
 def upload_arguments(parser):
@@ -15,3 +24,53 @@ def upload_arguments(parser):
 def root_arguments(parser):
     parser.add_argument('--nas_root', type=str, help='Use this as catalog root on NAS')
     parser.add_argument('--dropbox_root', type=str, help='Use this as catalog root on Dropbox')
+
+
+def cache_arguments(parser):
+    parser.add_argument('--cache', type=str, help='sqlite file to cache file metadata between runs. Default: none')
+    parser.add_argument('--cache_size', type=int, default=1000000,
+                        help='Maximum number of files kept in the metadata cache. Default: 1000000')
+
+
+def geocode_arguments(parser):
+    parser.add_argument('--geocode_cache', type=str,
+                        help='sqlite file to cache the cities found for locations between runs. Default: none')
+    parser.add_argument('--gazetteer', type=str,
+                        help='Gazetteer file built by tools/build_gazetteer.py, to find cities without loading '
+                             'reverse_geocoder. Default: none')
+    parser.add_argument('--nominatim', type=str, default="https://nominatim.openstreetmap.org",
+                        help='Nominatim server to look up addresses with, e.g. a local one. Default: the public one')
+    parser.add_argument('--nominatim_rate', type=float, default=1.0,
+                        help='Requests per second to the Nominatim server. Default: 1')
+
+
+def checksum_arguments(parser):
+    parser.add_argument('--hash_threads', type=int, default=0,
+                        help='Hash the blocks of large files with this many threads. Default: 0, sequential')
+
+
+def scroll_arguments(parser):
+    parser.add_argument('--slices', type=int, default=1,
+                        help='Read the catalog with this many parallel sliced scrolls. Default: 1')
+    parser.add_argument('--page_size', type=int, default=1000,
+                        help='Number of entries per scroll page. Default: 1000')
+
+
+def walk_arguments(parser):
+    parser.add_argument('--walk_threads', type=int, default=8,
+                        help='List this many directories in parallel when walking a tree. Default: 8')
+
+
+def validate_arguments(parser):
+    parser.add_argument('--validate', choices=['full', 'sampled', 'off'], default='full',
+                        help="""Check hash and path_hash of the entries read from the catalog: all of them, one in
+                        100 or none. Default: full""")
+
+
+def bulk_arguments(parser):
+    parser.add_argument('--bulk_size', type=int, default=500,
+                        help='Index this many entries per bulk request, 0 for one request per entry. Default: 500')
+    parser.add_argument('--bulk_bytes', type=int, default=10 * 1024 * 1024,
+                        help='Maximum size of a bulk request in bytes. Default: 10MB')
+    parser.add_argument('--bulk_threads', type=int, default=0,
+                        help='Send bulk requests with this many threads. Default: 0, sequential')
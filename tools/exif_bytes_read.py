@@ -0,0 +1,39 @@
+import os
+import argparse
+from data import ExifReader, ExifError
+
+
+def walktree(directory_name: str):
+    with os.scandir(directory_name) as iterator:
+        for item in iterator:
+            if item.is_dir() and args.recursive:
+                walktree(item.path)
+            if not item.name.startswith('.') and item.is_file():
+                report(item.path, item.stat().st_size)
+
+
+def report(path: str, size: int):
+    global total_read, total_size
+    image_type = os.path.splitext(path)[1].lower()[1:]
+    if not ExifReader.supports(image_type):
+        return
+    try:
+        exif = ExifReader.read(path, image_type)
+    except ExifError as e:
+        print(f"{path}: {e}")
+        return
+    total_read += exif.bytes_read
+    total_size += size
+    print(f"{path}: read {exif.bytes_read} of {size} bytes")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="""Report for each JPEG, RAW and HEIC file how many bytes are read
+    to extract the EXIF date, location and dimensions.""")
+    parser.add_argument('dirname', type=str, help='name of directory to check')
+    parser.add_argument('--recursive', '-r', action='store_true', help='recurse into subdirectories. Default: false')
+    args = parser.parse_args()
+
+    total_read = total_size = 0
+    walktree(args.dirname)
+    print(f"Read {total_read} bytes of {total_size} in total")
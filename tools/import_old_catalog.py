@@ -2,8 +2,9 @@ import os
 import sys
 import re
 import argparse
-from tools import elastic_arguments, root_arguments
+from tools import elastic_arguments, root_arguments, directories_arguments
 from catalog import CatalogFiles, get_months
+from elastic import Connection
 
 
 def walk_year(directory_name: str, dest_path: str) -> int:
@@ -33,7 +34,9 @@ if __name__ == '__main__':
     root_arguments(parser)
     parser.add_argument('--month', type=str, help='Only catalog the given month.')
     elastic_arguments(parser)
+    directories_arguments(parser)
     args = parser.parse_args()
+    Connection.use_transport(args.pool_size, args.timeout, args.retries, args.compress)
 
     year = re.compile("[1-2]\d\d\d")
 
@@ -52,6 +55,8 @@ if __name__ == '__main__':
             index = args.index
 
         cat_folder = CatalogFiles(args.host, args.port, index=index, dropbox=args.dropbox)
+        if args.directories:
+            cat_folder.use_directories()
         if args.nas_root:
             cat_folder.nas_root = args.nas_root
         if args.dropbox_root:
@@ -1,21 +1,22 @@
 import os
 import argparse
 
+from tools import walk_arguments
+from tools.walker import Walker
+
 
 def walktree(directory_name: str):
-    # scan the directory: fetch all data for files
-    with os.scandir(directory_name) as iterator:
-        for item in iterator:
-            if item.is_dir() and args.recursive:
-                walktree(item.path)
-            if not item.name.startswith('.') and item.is_file():
-                types.add(os.path.splitext(item.name)[1].lower())
+    # scan the directories in parallel: fetch all data for files
+    for _, entries in Walker(args.walk_threads, max_depth=None if args.recursive else 0).walk(directory_name):
+        types.update(os.path.splitext(item.name)[1].lower() for item in entries
+                     if not item.name.startswith('.') and item.is_file())
 
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='List all file types found in the given directory')
     parser.add_argument('dirname', type=str, help='name of directory to catalog')
     parser.add_argument('--recursive', '-r', action='store_true', help='recurse into subdirectories. Default: false')
+    walk_arguments(parser)
     args = parser.parse_args()
 
     types = set()
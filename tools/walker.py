@@ -0,0 +1,114 @@
+import heapq
+import os
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import Callable, Generator, List, Optional, Tuple
+
+from tools.constants import Constants
+
+
+class WalkEntry:
+    """A file or directory found by the Walker, with what os.DirEntry tells about it. The result of stat is taken
+    by the thread that listed the directory if the Walker was asked to, otherwise on first use, and then kept."""
+    __slots__ = ("name", "path", "depth", "_is_dir", "_is_file", "_stat")
+
+    def __init__(self, name: str, path: str, depth: int, is_dir: bool, is_file: bool,
+                 stat: os.stat_result = None):
+        self.name = name
+        self.path = path
+        self.depth = depth
+        self._is_dir = is_dir
+        self._is_file = is_file
+        self._stat = stat
+
+    def __repr__(self):
+        return f"WalkEntry({self.path!r})"
+
+    def is_dir(self) -> bool:
+        return self._is_dir
+
+    def is_file(self) -> bool:
+        return self._is_file
+
+    def stat(self) -> os.stat_result:
+        if self._stat is None:
+            self._stat = os.stat(self.path)
+        return self._stat
+
+
+class Walker:
+    """Walk a directory tree with a pool of threads that list directories in parallel. On a NAS a walk mostly
+    waits for directory listings, several threads wait for several listings at once.
+
+    walk yields every directory with its entries as soon as it is listed, or with order in the order of the keys
+    of their paths, e.g. the order of the catalog sorted by path. The listings of the directories still to come
+    are read ahead meanwhile. Names in Constants.ignored_paths are left out, hidden names too unless hidden is
+    set. Directories deeper than max_depth below the top are not listed, 0 lists the top only."""
+    __threads: int
+    __max_depth: Optional[int]
+    __stat: bool
+    __hidden: bool
+
+    def __init__(self, threads: int = Constants.walk_threads, max_depth: int = None, stat: bool = False,
+                 hidden: bool = True):
+        self.__threads = max(threads, 1)
+        self.__max_depth = max_depth
+        self.__stat = stat
+        self.__hidden = hidden
+
+    def walk(self, top: str, order: Callable[[str], object] = None) \
+            -> Generator[Tuple[WalkEntry, List[WalkEntry]], None, None]:
+        """Generator over (directory, entries) below and including top. The stat of a directory is taken before
+        it is listed, so a change while listing shows in its modification time. Errors of a listing are raised
+        when its directory is next."""
+        top = top.rstrip(os.path.sep) or os.path.sep
+        executor = ThreadPoolExecutor(self.__threads, thread_name_prefix="walker")
+        try:
+            if order is None:
+                yield from self.__unordered(executor, top)
+            else:
+                yield from self.__ordered(executor, top, order)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def files(self, top: str) -> Generator[WalkEntry, None, None]:
+        """Generator over the files below top, in no particular order"""
+        for _, entries in self.walk(top):
+            yield from (entry for entry in entries if entry.is_file())
+
+    def __unordered(self, executor: ThreadPoolExecutor, top: str):
+        pending = {executor.submit(self.__list, top, os.path.basename(top), 0)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                directory, entries = future.result()
+                pending.update(future for _, future in self.__descend(executor, entries))
+                yield directory, entries
+
+    def __ordered(self, executor: ThreadPoolExecutor, top: str, order: Callable[[str], object]):
+        # a directory is found when its parent is listed, and sorts after it, so the least of the directories
+        # found is always the next one
+        pending = [(order(top), 0, executor.submit(self.__list, top, os.path.basename(top), 0))]
+        found = 1
+        while pending:
+            _, _, future = heapq.heappop(pending)
+            directory, entries = future.result()
+            for path, child in self.__descend(executor, entries):
+                heapq.heappush(pending, (order(path), found, child))
+                found += 1
+            yield directory, entries
+
+    def __descend(self, executor: ThreadPoolExecutor, entries: List[WalkEntry]) -> List[Tuple[str, Future]]:
+        """Start listing the directories among the entries, unless they are too deep"""
+        return [(entry.path, executor.submit(self.__list, entry.path, entry.name, entry.depth)) for entry in entries
+                if entry.is_dir() and (self.__max_depth is None or entry.depth <= self.__max_depth)]
+
+    def __list(self, path: str, name: str, depth: int) -> Tuple[WalkEntry, List[WalkEntry]]:
+        directory = WalkEntry(name, path, depth, True, False, os.stat(path))
+        entries = []
+        with os.scandir(path) as iterator:
+            for item in iterator:
+                if item.name in Constants.ignored_paths or (not self.__hidden and item.name.startswith('.')):
+                    continue
+                entries.append(WalkEntry(item.name, item.path, depth + 1, item.is_dir(), item.is_file(),
+                                         item.stat() if self.__stat else None))
+        return directory, entries
@@ -0,0 +1,279 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+from typing import Generator, List, Tuple
+
+from tools.constants import Constants
+
+
+class WatcherError(EnvironmentError):
+    def __init__(self, message: str):
+        super().__init__(message)
+
+
+class Inotify:
+    """Watch a directory tree with the Linux inotify API, called through ctypes.
+
+    Every directory gets its own watch, directories created or moved into the tree are added as they appear.
+    events returns ('changed', path) for files written, created or moved in, ('deleted', path) for files deleted
+    or moved away and ('deleted_dir', path) for directories deleted or moved away."""
+    __libc: ctypes.CDLL
+    __fd: int
+    __directories: dict
+
+    IN_MODIFY = 0x2
+    IN_CLOSE_WRITE = 0x8
+    IN_MOVED_FROM = 0x40
+    IN_MOVED_TO = 0x80
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_Q_OVERFLOW = 0x4000
+    IN_IGNORED = 0x8000
+    IN_ONLYDIR = 0x1000000
+    IN_DONT_FOLLOW = 0x2000000
+    IN_EXCL_UNLINK = 0x4000000
+    IN_ISDIR = 0x40000000
+    MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_ONLYDIR | \
+        IN_DONT_FOLLOW | IN_EXCL_UNLINK
+    EVENT = struct.Struct('iIII')     # struct inotify_event without its name
+
+    def __init__(self, root: str):
+        name = ctypes.util.find_library('c')
+        try:
+            self.__libc = ctypes.CDLL(name, use_errno=True)
+            self.__libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+            self.__libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+            self.__fd = self.__libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        except (OSError, AttributeError) as e:
+            raise WatcherError(f"No inotify: {e}")
+        if self.__fd < 0:
+            raise WatcherError(f"No inotify: {os.strerror(ctypes.get_errno())}")
+        self.__directories = dict()
+        self.__add_tree(root)
+
+    def __add_tree(self, top: str) -> List[str]:
+        """Watch top and all directories below it, return the files found in them"""
+        files = []
+        for dirpath, dirnames, filenames in os.walk(top):
+            wd = self.__libc.inotify_add_watch(self.__fd, os.fsencode(dirpath), Inotify.MASK)
+            if wd < 0:
+                error = ctypes.get_errno()
+                if error == 28:     # ENOSPC
+                    raise WatcherError("Too many directories to watch, raise fs.inotify.max_user_watches")
+                continue            # removed again already
+            self.__directories[wd] = dirpath
+            files.extend(os.path.join(dirpath, name) for name in filenames)
+        return files
+
+    def __remove_tree(self, top: str):
+        for wd, path in list(self.__directories.items()):
+            if path == top or path.startswith(top + os.path.sep):
+                self.__libc.inotify_rm_watch(self.__fd, wd)
+                del self.__directories[wd]
+
+    def events(self, timeout: float) -> List[Tuple[str, str]]:
+        readable, _, _ = select.select([self.__fd], [], [], timeout)
+        if not readable:
+            return []
+        events = []
+        while True:
+            try:
+                buffer = os.read(self.__fd, 65536)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(buffer):
+                wd, mask, _, length = Inotify.EVENT.unpack_from(buffer, offset)
+                name = buffer[offset + Inotify.EVENT.size:offset + Inotify.EVENT.size + length].rstrip(b'\0')
+                offset += Inotify.EVENT.size + length
+                events.extend(self.__event(wd, mask, os.fsdecode(name)))
+        return events
+
+    def __event(self, wd: int, mask: int, name: str) -> List[Tuple[str, str]]:
+        if mask & Inotify.IN_Q_OVERFLOW:
+            return [('overflow', '')]
+        if mask & Inotify.IN_IGNORED:
+            self.__directories.pop(wd, None)
+            return []
+        if wd not in self.__directories:
+            return []
+        path = os.path.join(self.__directories[wd], name)
+        if mask & Inotify.IN_ISDIR:
+            if mask & (Inotify.IN_CREATE | Inotify.IN_MOVED_TO):
+                return [('changed', file) for file in self.__add_tree(path)]
+            if mask & (Inotify.IN_DELETE | Inotify.IN_MOVED_FROM):
+                self.__remove_tree(path)
+                return [('deleted_dir', path)]
+            return []
+        if mask & (Inotify.IN_DELETE | Inotify.IN_MOVED_FROM):
+            return [('deleted', path)]
+        return [('changed', path)]
+
+    def close(self):
+        os.close(self.__fd)
+
+
+class Poller:
+    """Watch a directory tree by listing it again every interval, for file systems without inotify such as
+    network mounts. Only the directories whose modification time changed are listed again. Returns the same
+    events as :class:`Inotify`."""
+    __interval: float
+    __next: float
+    __directories: dict     # path -> (mtime_ns, {name: is_dir})
+
+    def __init__(self, root: str, interval: float):
+        self.__interval = interval
+        self.__next = time.monotonic() + interval
+        self.__directories = dict()
+        self.__add_tree(root)
+
+    def __add_tree(self, top: str) -> List[str]:
+        """List top and all directories below it, return the files found in them"""
+        files = []
+        pending = [top]
+        while pending:
+            path = pending.pop()
+            try:
+                mtime_ns, names = Poller.__list(path)
+            except OSError:
+                continue
+            self.__directories[path] = (mtime_ns, names)
+            for name, is_dir in names.items():
+                (pending if is_dir else files).append(os.path.join(path, name))
+        return files
+
+    @staticmethod
+    def __list(path: str) -> Tuple[int, dict]:
+        mtime_ns = os.stat(path).st_mtime_ns    # before listing, a change while listing shows next time
+        with os.scandir(path) as iterator:
+            return mtime_ns, {item.name: item.is_dir(follow_symlinks=False) for item in iterator}
+
+    def events(self, timeout: float) -> List[Tuple[str, str]]:
+        now = time.monotonic()
+        if now < self.__next:
+            time.sleep(min(timeout, self.__next - now))
+            return []
+        self.__next = now + self.__interval
+        events = []
+        for path in sorted(self.__directories):
+            if path not in self.__directories:
+                continue        # below a directory that is gone
+            mtime_ns, names = self.__directories[path]
+            try:
+                if os.stat(path).st_mtime_ns == mtime_ns:
+                    continue
+                current = Poller.__list(path)
+            except OSError:
+                continue        # gone, the listing of its parent tells
+            self.__directories[path] = current
+            for name, is_dir in current[1].items():
+                if name not in names:
+                    child = os.path.join(path, name)
+                    events.extend(('changed', file) for file in (self.__add_tree(child) if is_dir else [child]))
+            for name, is_dir in names.items():
+                if name not in current[1]:
+                    child = os.path.join(path, name)
+                    if is_dir:
+                        for directory in [d for d in self.__directories
+                                          if d == child or d.startswith(child + os.path.sep)]:
+                            del self.__directories[directory]
+                    events.append(('deleted_dir' if is_dir else 'deleted', child))
+        return events
+
+    def close(self):
+        pass
+
+
+class Watcher:
+    """Watch a directory tree for files added, moved or deleted, with inotify on Linux and by polling otherwise.
+
+    Events are coalesced per path. A file is reported as added once its size and modification time did not
+    change for settle seconds, so that files still being written are not read half way. Changes are returned in
+    batches when all files of a batch settled, or after max_delay at the latest, so that a file moved away and
+    the file moved in end up in the same batch."""
+    __backend: object
+    __settle: float
+    __max_delay: float
+    __pending: dict     # path -> (time of the last change, (size, mtime_ns))
+    __deleted: set
+    __deleted_dirs: set
+    __started: float
+
+    def __init__(self, root: str, settle: float = Constants.watch_settle, interval: float = Constants.watch_interval,
+                 max_delay: float = Constants.watch_max_delay, polling: bool = False):
+        self.__backend = None
+        if not polling:
+            try:
+                self.__backend = Inotify(root)
+            except WatcherError as e:
+                print(f"{e}, polling every {interval}s instead")
+        if self.__backend is None:
+            self.__backend = Poller(root, interval)
+        self.__settle = settle
+        self.__max_delay = max_delay
+        self.__pending = dict()
+        self.__deleted = set()
+        self.__deleted_dirs = set()
+        self.__started = 0
+
+    def changes(self) -> Generator[Tuple[List[str], List[str], List[str]], None, None]:
+        """Generator over batches of (added files, deleted files, deleted directories), forever"""
+        while True:
+            for kind, path in self.__backend.events(self.__settle / 2):
+                if os.path.basename(path) in Constants.ignored_paths:
+                    continue
+                self.__note(kind, path)
+            batch = self.__batch()
+            if batch is not None:
+                yield batch
+
+    def __note(self, kind: str, path: str):
+        now = time.monotonic()
+        if not self.__pending and not self.__deleted and not self.__deleted_dirs:
+            self.__started = now
+        if kind == 'changed':
+            self.__pending[path] = (now, None)
+        elif kind == 'deleted':
+            self.__pending.pop(path, None)
+            self.__deleted.add(path)
+        elif kind == 'deleted_dir':
+            for file in [p for p in self.__pending if p.startswith(path + os.path.sep)]:
+                del self.__pending[file]
+            self.__deleted_dirs.add(path)
+        elif kind == 'overflow':
+            print("Too many changes at once, some were lost. Run sync_catalog_with_disk to catch up.")
+
+    def __batch(self):
+        """The settled changes if all pending files settled or the batch is due, None otherwise"""
+        if not self.__pending and not self.__deleted and not self.__deleted_dirs:
+            return None
+        now = time.monotonic()
+        added = []
+        for path, (changed, stat) in list(self.__pending.items()):
+            if now - changed < self.__settle:
+                continue
+            try:
+                st = os.stat(path)
+            except OSError:
+                del self.__pending[path]    # gone again before it settled
+                continue
+            current = (st.st_size, st.st_mtime_ns)
+            if current != stat:
+                self.__pending[path] = (now, current)   # still written, or not checked yet
+            else:
+                added.append(path)
+        if len(added) < len(self.__pending) and now - self.__started < self.__max_delay:
+            return None
+        for path in added:
+            del self.__pending[path]
+        batch = (sorted(added), sorted(self.__deleted), sorted(self.__deleted_dirs))
+        self.__deleted = set()
+        self.__deleted_dirs = set()
+        self.__started = now
+        return batch if any(batch) else None
+
+    def close(self):
+        self.__backend.close()
@@ -0,0 +1,27 @@
+import argparse
+import elastic
+from tools import elastic_arguments
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="""Bring the directory summaries of the catalog up to date.
+    Storing, moving and deleting entries with --directories marks their directories, these and their parents are
+    computed again.
+    With --rebuild all summaries are dropped and computed from the catalog, e.g. the first time.""")
+    parser.add_argument('--rebuild', action='store_true', help='Compute all directories again. Defaults to FALSE')
+    parser.add_argument('path', nargs='?', type=str, help='Show the summary of this directory afterwards')
+    elastic_arguments(parser)
+    args = parser.parse_args()
+    elastic.Connection.use_transport(args.pool_size, args.timeout, args.retries, args.compress)
+
+    connection = elastic.Connection(args.host, args.port)
+    if args.index is not None:
+        connection.index = args.index
+
+    directories = elastic.Directories(connection)
+    computed = directories.rebuild() if args.rebuild else directories.refresh()
+    print(f"{computed} directories computed")
+    summary = directories.get(args.path if args.path else "")
+    if summary is not None:
+        print(f"{summary['path'] or '/'}: {summary['total_files']} files, {summary['total_bytes']} bytes, "
+              f"digest {summary['digest']}")
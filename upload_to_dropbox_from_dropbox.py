@@ -1,7 +1,10 @@
 import sys
 import argparse
-from tools import elastic_arguments, upload_arguments, root_arguments
+from tools import elastic_arguments, upload_arguments, root_arguments, bulk_arguments, geocode_arguments, \
+    directories_arguments
 from catalog import CatalogDropbox
+from elastic import Connection
+from data import GeocodeCache, Geocoder, Gazetteer, Folder
 
 
 if __name__ == '__main__':
@@ -16,7 +19,11 @@ if __name__ == '__main__':
     parser.add_argument('--limit', '-l', type=int, help='Limit the number of files processed', default=None)
     root_arguments(parser)
     elastic_arguments(parser)
+    bulk_arguments(parser)
+    directories_arguments(parser)
+    geocode_arguments(parser)
     args = parser.parse_args()
+    Connection.use_transport(args.pool_size, args.timeout, args.retries, args.compress)
 
     index = ""
     if args.index:
@@ -24,6 +31,9 @@ if __name__ == '__main__':
 
     cat_folder = CatalogDropbox(args.host, args.port, index=index, nas=args.nas, verbose=not args.quiet,
                                 dryrun=args.dryrun, move_files=args.move)
+    cat_folder.use_bulk(args.bulk_size, args.bulk_bytes, args.bulk_threads)
+    if args.directories:
+        cat_folder.use_directories()
     if args.nas_root:
         cat_folder.nas_root = args.nas_root
     if args.dropbox_root:
@@ -33,7 +43,19 @@ if __name__ == '__main__':
         print(f"Invalid directory {args.directory}")
         sys.exit(-1)
 
+    geocode_cache = None
+    if args.geocode_cache:
+        geocode_cache = GeocodeCache(args.geocode_cache)
+        Folder.use_geocode_cache(geocode_cache)
+    Folder.use_geocoder(Geocoder(args.nominatim, args.nominatim_rate))
+    if args.gazetteer:
+        Folder.use_gazetteer(Gazetteer(args.gazetteer))
+
     c = cat_folder.catalog_dir(args.directory, recurse=args.recursive, limit=args.limit)
+    if geocode_cache:
+        if not args.quiet:
+            geocode_cache.print_stats()
+        geocode_cache.close()
 
     if not args.quiet:
         if args.dryrun:
@@ -1,8 +1,11 @@
 import os
 import sys
 import argparse
-from tools import elastic_arguments, upload_arguments, root_arguments
+from tools import elastic_arguments, upload_arguments, root_arguments, cache_arguments, checksum_arguments, \
+    bulk_arguments, walk_arguments, geocode_arguments, directories_arguments
 from catalog import CatalogFiles
+from elastic import Connection
+from data import Factory, MetadataCache, GeocodeCache, Geocoder, Gazetteer, Folder
 
 
 if __name__ == '__main__':
@@ -12,26 +15,62 @@ if __name__ == '__main__':
     parser.add_argument('directory', type=str, help='Full path of directory to upload.')
     upload_arguments(parser)
     parser.add_argument('--dropbox', action='store_true', help='Also create the dropbox copy. Defaults to FALSE')
+    parser.add_argument('--workers', '-w', type=int, default=0,
+                        help='Read the files with this many processes. Defaults to 0, sequential')
     root_arguments(parser)
     elastic_arguments(parser)
+    cache_arguments(parser)
+    checksum_arguments(parser)
+    bulk_arguments(parser)
+    directories_arguments(parser)
+    walk_arguments(parser)
+    geocode_arguments(parser)
     args = parser.parse_args()
+    Connection.use_transport(args.pool_size, args.timeout, args.retries, args.compress)
 
     if not os.path.isdir(args.directory):
         print(f"Invalid directory {args.directory}")
         sys.exit(-1)
 
+    Factory.use_parallel_checksum(args.hash_threads)
+    cache = None
+    if args.cache:
+        cache = MetadataCache(args.cache, args.cache_size)
+        Factory.use_cache(cache)
+    geocode_cache = None
+    if args.geocode_cache:
+        geocode_cache = GeocodeCache(args.geocode_cache)
+        Folder.use_geocode_cache(geocode_cache)
+    Folder.use_geocoder(Geocoder(args.nominatim, args.nominatim_rate))
+    if args.gazetteer:
+        Folder.use_gazetteer(Gazetteer(args.gazetteer))
+
     index = ""
     if args.index:
         index = args.index
 
     cat_folder = CatalogFiles(args.host, args.port, index=index, dropbox=args.dropbox, verbose=not args.quiet,
-                              dryrun=args.dryrun)
+                              dryrun=args.dryrun, workers=args.workers)
+    cat_folder.use_bulk(args.bulk_size, args.bulk_bytes, args.bulk_threads)
+    if args.directories:
+        cat_folder.use_directories()
     if args.nas_root:
         cat_folder.nas_root = args.nas_root
     if args.dropbox_root:
         cat_folder.dropbox_root = args.dropbox_root
 
-    c = cat_folder.catalog_dir(args.directory, recurse=args.recursive)
+    try:
+        c = cat_folder.catalog_dir(args.directory, recurse=args.recursive, threads=args.walk_threads)
+    finally:
+        cat_folder.close()
+    if cache:
+        if not args.quiet:
+            cache.print_stats()
+        cache.close()
+    if geocode_cache:
+        if not args.quiet:
+            geocode_cache.print_stats()
+        geocode_cache.close()
 
     if not args.quiet:
         if args.dryrun:
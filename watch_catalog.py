@@ -0,0 +1,138 @@
+import argparse
+import os
+import unicodedata
+
+import elastic
+import sync_catalog_with_disk as sync
+from data import Entry, Factory, FactoryError, FactoryZeroFileSizeError, MetadataCache
+from tools import elastic_arguments, root_arguments, cache_arguments, checksum_arguments, validate_arguments
+from tools import directories_arguments
+from tools import read_config, Constants
+from tools.watcher import Watcher
+
+connection: elastic.Connection
+reader: elastic.Retrieve
+deleter: elastic.Delete
+summaries: elastic.Directories = None
+nas_root: str = ""
+
+
+def relative(path: str) -> str:
+    return path[len(nas_root) + 1:]
+
+
+def hashes_of(paths) -> set:
+    """The hashes of the paths relative to nas_root, in all normal forms they may be in the catalog with"""
+    names = {relative(path) for path in paths}
+    names |= {unicodedata.normalize(form, name) for name in names for form in ('NFC', 'NFD')}
+    return {Entry.hash_from_name(name) for name in names}
+
+
+def fresh_store() -> elastic.Store:
+    """A Store for one batch of changes. A Store remembers the checksums and names it found in the catalog,
+    which become stale once files are deleted, so that a file added again later would be taken for a duplicate."""
+    store = elastic.Store(connection)
+    if summaries is not None:
+        store.use_directories(summaries)
+    return store
+
+
+def apply(added: list, deleted: list, deleted_dirs: list, validate: str):
+    """Apply a batch of changes the way sync_catalog_with_disk does: added files that are catalog entries whose
+    file is gone were moved, the others are loaded. Then the entries of files that are gone are deleted."""
+    in_catalog = {sync.normalized(item.full_path) for item in reader.get_by_hashes(hashes_of(added), validate)}
+    new_files = []
+    for path in added:
+        if sync.normalized(relative(path)) in in_catalog:
+            continue        # changed in place, like sync_catalog_with_disk this is not detected
+        try:
+            new_files.append(Factory.from_path(path))
+        except (FactoryError, FactoryZeroFileSizeError):
+            print(f"Ignored: {path}")
+
+    by_checksum = dict()
+    for item in reader.get_by_checksums({new_file.checksum for new_file in new_files}, validate):
+        by_checksum.setdefault(item.checksum, []).append(item)
+    moved = set()
+    store_list = []
+    for new_file in new_files:
+        for item in by_checksum.get(new_file.checksum, []):
+            if item.id not in moved and not os.path.exists(os.path.join(nas_root, item.full_path)):
+                sync.update_catalog_entry_for_moved_file(item, new_file)
+                moved.add(item.id)
+                break
+        else:
+            new_file.path = relative(new_file.path)
+            new_file.nas = True
+            store_list.append(new_file)
+            print(f"Load: {new_file.full_path}")
+    if store_list:
+        sync.store.list(item for item in store_list)
+
+    gone = {item.id: item for item in reader.get_by_hashes(hashes_of(deleted), validate)}
+    for directory in deleted_dirs:
+        path = sync.normalized(relative(directory))
+        gone.update((item.id, item) for item in reader.entries_by_path(relative(directory), validate=validate)
+                    if sync.is_below(sync.normalized(item.path), path))
+    for item in gone.values():
+        if item.id in moved or os.path.exists(os.path.join(nas_root, item.full_path)):
+            continue
+        print(f"Delete: {item.full_path}")
+        deleter.id(item.id)
+        sync.store.forget([item])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="""Watch the catalog on the NAS and apply the files added, moved
+    and deleted there to the catalog as they happen. New files are loaded once they did not change for a while.
+    Uses inotify on Linux and polls otherwise, e.g. if inotify is not available or with --poll for network
+    mounts where inotify does not see changes made by other machines.""")
+    parser.add_argument('--poll', action='store_true', help='Poll for changes instead of using inotify')
+    parser.add_argument('--interval', type=float, default=Constants.watch_interval,
+                        help='Seconds between polls. Default: 30')
+    parser.add_argument('--settle', type=float, default=Constants.watch_settle,
+                        help='Seconds a new file must stay unchanged before it is loaded. Default: 5')
+    root_arguments(parser)
+    elastic_arguments(parser)
+    cache_arguments(parser)
+    checksum_arguments(parser)
+    validate_arguments(parser)
+    directories_arguments(parser)
+    args = parser.parse_args()
+    elastic.Connection.use_transport(args.pool_size, args.timeout, args.retries, args.compress)
+
+    connection = elastic.Connection(args.host, args.port)
+    if args.index is not None:
+        connection.index = args.index
+
+    nas_root = (args.nas_root if args.nas_root else read_config()['nas_root']).rstrip(os.path.sep)
+
+    reader = elastic.Retrieve(connection)
+    deleter = elastic.Delete(connection)
+    if args.directories:
+        summaries = elastic.Directories(connection)
+        deleter.use_directories(summaries)
+    # update_catalog_entry_for_moved_file works on this and on sync.store, which is set per batch
+    sync.nas_root = nas_root
+
+    Factory.use_parallel_checksum(args.hash_threads)
+    cache = None
+    if args.cache:
+        cache = MetadataCache(args.cache, args.cache_size)
+        Factory.use_cache(cache)
+
+    watcher = Watcher(nas_root, args.settle, args.interval, polling=args.poll)
+    print(f"Watching {nas_root} for catalog {connection.index}")
+    try:
+        for changes in watcher.changes():
+            sync.store = fresh_store()
+            sync.updated_checksums.clear()
+            apply(*changes, args.validate)
+            if summaries is not None:
+                summaries.refresh()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+        if cache:
+            cache.close()